@@ -0,0 +1,83 @@
+# coding=utf-8
+"""Benchmark for writing FoamFile dictionaries.
+
+The direct writer in FoamFile.body is compared with the previous json based
+conversion for a snappyHexMeshDict with many regions, a controlDict and probes
+with a large number of probe locations.
+
+Usage:
+
+    python benchmarks/foamfile_benchmark.py [number of probes]
+"""
+import os
+import sys
+import json
+import random
+import timeit
+import collections
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from butterfly.controlDict import ControlDict  # noqa: E402
+from butterfly.snappyHexMeshDict import SnappyHexMeshDict  # noqa: E402
+from butterfly.functions import Probes  # noqa: E402
+
+
+def json_body(values):
+    """Convert values to OpenFOAM syntax using json (previous implementation)."""
+    def remove_none(d):
+        if isinstance(d, (dict, collections.OrderedDict)):
+            return collections.OrderedDict(
+                (k, remove_none(v)) for k, v in d.iteritems()
+                if v == {} or (v and remove_none(v)))
+        elif isinstance(d, (list, tuple)):
+            return [remove_none(v) for v in d if v and remove_none(v)]
+        else:
+            return d
+
+    def split_line(line):
+        return line[4:-1] + "\n" + (len(line) - len(line.strip()) - 4) * ' ' + '{'
+
+    of = json.dumps(remove_none(values), indent=4, separators=(";", "\t\t")) \
+        .replace('\\"', '@').replace('"\n', ";\n").replace('"', '') \
+        .replace('};', '}').replace('\t\t{', '{').replace('@', '"')
+
+    content = (line[4:] if not line.endswith('{') else split_line(line)
+               for line in of.split("\n")[1:-1])
+
+    return "\n\n".join(content)
+
+
+def benchmark(probe_count=100000, repeat=3):
+    """Print the time for writing the body of sample dictionaries."""
+    random.seed(0)
+    s_hmd = SnappyHexMeshDict()
+    s_hmd.values['geometry'] = {'site.stl': collections.OrderedDict(
+        (('type', 'triSurfaceMesh'), ('name', 'site'), ('regions', dict(
+            ('bldg_{}'.format(i), {'name': 'bldg_{}'.format(i)})
+            for i in xrange(2000)))))}
+    s_hmd.values['castellatedMeshControls']['refinementSurfaces'] = {
+        'site': {'level': '(0 0)', 'regions': dict(
+            ('bldg_{}'.format(i), {'level': '(2 3)'}) for i in xrange(2000))}}
+
+    probes = Probes()
+    probes.probeLocations = [
+        (random.random(), random.random(), random.random())
+        for _ in xrange(probe_count)]
+
+    cases = (('snappyHexMeshDict', s_hmd), ('controlDict', ControlDict()),
+             ('probes', probes))
+
+    print('best of {}'.format(repeat))
+    print('{:<20}{:>10}{:>12}{:>12}{:>10}'.format(
+        'file', 'size', 'json', 'direct', 'speedup'))
+    for name, ff in cases:
+        t0 = min(timeit.repeat(lambda: json_body(ff.values), number=1,
+                               repeat=repeat))
+        t1 = min(timeit.repeat(ff.body, number=1, repeat=repeat))
+        print('{:<20}{:>9.1f}K{:>11.4f}s{:>11.4f}s{:>9.1f}x'.format(
+            name, len(ff.body()) / 1024.0, t0, t1, t0 / t1))
+
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,105 @@
+# coding=utf-8
+"""Benchmark for parsing OpenFOAM dictionaries.
+
+The single-pass tokenizer in CppDictParser is compared with the previous regex
+based implementation for a controlDict with many function objects, probes with
+a large number of probe locations and a snappyHexMeshDict.
+
+Usage:
+
+    python benchmarks/parser_benchmark.py [number of probes]
+"""
+import os
+import re
+import sys
+import random
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from butterfly.parser import CppDictParser  # noqa: E402
+from butterfly.controlDict import ControlDict  # noqa: E402
+from butterfly.snappyHexMeshDict import SnappyHexMeshDict  # noqa: E402
+from butterfly.functions import Probes  # noqa: E402
+
+
+def regex_parse(text):
+    """Parse OpenFOAM dictionary using regex (previous implementation)."""
+    def convert_to_dict(parsed):
+        d = dict()
+        itp = iter(parsed)
+        for pp in itp:
+            if not isinstance(pp, list):
+                if pp.find(';') == -1:
+                    d[pp.strip()] = convert_to_dict(next(itp))
+                else:
+                    s = pp.split(';')
+                    if not pp.endswith(';'):
+                        d[s[-1].strip()] = convert_to_dict(next(itp))
+                        s = s[:-1]
+                    for ppp in s:
+                        ss = ppp.split()
+                        if ss:
+                            d[ss[0].strip()] = ' '.join(ss[1:]).strip()
+        return d
+
+    def parse_nested(text, left=r'[{]', right=r'[}]', sep='#'):
+        pat = r'({}|{}|{})'.format(left, right, sep)
+        tokens = re.split(pat, text)
+        stack = [[]]
+        for x in tokens:
+            if not x.strip() or re.match(sep, x):
+                continue
+            if re.match(left, x):
+                current = []
+                stack[-1].append(current)
+                stack.append(current)
+            elif re.match(right, x):
+                stack.pop()
+            else:
+                stack[-1].append(x.strip())
+        return stack.pop()
+
+    _t = CppDictParser.remove_comments(text)
+    _t = ''.join(_t.replace('\r\n', ' ').replace('\n', ' '))
+    return convert_to_dict(parse_nested(_t))
+
+
+def benchmark(probe_count=100000, repeat=3):
+    """Print the time for parsing sample dictionaries."""
+    random.seed(0)
+    functions = ''.join(
+        '    probes_{0}\n    {{\n        type probes;\n'
+        '        functionObjectLibs ("libsampling.so");\n'
+        '        outputControl timeStep; // write every time step\n'
+        '        fields (p U k epsilon);\n'
+        '        probeLocations ((0 0 {0}) (1 1 {0}) (2 2 {0}));\n    }}\n'
+        .format(i) for i in xrange(500))
+    control_dict = ControlDict().to_openfoam() + \
+        '\nfunctions\n{\n' + functions + '}\n'
+
+    probes = Probes()
+    probes.probeLocations = [
+        (random.random(), random.random(), random.random())
+        for _ in xrange(probe_count)]
+
+    cases = (('controlDict', control_dict),
+             ('probes', probes.to_openfoam()),
+             ('snappyHexMeshDict', SnappyHexMeshDict().to_openfoam()))
+
+    print('best of {}'.format(repeat))
+    print('{:<20}{:>10}{:>12}{:>12}{:>10}'.format(
+        'file', 'size', 'regex', 'tokenizer', 'speedup'))
+    for name, text in cases:
+        assert regex_parse(text) == CppDictParser(text).values, \
+            'Parsers return different values for {}.'.format(name)
+        t0 = min(timeit.repeat(lambda: regex_parse(text), number=1,
+                               repeat=repeat))
+        t1 = min(timeit.repeat(lambda: CppDictParser(text), number=1,
+                               repeat=repeat))
+        print('{:<20}{:>9.1f}K{:>11.4f}s{:>11.4f}s{:>9.1f}x'.format(
+            name, len(text) / 1024.0, t0, t1, t0 / t1))
+
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
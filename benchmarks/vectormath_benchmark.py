@@ -0,0 +1,60 @@
+# coding=utf-8
+"""Micro-benchmark for single and batched vectormath functions.
+
+Usage:
+
+    python benchmarks/vectormath_benchmark.py [number of points]
+"""
+import os
+import sys
+import random
+import timeit
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from butterfly import vectormath as vm  # noqa: E402
+
+
+def benchmark(count=100000, repeat=3):
+    """Print the time for single and batched calls for count points."""
+    random.seed(0)
+    points = tuple((random.random(), random.random(), random.random())
+                   for _ in xrange(count))
+    values = array('d', (c for pt in points for c in pt))
+    origin = (0.5, 0.5, 0)
+    normal = (1, 2, 3)
+    vector = (1, 0, 0)
+
+    cases = (
+        ('rotate',
+         lambda: [vm.rotate(origin, pt, 30) for pt in points],
+         lambda: vm.rotate_points(origin, values, 30)),
+        ('move',
+         lambda: [vm.move(pt, vector) for pt in points],
+         lambda: vm.move_points(values, vector)),
+        ('scale',
+         lambda: [vm.scale(pt, 2) for pt in points],
+         lambda: vm.scale_vectors(values, 2)),
+        ('normalize',
+         lambda: [vm.normalize(pt) for pt in points],
+         lambda: vm.normalize_vectors(values)),
+        ('cross_product',
+         lambda: [vm.cross_product(pt, normal) for pt in points],
+         lambda: vm.cross_products(values, normal * count)),
+        ('project',
+         lambda: [vm.project(pt, origin, normal) for pt in points],
+         lambda: vm.project_points(values, origin, normal)),
+    )
+
+    print('{} points (best of {})'.format(count, repeat))
+    print('{:<16}{:>12}{:>12}{:>10}'.format('function', 'single', 'batched',
+                                            'speedup'))
+    for name, single, batched in cases:
+        t0 = min(timeit.repeat(single, number=1, repeat=repeat))
+        t1 = min(timeit.repeat(batched, number=1, repeat=repeat))
+        print('{:<16}{:>11.3f}s{:>11.3f}s{:>9.1f}x'.format(name, t0, t1, t0 / t1))
+
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -13,6 +13,10 @@ def set_config(_ofrunners):
     if not _ofrunners:
         raise ImportError('Set your installation flavor in confing.yml.')
 
+    if os.name != 'nt':
+        # on linux and mac OpenFOAM should be sourced and available on PATH
+        return {'runner': 'posix', 'of_folder': os.environ.get('WM_PROJECT_DIR')}
+
     # look up for folders
     for of_runner in _ofrunners:
         try:
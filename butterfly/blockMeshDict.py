@@ -815,6 +815,10 @@ class BlockMeshDict(FoamFile):
                 self.__boundary_to_openfoam(),  # boundary
                 "\n")  # merge patch pair
 
+    def iter_openfoam(self):
+        """Iterate over OpenFOAM string of this file in chunks."""
+        yield self.to_openfoam()
+
     def ToString(self):
         """Overwrite .NET ToString method."""
         return self.__repr__()
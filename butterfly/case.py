@@ -1,9 +1,11 @@
 ﻿"""Butterfly OpenFOAM Case."""
 import os
 import re  # to check input names
+import hashlib
 from shutil import rmtree  # to remove case folders if needed
 from distutils.dir_util import copy_tree  # to copy sHM meshes over to tri
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
+from array import array
 from copy import deepcopy
 try:
     from itertools import izip as zip
@@ -12,9 +14,12 @@ except:
     pass
 from .version import Version
 from .utilities import load_case_files, load_probe_values_from_folder, \
-    load_probes_from_postProcessing_file, load_probes_and_values_from_sample_file
+    load_probes_from_postProcessing_file, load_probes_and_values_from_sample_file, \
+    load_of_field_file, load_probe_history_from_folder, calculate_probe_statistics
 from .geometry import bf_geometry_from_stl_file, calculate_min_max_from_bf_geometries
 from .refinementRegion import refinementRegions_from_stl_file
+from .stl.ascii import format_solid as format_stl_solid
+from .stl.binary import write_values as write_binary_stl_values
 from .meshingparameters import MeshingParameters
 from .fields import Field
 
@@ -46,11 +51,15 @@ from .fvSchemes import FvSchemes
 from .fvSolution import FvSolution
 from .functions import Probes
 from .decomposeParDict import DecomposeParDict
+from .surfaceFeatureExtractDict import SurfaceFeatureExtractDict
 from .sampleDict import SampleDict
+from .sampler import CellSampler
 
 import butterfly
 
-if butterfly.config and butterfly.config['runner'] == 'blueCFD':
+if butterfly.config and butterfly.config['runner'] == 'posix':
+    from .runmanager_posix import RunManagerPosix as RunManager
+elif butterfly.config and butterfly.config['runner'] == 'blueCFD':
     from .runmanager_bluecfd import RunManagerBlueCFD as RunManager
 else:
     from .runmanager import RunManager
@@ -81,8 +90,8 @@ class Case(object):
 
     """
 
-    SUBFOLDERS = ('0', 'constant', 'constant\\polyMesh',
-                  'constant\\triSurface', 'system', 'log')
+    SUBFOLDERS = ('0', 'constant', os.path.join('constant', 'polyMesh'),
+                  os.path.join('constant', 'triSurface'), 'system', 'log')
 
     # minimum list of files to be able to run blockMesh and snappyHexMesh
     MINFOAMFIles = ('fvSchemes', 'fvSolution', 'controlDict', 'blockMeshDict',
@@ -131,6 +140,13 @@ class Case(object):
         # place holder for refinment regions
         # use .add_refinementRegions to add regions to case
         self.__refinementRegions = []
+
+        # loaded fields by file path as ((mtime, size), values). see load_field
+        self.__field_cache = {}
+        # cell sampler for polyMesh as ((mtime, size), sampler). see sample_field
+        self.__sampler_cache = None
+        # saved stl files by file path as (content hash, mtime, size). see save
+        self.__stl_files = {}
         self.runmanager = RunManager(self.project_name)
 
     @classmethod
@@ -411,12 +427,12 @@ class Case(object):
     @property
     def polyMesh_folder(self):
         """polyMesh folder fullpath."""
-        return os.path.join(self.project_dir, 'constant\\polyMesh')
+        return os.path.join(self.project_dir, 'constant', 'polyMesh')
 
     @property
     def triSurface_folder(self):
         """triSurface folder fullpath."""
-        return os.path.join(self.project_dir, 'constant\\triSurface')
+        return os.path.join(self.project_dir, 'constant', 'triSurface')
 
     @property
     def postProcessing_folder(self):
@@ -659,9 +675,13 @@ class Case(object):
         """
         raise NotImplementedError()
 
-    def save(self, overwrite=False, minimum=True):
+    def save(self, overwrite=False, minimum=True, binary_stl=False):
         """Save case to folder.
 
+        Files are only written if their content has changed since they were
+        saved. Stl files are checked against the geometries which were last
+        saved by this case.
+
         Args:
             overwrite: If True all the current content will be overwritten
                 (default: False).
@@ -670,7 +690,19 @@ class Case(object):
                 Files are ('fvSchemes', 'fvSolution', 'controlDict',
                 'blockMeshDict','snappyHexMeshDict'). Rest of the files will be
                 created from a Solution.
+            binary_stl: Write geometries and refinement regions as binary stl
+                files (default: False). Binary stl files can't have named
+                regions so each geometry will be written to a separate file
+                which is referenced from snappyHexMeshDict. features and
+                surfaceFeatureExtractDict are updated for the new files and the
+                stl and eMesh files which are replaced are removed.
+
+        Returns:
+            namedtuple(written, unchanged) of lists of file paths.
         """
+        SavedFiles = namedtuple('SavedFiles', 'written unchanged')
+        saved = SavedFiles([], [])
+
         # create folder and subfolders if they are not already created
         if overwrite and os.path.exists(self.project_dir):
             rmtree(self.project_dir, ignore_errors=True)
@@ -694,32 +726,147 @@ class Case(object):
         else:
             foam_files = self.foam_files
 
+        s_hmd = self.get_foam_file_by_name('snappyHexMeshDict')
+        if binary_stl and s_hmd:
+            split = s_hmd.split_stl_geometry()
+            sfe = self.__split_surfaceFeatureExtractDict(split)
+        else:
+            split, sfe = {}, None
+
         for f in foam_files:
-            f.save(self.project_dir)
+            fp = f.save(self.project_dir, changed_only=True)
+            if fp:
+                saved.written.append(fp)
+            elif os.path.isfile(f.file_path(self.project_dir)):
+                saved.unchanged.append(f.file_path(self.project_dir))
+
+        if sfe:
+            fp = sfe.save(self.project_dir, changed_only=True)
+            if fp:
+                saved.written.append(fp)
 
         # find blockMeshDict and convertToMeters so I can scale stl files to meters.
         bmds = (ff for ff in self.foam_files if ff.name == 'blockMeshDict')
         bmd = bmds.next()
         convertToMeters = bmd.convertToMeters
 
-        # write bfgeometries to stl file. __geometries is geometries without
-        # blockMesh geometry
-        stl_str = (geo.to_stl(convertToMeters) for geo in self.__geometries)
+        # collect bfgeometries for each stl file. __geometries is geometries
+        # without blockMesh geometry
         stl_name = self.__originalName or self.project_name
-        with open(os.path.join(self.triSurface_folder,
-                               '%s.stl' % stl_name), 'wb') as stlf:
-            stlf.writelines(stl_str)
-
-        # write refinementRegions to stl files
-        for ref in self.refinementRegions:
-            ref.write_to_stl(self.triSurface_folder, convertToMeters)
+        if binary_stl or (s_hmd and self.__geometries and
+                          stl_name not in s_hmd.stl_file_names):
+            # a file for each geometry. geometries with the same name are
+            # written to the same file.
+            stl_geometries = OrderedDict()
+            for geo in self.__geometries:
+                stl_geometries.setdefault(geo.name, []).append(geo)
+            stl_files = [(geo_name, geos, binary_stl)
+                         for geo_name, geos in stl_geometries.iteritems()]
+        else:
+            stl_files = [(stl_name, self.__geometries, False)]
+
+        # refinementRegions
+        stl_files.extend((ref.name, (ref,), binary_stl)
+                         for ref in self.refinementRegions)
+
+        for name, geos, binary in stl_files:
+            fp = os.path.join(self.triSurface_folder, '%s.stl' % name)
+            content_hash = hashlib.md5(repr(
+                (convertToMeters, binary, tuple(geo.content_hash for geo in geos))
+            ).encode()).hexdigest()
+            if self.__is_stl_saved(fp, content_hash):
+                saved.unchanged.append(fp)
+                continue
+
+            self.__write_stl_file(fp, geos, convertToMeters, binary)
+            st = os.stat(fp)
+            self.__stl_files[fp] = (content_hash, st.st_mtime, st.st_size)
+            saved.written.append(fp)
+
+        # remove stl and eMesh files which are replaced by a file for each region
+        stl_names = set(name for name, geos, binary in stl_files)
+        for name in split:
+            if name in stl_names:
+                continue
+            for ext in ('.stl', '.eMesh'):
+                fp = os.path.join(self.triSurface_folder, name + ext)
+                if os.path.isfile(fp):
+                    os.remove(fp)
+                    self.__stl_files.pop(fp, None)
+                    print('Removed {}.'.format(fp))
 
         # add .foam file
-        with open(os.path.join(self.project_dir,
-                               self.project_name + '.foam'), 'wb') as ffile:
-            ffile.write('')
+        fp = os.path.join(self.project_dir, self.project_name + '.foam')
+        if not os.path.isfile(fp):
+            with open(fp, 'wb') as ffile:
+                ffile.write('')
+
+        print('{} is saved to: {}\n\t{} files written, {} files unchanged.'.format(
+            self.project_name, self.project_dir, len(saved.written),
+            len(saved.unchanged)))
+
+        return saved
+
+    def __split_surfaceFeatureExtractDict(self, split):
+        """Repeat surfaceFeatureExtractDict entries of split stl files for regions.
 
-        print('{} is saved to: {}'.format(self.project_name, self.project_dir))
+        Args:
+            split: A dictionary of split stl file names and the names of the new
+                stl files. see SnappyHexMeshDict.split_stl_geometry.
+
+        Returns:
+            surfaceFeatureExtractDict if it is changed otherwise None.
+        """
+        if not split:
+            return
+
+        sfe = self.get_foam_file_by_name('surfaceFeatureExtractDict')
+        if not sfe:
+            fp = os.path.join(self.project_dir, 'system', 'surfaceFeatureExtractDict')
+            if not os.path.isfile(fp):
+                return
+            sfe = SurfaceFeatureExtractDict.from_file(fp)
+
+        is_changed = False
+        for name, regions in split.iteritems():
+            values = sfe.values.pop('{}.stl'.format(name), None)
+            if values is None:
+                continue
+            for region in regions:
+                sfe.values['{}.stl'.format(region)] = deepcopy(values)
+            is_changed = True
+
+        return sfe if is_changed else None
+
+    def __is_stl_saved(self, fp, content_hash):
+        """Check if an stl file is saved from geometries with this content hash."""
+        try:
+            saved_hash, mtime, size = self.__stl_files[fp]
+        except KeyError:
+            return False
+
+        if saved_hash != content_hash or not os.path.isfile(fp):
+            return False
+
+        st = os.stat(fp)
+        return (st.st_mtime, st.st_size) == (mtime, size)
+
+    @staticmethod
+    def __write_stl_file(fp, geometries, convertToMeters=1, binary=False):
+        """Write geometries to an stl file with a solid for each geometry name."""
+        stl_values = OrderedDict()
+        for geo in geometries:
+            stl_values.setdefault(geo.name, array('d')).extend(
+                geo.facet_values(convertToMeters))
+
+        with open(fp, 'wb') as stlf:
+            if binary:
+                # binary stl files have a single solid
+                for name, values in stl_values.iteritems():
+                    write_binary_stl_values(name, values, stlf)
+            else:
+                for name, values in stl_values.iteritems():
+                    stlf.writelines(format_stl_solid(name, values))
 
     def command(self, cmd, args=None, decomposeParDict=None, run=True, wait=True):
         r"""Run an OpenFOAM command for this case.
@@ -753,6 +900,10 @@ class Case(object):
         else:
             log = namedtuple('log', 'success error process logfiles errorfiles')
 
+            if hasattr(self.runmanager, 'project_folder'):
+                # working_dir can change after the run manager is created
+                self.runmanager.project_folder = self.project_dir
+
             p, logfiles, errfiles = self.runmanager.run(cmd, args,
                                                         decomposeParDict, wait)
 
@@ -843,6 +994,99 @@ class Case(object):
             res = namedtuple('Results', 'probes values')
             return res(pts, values)
 
+    def load_field(self, field, time='latest'):
+        """Load field values from a time folder without running postProcess.
+
+        Loaded values are cached and the file is only parsed again once it is
+        modified.
+
+        Args:
+            field: Field name (e.g. U, p).
+            time: Time folder as a number or 'latest' for the latest time folder
+                that includes the field (default: 'latest').
+        Returns:
+            namedtuple(internal_field, boundary_field). See
+            utilities.load_of_field_file.
+        """
+        times = sorted(
+            (float(name), name) for name in os.listdir(self.project_dir)
+            if re.match(r'^\d+(\.\d*)?([eE][-+]?\d+)?$', name) and
+            (os.path.isfile(os.path.join(self.project_dir, name, field)) or
+             os.path.isfile(os.path.join(self.project_dir, name, field + '.gz')))
+        )
+
+        if time == 'latest':
+            assert times, \
+                IOError('Found no results folder with {}. Either you have not run '
+                        'the analysis or the run has faild. Check inside "log" '
+                        'folder.'.format(field))
+            folder = times[-1][1]
+        else:
+            try:
+                folder = next(name for t, name in times if t == float(time))
+            except StopIteration:
+                raise ValueError(
+                    'Failed to find {} in time folder {}. Available times: {}'
+                    .format(field, time, tuple(name for _, name in times)))
+
+        fp = os.path.join(self.project_dir, folder, field)
+        if not os.path.isfile(fp):
+            fp += '.gz'
+
+        st = os.stat(fp)
+        stamp = st.st_mtime, st.st_size
+        try:
+            cached_stamp, values = self.__field_cache[fp]
+        except KeyError:
+            pass
+        else:
+            if cached_stamp == stamp:
+                return values
+
+        values = load_of_field_file(fp)
+        self.__field_cache[fp] = stamp, values
+        return values
+
+    def get_cell_sampler(self):
+        """Get a CellSampler for cell centres of the mesh in polyMesh folder.
+
+        The sampler is cached and will only be created again once the mesh is
+        modified.
+        """
+        fp = os.path.join(self.polyMesh_folder, 'owner')
+        if not os.path.isfile(fp):
+            fp += '.gz'
+        assert os.path.isfile(fp), \
+            'Failed to find the mesh in {}. Run blockMesh and snappyHexMesh first.' \
+            .format(self.polyMesh_folder)
+
+        st = os.stat(fp)
+        stamp = st.st_mtime, st.st_size
+        if self.__sampler_cache is None or self.__sampler_cache[0] != stamp:
+            self.__sampler_cache = \
+                stamp, CellSampler.from_polyMesh(self.polyMesh_folder)
+
+        return self.__sampler_cache[1]
+
+    def sample_field(self, field, points, time='latest', method='nearest', k=8):
+        """Sample field values at points without running postProcess.
+
+        Values are sampled from the cells with the nearest centres. Unlike sample
+        this method runs in-process and reuses the loaded mesh and field for the
+        next calls.
+
+        Args:
+            field: Field name (e.g. U, p).
+            points: List of points as (x, y, z).
+            time: Time folder as a number or 'latest' (default: 'latest').
+            method: nearest or idw (inverse distance weighting) (default: nearest).
+            k: Number of nearest cells for idw (default: 8).
+        Returns:
+            A list of values. Vector values are returned as tuples.
+        """
+        values = self.load_field(field, time).internal_field
+        return self.get_cell_sampler().sample(values, points, method, k)
+
     def snappyHexMesh(self, args=None, wait=True):
         """Run snappyHexMesh.
 
@@ -974,6 +1218,31 @@ class Case(object):
 
         return load_probes_from_postProcessing_file(self.probes_folder, field)
 
+    def load_probe_history(self, field):
+        """Return OpenFOAM probes results for all time steps for a field.
+
+        Returns:
+            namedtuple(times, values, probe_count, width). See
+            utilities.load_probe_history_from_folder.
+        """
+        if field not in self.probes.fields:
+            raise ValueError("Can't find {} in {}.".format(field,
+                                                           self.probes.fields))
+
+        return load_probe_history_from_folder(self.probes_folder, field)
+
+    def load_probe_statistics(self, field, count=None):
+        """Return time-averaged OpenFOAM probes results for a field.
+
+        Args:
+            field: Probes field (e.g. U, p, T).
+            count: Number of last time steps to be averaged. By default all the
+                time steps will be used.
+        Returns:
+            namedtuple(average, minimum, maximum, std).
+        """
+        return calculate_probe_statistics(self.load_probe_history(field), count)
+
     def duplicate(self):
         """Return a copy of this object."""
         return deepcopy(self)
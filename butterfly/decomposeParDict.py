@@ -30,6 +30,11 @@ class DecomposeParDict(FoamFile):
         """
         return cls(values=foam_file_from_file(filepath, cls.__name__))
 
+    @property
+    def isDecomposeParDict(self):
+        """Return True for decomposeParDict."""
+        return True
+
     @property
     def numberOfSubdomains(self):
         """Get number of total subdomains."""
@@ -1,10 +1,10 @@
 # coding=utf-8
 """Foam File Class."""
 from .version import Version, Header
-from .utilities import get_boundary_field_from_geometries
+from .utilities import get_boundary_field_from_geometries, calculate_file_hash
 from .parser import CppDictParser
 import os
-import json
+import hashlib
 import collections
 from copy import deepcopy
 
@@ -52,6 +52,9 @@ class FoamFile(object):
         self.__values = deepcopy(default_values)
         self.update_values(values, mute=True)
 
+        # (hash, mtime, size) of saved files to skip reading them in is_saved
+        self.__saved_files = {}
+
     @classmethod
     def from_file(cls, filepath, location=None):
         """Create a FoamFile from a file.
@@ -125,76 +128,60 @@ class FoamFile(object):
         """Return values as a dictionary."""
         return self.__values
 
-    # TODO(Mostapha): replace log changes with update_dict from utilities
     def update_values(self, v, replace=False, mute=False):
         """Update current values from dictionary v.
 
         if key is not available in current values it will be added, if the key
         already exists it will be updated.
 
+        Args:
+            v: A dictionary of new values.
+            replace: Set to True to replace the top level values with the values
+                in v instead of updating nested dictionaries (default: False).
+            mute: Set to True to not print the changes (default: False).
+
         Returns:
-            True is the dictionary is updated.
+            A list of paths to changed values as tuples of keys (e.g.
+            ('solvers', 'p', 'tolerance')). The list is empty if the dictionary
+            is not updated.
         """
-        def log_changes(original, new):
-            """compare this dictionary with the current values."""
-            if original is None:
-                original = {}
-
-            for key, value in new.items():
-
-                if key not in original:
-                    # there is a new key so dictionary has changed.
-                    if not mute:
-                        msg = '{} :: New values are added for {}.' \
-                            .format('.'.join(self.__parents), key)
-                        print(msg)
-                    self.__hasChanged = True
-                    return
-
-                if isinstance(value, (dict, collections.OrderedDict)):
-                    self.__parents.append(key)
-                    log_changes(original[key], value)
-                elif str(original[key]) != str(value):
-                    # there is a change in value
-                    if not mute:
-                        msg = '{}.{} is changed from "{}" to "{}".'\
-                            .format('.'.join(self.__parents), key,
-                                    original[key] if len(str(original[key])) < 100
-                                    else '%s...' % str(original[key])[:100],
-                                    value if len(str(value)) < 100
-                                    else '%s...' % str(value)[:100])
-                        print(msg)
-                    self.__hasChanged = True
-                    return
-
-        def modify_dict(original, new):
-            """Modify a dictionary based on a new dictionary."""
-            for key, value in new.items():
-                if key in original and isinstance(value, dict):
-                    if isinstance(original[key], dict):
-                        modify_dict(original[key], value)
-                    else:
-                        # the value was not a dict, replce them with the new one
-                        original[key] = value
-                else:
-                    original[key] = value
-
-            return original
-
         assert isinstance(v, dict), 'Expected dictionary not {}!'.format(type(v))
 
-        self.__parents = [self.__class__.__name__]
-        self.__hasChanged = False
-        log_changes(self.__values, v)
+        changes = _diff_values(self.__values, v)
+        if not changes:
+            return changes
 
-        if self.__hasChanged:
-            if replace:
-                self.__values.update(v)
-            else:
-                self.__values = modify_dict(self.__values, v)
-            return True
+        if not mute:
+            for path in changes:
+                self.__log_change(path, v)
+
+        if replace:
+            self.__values.update(v)
         else:
-            return False
+            for path in changes:
+                original, new = self.__values, v
+                for key in path[:-1]:
+                    original, new = original[key], new[key]
+                original[path[-1]] = new[path[-1]]
+
+        return changes
+
+    def __log_change(self, path, v):
+        """Print a change in values."""
+        parents = '.'.join((self.__class__.__name__,) + path[:-1])
+        original = self.__values
+        for key in path:
+            v = v[key]
+            if original is not None:
+                original = original.get(key) if isinstance(original, dict) else None
+
+        if original is None:
+            print('{} :: New values are added for {}.'.format(parents, path[-1]))
+        else:
+            print('{}.{} is changed from "{}" to "{}".'.format(
+                parents, path[-1],
+                original if len(str(original)) < 100 else '%s...' % str(original)[:100],
+                v if len(str(v)) < 100 else '%s...' % str(v)[:100]))
 
     @property
     def parameters(self):
@@ -244,38 +231,24 @@ class FoamFile(object):
                 "\tobject\t\t%s;\n" \
                 "}\n" % (self.__version, self.format, self.cls, self.name)
 
-    @staticmethod
-    def _split_line(line):
-        """Split lines which ends with { to two lines."""
-        return line[4:-1] + "\n" + \
-            (len(line) - len(line.strip()) - 4) * ' ' + '{'
-
     def body(self):
         """Return body string."""
-        # remove None values
-        def remove_none(d):
-            if isinstance(d, (dict, collections.OrderedDict)):
-                return collections.OrderedDict(
-                    (k, remove_none(v)) for k, v in d.iteritems()
-                    if v == {} or (v and remove_none(v)))
-            elif isinstance(d, (list, tuple)):
-                return [remove_none(v) for v in d if v and remove_none(v)]
-            else:
-                return d
-            return remove_none
-
-        _values = remove_none(self.values)
+        return ''.join(self.iter_body())
 
-        # make python dictionary look like c++ dictionary!!
-        of = json.dumps(_values, indent=4, separators=(";", "\t\t")) \
-            .replace('\\"', '@').replace('"\n', ";\n").replace('"', '') \
-            .replace('};', '}').replace('\t\t{', '{').replace('@', '"')
+    def iter_body(self):
+        """Iterate over body of the file as strings.
 
-        # remove first and last {} and prettify[!] the file
-        content = (line[4:] if not line.endswith('{') else self._split_line(line)
-                   for line in of.split("\n")[1:-1])
-
-        return "\n\n".join(content)
+        Values are written as OpenFOAM dictionary entries. Nested dictionaries are
+        written as sub-dictionaries, lists and tuples as OpenFOAM lists and
+        strings as they are. None values and empty values are not written.
+        """
+        first = True
+        for line in _iter_foam_lines(self.values, ''):
+            if first:
+                first = False
+            else:
+                yield '\n\n'
+            yield line
 
     @staticmethod
     def convert_bool_value(v=True):
@@ -292,23 +265,108 @@ class FoamFile(object):
 
     def to_openfoam(self):
         """Return OpenFOAM string."""
-        return "\n".join((self.header(), self.body()))
+        return ''.join(self.iter_openfoam())
 
-    def save(self, project_folder, sub_folder=None, overwrite=True):
-        """Save to file.
+    def iter_openfoam(self):
+        """Iterate over OpenFOAM string of this file in chunks."""
+        yield self.header()
+        yield '\n'
+        for chunk in self.iter_body():
+            yield chunk
+
+    def file_path(self, project_folder, sub_folder=None):
+        """Get path to file in a project folder.
 
         Args:
             project_folder: Path to project folder as a string.
             sub_folder: Optional input for sub_folder (default: self.location).
         """
         sub_folder = sub_folder or self.location.replace('"', '')
-        fp = os.path.join(project_folder, sub_folder, self.name)
+        return os.path.join(project_folder, sub_folder, self.name)
+
+    def content_hash(self):
+        """Calculate md5 hash of OpenFOAM string of this file as a hex string."""
+        md5 = hashlib.md5()
+        for chunk in self.iter_openfoam():
+            md5.update(chunk)
+        return md5.hexdigest()
+
+    def is_saved(self, project_folder, sub_folder=None):
+        """Check if the saved file has the same content as this file.
+
+        The content of the file on disk is only hashed if the file has changed
+        since the last save.
+
+        Args:
+            project_folder: Path to project folder as a string.
+            sub_folder: Optional input for sub_folder (default: self.location).
+        """
+        saved_hash = self.__saved_hash(self.file_path(project_folder, sub_folder))
+        if saved_hash is None:
+            return False
+        return saved_hash == self.content_hash()
+
+    def __saved_hash(self, fp):
+        """Get md5 hash of a saved file or None if the file doesn't exist.
+
+        The file is only hashed if it has changed since the last save.
+        """
+        if not os.path.isfile(fp):
+            return None
+
+        st = os.stat(fp)
+        try:
+            saved_hash, mtime, size = self.__saved_files[fp]
+        except KeyError:
+            saved_hash = None
+        else:
+            if (st.st_mtime, st.st_size) != (mtime, size):
+                saved_hash = None
+
+        if saved_hash is None:
+            saved_hash = calculate_file_hash(fp)
+            self.__saved_files[fp] = (saved_hash, st.st_mtime, st.st_size)
+
+        return saved_hash
+
+    def save(self, project_folder, sub_folder=None, overwrite=True,
+             changed_only=False):
+        """Save to file.
+
+        Args:
+            project_folder: Path to project folder as a string.
+            sub_folder: Optional input for sub_folder (default: self.location).
+            overwrite: Set to False to keep the file if it already exists
+                (default: True).
+            changed_only: Set to True to only write the file if its content is
+                different from the saved file. The content is created once to
+                compare and write it (default: False).
+
+        Returns:
+            Path to file or None if the file is not written.
+        """
+        fp = self.file_path(project_folder, sub_folder)
 
         if not overwrite and os.path.isfile(fp):
             return
 
-        with open(fp, "wb") as outf:
-            outf.write(self.to_openfoam())
+        if changed_only:
+            content = self.to_openfoam()
+            content_hash = hashlib.md5(content).hexdigest()
+            if self.__saved_hash(fp) == content_hash:
+                return
+            with open(fp, "wb") as outf:
+                outf.write(content)
+        else:
+            md5 = hashlib.md5()
+            with open(fp, "wb") as outf:
+                for chunk in self.iter_openfoam():
+                    md5.update(chunk)
+                    outf.write(chunk)
+            content_hash = md5.hexdigest()
+
+        st = os.stat(fp)
+        self.__saved_files[fp] = (content_hash, st.st_mtime, st.st_size)
         return fp
 
     def __eq__(self, other):
@@ -397,3 +455,79 @@ def foam_file_from_file(filepath, name=None, header=False):
         del(_values['FoamFile'])
 
     return _values
+
+
+def _diff_values(original, new, path=()):
+    """Get paths to the values in new dictionary which are different in original.
+
+    Nested dictionaries are compared key by key and the values which are the same
+    object are skipped without comparing their content. Values of different
+    types are compared as strings (e.g. 1 and '1' are the same).
+
+    Returns:
+        A list of paths as tuples of keys.
+    """
+    changes = []
+    for key, value in new.iteritems():
+        try:
+            current = original[key]
+        except KeyError:
+            changes.append(path + (key,))
+            continue
+
+        if value is current:
+            continue
+        elif isinstance(value, dict) and isinstance(current, dict):
+            changes.extend(_diff_values(current, value, path + (key,)))
+        elif type(value) is type(current):
+            if value != current:
+                changes.append(path + (key,))
+        elif isinstance(value, dict) or isinstance(current, dict) or \
+                str(value) != str(current):
+            changes.append(path + (key,))
+
+    return changes
+
+
+def _is_foam_value(value, in_list=False):
+    """Check if a value should be written to a foam file.
+
+    None and empty values are not written except for empty dictionaries.
+    """
+    if isinstance(value, dict):
+        if not value:
+            return not in_list
+        return any(_is_foam_value(v) for v in value.itervalues())
+    elif isinstance(value, (list, tuple)):
+        return any(_is_foam_value(v, True) for v in value)
+    else:
+        return bool(value)
+
+
+def _foam_value(value):
+    """Convert a value to a string for a foam file."""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    elif isinstance(value, float):
+        return repr(value)
+    elif isinstance(value, (list, tuple)):
+        return '({})'.format(' '.join(_foam_value(v) for v in value
+                                      if _is_foam_value(v, True)))
+    return str(value)
+
+
+def _iter_foam_lines(values, indent):
+    """Iterate over lines of a foam dictionary."""
+    for key, value in values.iteritems():
+        if not _is_foam_value(value):
+            continue
+        if isinstance(value, dict):
+            if not value:
+                yield '{}{}{{}}'.format(indent, key)
+                continue
+            yield '{0}{1}\n{0}{{'.format(indent, key)
+            for line in _iter_foam_lines(value, indent + '    '):
+                yield line
+            yield '{}}}'.format(indent)
+        else:
+            yield '{}{}\t\t{};'.format(indent, key, _foam_value(value))
@@ -123,11 +123,13 @@ class Probes(Function):
             return
         self.values['functions']['probes']['writeInterval'] = str(int(value))
 
-    def save(self, project_folder, sub_folder=None):
+    def save(self, project_folder, sub_folder=None, overwrite=True,
+             changed_only=False):
         if self.probes_count == 0:
             return
         else:
-            super(Probes, self).save(project_folder, sub_folder)
+            return super(Probes, self).save(project_folder, sub_folder, overwrite,
+                                            changed_only)
 
     def __repr__(self):
         """Class representation."""
@@ -1,33 +1,170 @@
 # coding=utf-8
 """BF geometry library."""
 import os
+import math
+import hashlib
+from array import array
 from copy import deepcopy
 from .boundarycondition import IndoorWallBoundaryCondition
-from .stl import read_ascii_string
-from .vectormath import cross_product, rotate, angle_anitclockwise
+from .stl import read_ascii_string, iter_solids as iter_stl_solids
+from .stl.ascii import format_solid as format_stl_solid
+from .stl.binary import write_values as write_binary_stl_values
+from .vectormath import rotate, angle_anitclockwise
+
+
+class _VectorArray(object):
+    """A read-only sequence of (x, y, z) tuples stored in a flat array.
+
+    Attributes:
+        values: A flat array of x, y, z values.
+    """
+
+    __slots__ = ('values',)
+
+    def __init__(self, values):
+        self.values = values
+
+    @classmethod
+    def from_vectors(cls, vectors):
+        """Create a vector array from a sequence of (x, y, z) or a flat array."""
+        if isinstance(vectors, cls):
+            return vectors
+        elif isinstance(vectors, array):
+            return cls(vectors)
+        return cls(array('d', (c for v in vectors for c in v[:3])))
+
+    def __len__(self):
+        return len(self.values) // 3
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return tuple(self[i] for i in xrange(*key.indices(len(self))))
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError('vector index out of range')
+        return tuple(self.values[3 * key:3 * key + 3])
+
+    def __iter__(self):
+        v = self.values
+        for i in xrange(0, len(v), 3):
+            yield v[i], v[i + 1], v[i + 2]
+
+    def __eq__(self, other):
+        try:
+            return len(self) == len(other) and all(
+                tuple(a) == tuple(b) for a, b in zip(self, other))
+        except TypeError:
+            return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        return repr(tuple(self))
+
+
+class _FaceArray(object):
+    """A read-only sequence of face indices stored in a flat array.
+
+    Attributes:
+        indices: A flat array of vertex indices for all the faces.
+        width: Number of vertices for each face if all the faces have the same
+            number of vertices.
+        offsets: Offsets of faces in indices for faces with different number of
+            vertices. Vertex indices for face i are indices[offsets[i]:offsets[i + 1]].
+    """
+
+    __slots__ = ('indices', 'width', 'offsets')
+
+    def __init__(self, indices, width=3, offsets=None):
+        self.indices = indices
+        self.width = width
+        self.offsets = offsets
+
+    @classmethod
+    def from_faces(cls, faces):
+        """Create a face array from a sequence of face indices or a flat array."""
+        if isinstance(faces, cls):
+            return faces
+        elif isinstance(faces, array):
+            # flat array of triangles
+            return cls(faces, 3)
+        faces = tuple(tuple(f) for f in faces)
+        sizes = set(len(f) for f in faces)
+        indices = array('l', (i for f in faces for i in f))
+        if len(sizes) < 2:
+            return cls(indices, sizes.pop() if sizes else 3)
+
+        offsets = array('l', [0])
+        for f in faces:
+            offsets.append(offsets[-1] + len(f))
+        return cls(indices, None, offsets)
+
+    def __len__(self):
+        if self.offsets is None:
+            return len(self.indices) // self.width
+        return len(self.offsets) - 1
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return tuple(self[i] for i in xrange(*key.indices(len(self))))
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError('face index out of range')
+        if self.offsets is None:
+            return tuple(self.indices[self.width * key:self.width * (key + 1)])
+        return tuple(self.indices[self.offsets[key]:self.offsets[key + 1]])
+
+    def __iter__(self):
+        for i in xrange(len(self)):
+            yield self[i]
+
+    def __eq__(self, other):
+        try:
+            return len(self) == len(other) and all(
+                tuple(a) == tuple(b) for a, b in zip(self, other))
+        except TypeError:
+            return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        return repr(tuple(self))
 
 
 class _BFMesh(object):
     """Base mesh geometry.
 
+    Vertices, face indices and normals are stored in flat arrays and can be
+    accessed as sequences of tuples.
+
     Attributes:
         name: Name as a string (A-Z a-z 0-9 _).
         vertices: A flatten list of (x, y, z) for vertices.
         face_indices: A flatten list of (a, b, c) for indices for each face.
         normals: A flatten list of (x, y, z) for face normals.
+        merged_vertex_count: Number of vertices which were merged when the mesh
+            was created from an stl solid (default: 0). See weld_vertices.
     """
 
+    __slots__ = ('__name', '__vertices', '__face_indices', '__normals', '__min',
+                 '__max', '__convex_hull', '__content_hash', 'merged_vertex_count')
+
     def __init__(self, name, vertices, face_indices, normals=None):
         """Init Butterfly mesh."""
         self.name = name
+        self.merged_vertex_count = 0
 
-        self.__vertices = vertices
-        self.__face_indices = face_indices
+        self.__vertices = _VectorArray.from_vectors(vertices)
+        self.__face_indices = _FaceArray.from_faces(face_indices)
 
         if not normals:
             normals = self.__calculate_normals()
 
-        self.__normals = normals
+        self.__normals = _VectorArray.from_vectors(normals)
 
         assert len(self.__face_indices) == len(self.__normals), \
             "Length of face_indices (%d) " \
@@ -46,6 +183,7 @@ class _BFMesh(object):
         assert n.replace('_', '').isalnum(), \
             "Name can only be alphabet, numerical values or underscore."
         self.__name = n
+        self.__content_hash = None
 
     @property
     def isBFMesh(self):
@@ -54,9 +192,23 @@ class _BFMesh(object):
 
     @property
     def vertices(self):
-        """A flatten list of (x, y, z) for vertices."""
+        """A flatten list of (x, y, z) for vertices.
+
+        Vertices can be replaced by a new list with the same number of vertices
+        (e.g. to move the geometry). Normals and extents will be recalculated.
+        """
         return self.__vertices
 
+    @vertices.setter
+    def vertices(self, vertices):
+        vertices = _VectorArray.from_vectors(vertices)
+        assert len(vertices) == len(self.__vertices), \
+            "Number of vertices (%d) should be equal to current number of " \
+            "vertices (%d)" % (len(vertices), len(self.__vertices))
+        self.__vertices = vertices
+        self.__normals = _VectorArray(self.__calculate_normals())
+        self.__calculate_min_max()
+
     @property
     def face_indices(self):
         """A flatten list of (a, b, c) for indices for each face."""
@@ -75,41 +227,124 @@ class _BFMesh(object):
     def max(self):
         return self.__max
 
-    def __calculate_normals(self):
-        """Calculate normals from vertices."""
-        return tuple(self.__calculate_normal_from_points(
-            tuple(self.vertices[i] for i in ind)) for ind in self.face_indices)
+    @property
+    def content_hash(self):
+        """md5 hash of name, vertices, face indices and normals as a hex string.
 
-    @staticmethod
-    def __calculate_normal_from_points(pts):
-        """Calculate normal for three points."""
-        # vector between first point and the second point on the list
-        try:
-            pt1, pt2, pt3 = pts[:3]
-        except Exception as e:
-            raise ValueError('Failed to calculate normal:\n\t{}'.format(e))
+        The hash is calculated on the first request and is reused until the name
+        or vertices change. Use it to check if a saved geometry has changed.
+        """
+        if self.__content_hash is None:
+            md5 = hashlib.md5(self.__name.encode())
+            faces = self.__face_indices
+            for values in (self.__vertices.values, faces.indices, faces.offsets,
+                           self.__normals.values):
+                if values is None:
+                    continue
+                try:
+                    md5.update(values.tobytes())
+                except AttributeError:
+                    # python 2
+                    md5.update(values.tostring())
+            md5.update(str(faces.width).encode())
+            self.__content_hash = md5.hexdigest()
+        return self.__content_hash
 
-        v1 = (pt2[0] - pt1[0], pt2[1] - pt1[1], pt2[2] - pt1[2])
+    @property
+    def height_range(self):
+        """Minimum and maximum z values as a tuple."""
+        return self.__min[2], self.__max[2]
+
+    @property
+    def convex_hull(self):
+        """A tuple of (x, y) for 2D convex hull of vertices in anticlockwise order.
 
-        # vector between first point and the last point in the list
-        v2 = (pt3[0] - pt1[0], pt3[1] - pt1[1], pt3[2] - pt1[2])
+        The hull is calculated on the first request and is reused until vertices
+        change. Use the hull to calculate extents in any direction.
+        """
+        if self.__convex_hull is None:
+            v = self.__vertices.values
+            self.__convex_hull = tuple(convex_hull_2d(zip(v[0::3], v[1::3])))
+        return self.__convex_hull
 
-        return cross_product(v1, v2)
+    @property
+    def area(self):
+        """Total area of mesh faces."""
+        v = self.__vertices.values
+        area = 0.0
+        for face in self.__face_indices:
+            # sum of cross products around the face
+            x = y = z = 0.0
+            i = 3 * face[-1]
+            x0, y0, z0 = v[i], v[i + 1], v[i + 2]
+            for i in face:
+                i *= 3
+                x1, y1, z1 = v[i], v[i + 1], v[i + 2]
+                x += y0 * z1 - z0 * y1
+                y += z0 * x1 - x0 * z1
+                z += x0 * y1 - y0 * x1
+                x0, y0, z0 = x1, y1, z1
+            area += math.sqrt(x * x + y * y + z * z)
+        return area / 2.0
+
+    def __calculate_normals(self):
+        """Calculate normals from vertices."""
+        v = self.__vertices.values
+        faces = self.__face_indices
+        ind = faces.indices
+        starts = faces.offsets[:-1] if faces.offsets is not None else \
+            xrange(0, len(ind), faces.width)
+        normals = array('d')
+        for st in starts:
+            # vectors between first point and the second and third points
+            try:
+                i, j, k = 3 * ind[st], 3 * ind[st + 1], 3 * ind[st + 2]
+            except Exception as e:
+                raise ValueError('Failed to calculate normal:\n\t{}'.format(e))
+            ax, ay, az = v[j] - v[i], v[j + 1] - v[i + 1], v[j + 2] - v[i + 2]
+            bx, by, bz = v[k] - v[i], v[k + 1] - v[i + 1], v[k + 2] - v[i + 2]
+            nx, ny, nz = ay * bz - az * by, az * bx - ax * bz, ax * by - ay * bx
+            ln = math.sqrt(nx * nx + ny * ny + nz * nz)
+            if ln == 0:
+                raise ValueError('A vector with length of 0 cannot be normalized.')
+            normals.extend((nx / ln, ny / ln, nz / ln))
+        return normals
 
     def __calculate_min_max(self):
         """Calculate maximum and minimum x, y, z for this geometry."""
-        min_pt = list(self.vertices[0])
-        max_pt = list(self.vertices[0])
+        self.__convex_hull = None
+        self.__content_hash = None
+        v = self.__vertices.values
+        self.__min = [min(v[0::3]), min(v[1::3]), min(v[2::3])]
+        self.__max = [max(v[0::3]), max(v[1::3]), max(v[2::3])]
 
-        for v in self.vertices[1:]:
-            for i in xrange(3):
-                if v[i] < min_pt[i]:
-                    min_pt[i] = v[i]
-                elif v[i] > max_pt[i]:
-                    max_pt[i] = v[i]
+    def facet_values(self, convertToMeters=1):
+        """Get a flat array of 12 values for each face in STL order.
 
-        self.__min = min_pt
-        self.__max = max_pt
+        Values for each face are the normal followed by the first three vertices
+        (nx, ny, nz, x0, y0, z0, x1, y1, z1, x2, y2, z2).
+
+        Args:
+            convertToMeters: A value to scale the geometry to meters. For isinstance
+                if the mesh is in mm the value should be 0.001 (default: 1).
+        """
+        v = self.__vertices.values
+        if convertToMeters != 1:
+            v = array('d', (c * convertToMeters for c in v))
+        n = self.__normals.values
+        faces = self.__face_indices
+        ind = faces.indices
+        starts = faces.offsets[:-1] if faces.offsets is not None else \
+            xrange(0, len(ind), faces.width)
+
+        values = array('d')
+        for f, st in enumerate(starts):
+            f, i, j, k = 3 * f, 3 * ind[st], 3 * ind[st + 1], 3 * ind[st + 2]
+            values.extend((n[f], n[f + 1], n[f + 2],
+                           v[i], v[i + 1], v[i + 2],
+                           v[j], v[j + 1], v[j + 2],
+                           v[k], v[k + 1], v[k + 2]))
+        return values
 
     def to_stl(self, convertToMeters=1):
         """Get STL definition for this geometry as a string.
@@ -118,44 +353,22 @@ class _BFMesh(object):
             convertToMeters: A value to scale the geometry to meters. For isinstance
                 if the mesh is in mm the value should be 0.001 (default: 1).
         """
-        _hea = "solid {}".format(self.name)
-        _tale = "endsolid {}".format(self.name)
-        _body = "   facet normal {0} {1} {2}\n" \
-                "     outer loop\n" \
-                "       vertex {3} {4} {5}\n" \
-                "       vertex {6} {7} {8}\n" \
-                "       vertex {9} {10} {11}\n" \
-                "     endloop\n" \
-                "   endfacet"
-
-        _bodyCollector = tuple(_body.format(
-            self.__normals[count][0],
-            self.__normals[count][1],
-            self.__normals[count][2],
-            self.__vertices[faceInd[0]][0] * convertToMeters,
-            self.__vertices[faceInd[0]][1] * convertToMeters,
-            self.__vertices[faceInd[0]][2] * convertToMeters,
-            self.__vertices[faceInd[1]][0] * convertToMeters,
-            self.__vertices[faceInd[1]][1] * convertToMeters,
-            self.__vertices[faceInd[1]][2] * convertToMeters,
-            self.__vertices[faceInd[2]][0] * convertToMeters,
-            self.__vertices[faceInd[2]][1] * convertToMeters,
-            self.__vertices[faceInd[2]][2] * convertToMeters
-        ) for count, faceInd in enumerate(self.__face_indices))
-
-        return "{}\n{}\n{}\n".format(
-            _hea, "\n".join(_bodyCollector), _tale
-        )
-
-    def write_to_stl(self, folder, convertToMeters=1):
+        return ''.join(format_stl_solid(self.name, self.facet_values(convertToMeters)))
+
+    def write_to_stl(self, folder, convertToMeters=1, binary=False):
         """Save BFFace to a stl file. File name will be self.name.
 
         Args:
             convertToMeters: A value to scale the geometry to meters. For isinstance
                 if the mesh is in mm the value should be 0.001 (default: 1).
+            binary: Write the file in binary STL format (default: False).
         """
+        values = self.facet_values(convertToMeters)
         with open(os.path.join(folder, "{}.stl".format(self.name)), "wb") as outf:
-            outf.write(self.to_stl(convertToMeters))
+            if binary:
+                write_binary_stl_values(self.name, values, outf)
+            else:
+                outf.writelines(format_stl_solid(self.name, values))
 
     def duplicate(self):
         """Return a copy of this object."""
@@ -294,32 +507,115 @@ class BFBlockGeometry(BFGeometry):
         return self.__border_vertices
 
 
-def bf_geometry_from_stl_block(stl_block, convert_from_meters=1):
-    """Create BFGeometry from an stl block as a string."""
+def weld_vertices(corners, tolerance=0):
+    """Merge duplicate vertices of a triangle soup into a shared-vertex mesh.
+
+    Vertices are merged using a hash map on their coordinates. If tolerance is
+    set coordinates are snapped to a grid of this size before hashing and the
+    first vertex in each grid cell is kept.
+
+    Args:
+        corners: A flat array of x, y, z values for the three corners of each
+            triangle.
+        tolerance: Distance for merging vertices (default: 0 for only merging
+            the vertices at the exact same location).
+
+    Returns:
+        (vertices, face_indices, merged_count). vertices is a flat array of x, y,
+        z values, face_indices a flat array of three vertex indices for each
+        triangle and merged_count the number of vertices that were merged.
+    """
+    xs, ys, zs = corners[0::3], corners[1::3], corners[2::3]
+    if tolerance:
+        scale = 1.0 / tolerance
+        xs, ys, zs = (map(round, map(scale.__mul__, c)) for c in (xs, ys, zs))
+
+    # new indices are assigned in the order of first appearance
+    index = {}
+    get_index = index.setdefault
+    face_indices = array('l', [get_index(k, len(index)) for k in zip(xs, ys, zs)])
+
+    vertices = array('d')
+    count = 0
+    for n, i in enumerate(face_indices):
+        if i == count:
+            vertices.extend(corners[3 * n:3 * n + 3])
+            count += 1
+
+    return vertices, face_indices, len(face_indices) - count
+
+
+def bf_geometry_from_stl_block(stl_block, convert_from_meters=1, tolerance=0):
+    """Create BFGeometry from an stl block as a string.
+
+    Args:
+        stl_block: An ascii stl solid as a string.
+        convert_from_meters: A value to scale the geometry (default: 1).
+        tolerance: Distance for merging vertices (default: 0). See weld_vertices.
+    """
     solid = read_ascii_string(stl_block)
+    return bf_geometry_from_stl_solid(solid, convert_from_meters, tolerance)
+
+
+def bf_geometry_from_stl_solid(solid, convert_from_meters=1, tolerance=0):
+    """Create BFGeometry from an stl solid with shared vertices for facets.
+
+    Args:
+        solid: An stl.types.ArraySolid.
+        convert_from_meters: A value to scale the geometry (default: 1).
+        tolerance: Distance for merging vertices (default: 0). See weld_vertices.
+
+    Returns:
+        A BFGeometry. The number of merged vertices is set to its
+        merged_vertex_count.
+    """
+    values = solid.values
 
-    vertices = tuple(tuple(i * convert_from_meters for i in ver)
-                     for ver in tuple(solid.vertices))
+    # remove normals from facets
+    corners = array('d', values)
+    for i in (12, 11, 10):
+        del corners[0::i]
 
-    origi_ver = tuple(solid.vertices)
+    vertices, indices, merged_count = weld_vertices(corners, tolerance)
+    if convert_from_meters != 1:
+        vertices = array('d', (v * convert_from_meters for v in vertices))
 
-    indices = tuple(tuple(origi_ver.index(ver) for ver in facet.vertices)
-                    for facet in solid.facets)
-    normals = tuple(facet.normal for facet in solid.facets)
+    normals = array('d', [c for n in zip(values[0::12], values[1::12], values[2::12])
+                          for c in n])
 
-    return BFGeometry(solid.name, vertices, indices, normals)
+    geo = BFGeometry(solid.name, vertices, indices, normals)
+    geo.merged_vertex_count = merged_count
+    return geo
 
 
-def bf_geometry_from_stl_file(filepath, convert_from_meters=1):
-    """Return a tuple of BFGeometry from an stl file."""
+def iter_bf_geometries_from_stl_file(filepath, convert_from_meters=1,
+                                     tolerance=0):
+    """Create a BFGeometry for each solid in an stl file one at a time.
+
+    The file is read in chunks and only the current solid is kept in memory.
+    Binary stl files are detected and read automatically. If a solid doesn't
+    have a valid name the name of the file is used instead.
+
+    Args:
+        filepath: Path to an ascii or binary stl file.
+        convert_from_meters: A value to scale the geometry (default: 1).
+        tolerance: Distance for merging vertices (default: 0). See weld_vertices.
+    """
+    default_name = os.path.splitext(os.path.split(filepath)[-1])[0]
     with open(filepath, 'rb') as f:
-        line = ''.join(f.readlines())
+        for solid in iter_stl_solids(f):
+            name = solid.name.strip()
+            solid.name = name if name.replace('_', '').isalnum() else default_name
+            yield bf_geometry_from_stl_solid(solid, convert_from_meters, tolerance)
 
-    blocks = ('\nsolid{}'.format(t) if not t.startswith('solid') else '\n{}'.format(t)
-              for t in line.split('\nsolid'))
-    del(line)
 
-    return tuple(bf_geometry_from_stl_block(b, convert_from_meters) for b in blocks)
+def bf_geometry_from_stl_file(filepath, convert_from_meters=1, tolerance=0):
+    """Return a tuple of BFGeometry from an stl file.
+
+    See iter_bf_geometries_from_stl_file.
+    """
+    return tuple(iter_bf_geometries_from_stl_file(filepath, convert_from_meters,
+                                                  tolerance))
 
 
 def calculate_min_max_from_bf_geometries(geometries, x_axis=None):
@@ -342,23 +638,33 @@ def calculate_min_max_from_bf_geometries(geometries, x_axis=None):
 
         return min_pt, max_pt
     else:
-        # calculate min and max for each geometry in new coordinates
-        inf_p = float('+inf')
-        inf_n = float('-inf')
-        min_pt = [inf_p, inf_p, inf_p]
-        max_pt = [inf_n, inf_n, inf_n]
-
         angle = angle_anitclockwise((1, 0, 0), x_axis)
-        vertices = tuple(pts for geo in geometries
-                         for pts in calculate_min_max(geo, angle))
-        for v in vertices:
-            for i in xrange(3):
-                if v[i] < min_pt[i]:
-                    min_pt[i] = v[i]
-                elif v[i] > max_pt[i]:
-                    max_pt[i] = v[i]
+        return calculate_min_max_for_angles(geometries, (angle,))[0]
+
+
+def calculate_min_max_for_angles(geometries, angles):
+    """Calculate maximum and minimum x, y, z of geometries for several directions.
+
+    Only the points of the cached convex hull of the geometries are rotated for
+    each angle. Use this method instead of calling
+    calculate_min_max_from_bf_geometries for each wind direction.
+
+    Args:
+        geometries: A list of butterfly geometries.
+        angles: A list of anticlockwise rotation angles of the new coordinates
+            system in degrees.
 
-        return rotate((0, 0, 0), min_pt, angle), rotate((0, 0, 0), max_pt, angle)
+    Returns:
+        A list of (min_pt, max_pt) for each angle. Points are rotated back to XY
+        coordinates similar to calculate_min_max_from_bf_geometries.
+    """
+    hull = convex_hull_2d(pt for geo in geometries for pt in geo.convex_hull)
+    z_range = min(geo.height_range[0] for geo in geometries), \
+        max(geo.height_range[1] for geo in geometries)
+
+    return [(rotate((0, 0, 0), min_pt, angle), rotate((0, 0, 0), max_pt, angle))
+            for angle, (min_pt, max_pt) in
+            zip(angles, _calculate_rotated_min_max(hull, z_range, angles))]
 
 
 def calculate_min_max(geometry, angle):
@@ -366,23 +672,51 @@ def calculate_min_max(geometry, angle):
 
     angle: Anticlockwise rotation angle of the new coordinates system.
     """
-    # get list of vertices in the new coordinates system
-    vertices = (rotate((0, 0, 0), v, -angle) for v in geometry.vertices)
-
-    inf_p = float('+inf')
-    inf_n = float('-inf')
-    min_pt = [inf_p, inf_p, inf_p]
-    max_pt = [inf_n, inf_n, inf_n]
-
-    for v in vertices:
-        for i in xrange(3):
-            if v[i] < min_pt[i]:
-                min_pt[i] = v[i]
-            elif v[i] > max_pt[i]:
-                max_pt[i] = v[i]
-
-    # rotate them back to XY coordinates
-    return min_pt, max_pt
+    return _calculate_rotated_min_max(
+        geometry.convex_hull, geometry.height_range, (angle,))[0]
+
+
+def _calculate_rotated_min_max(points, z_range, angles):
+    """Calculate min and max of (x, y) points in rotated coordinates for angles."""
+    min_max = []
+    for angle in angles:
+        # rotate points by -angle
+        angle = math.radians(angle)
+        cosine, sine = math.cos(angle), math.sin(angle)
+        xs = [cosine * x + sine * y for x, y in points]
+        ys = [cosine * y - sine * x for x, y in points]
+        min_max.append(([min(xs), min(ys), z_range[0]],
+                        [max(xs), max(ys), z_range[1]]))
+    return min_max
+
+
+def convex_hull_2d(points):
+    """Calculate convex hull of points in XY plane.
+
+    Args:
+        points: A list of (x, y) points.
+
+    Returns:
+        A list of (x, y) points for the hull in anticlockwise order.
+    """
+    points = sorted(set(points))
+    if len(points) < 3:
+        return points
+
+    def half_hull(pts):
+        hull = []
+        for x, y in pts:
+            while len(hull) > 1:
+                (x0, y0), (x1, y1) = hull[-2], hull[-1]
+                if (x1 - x0) * (y - y0) - (y1 - y0) * (x - x0) > 0:
+                    break
+                hull.pop()
+            hull.append((x, y))
+        return hull
+
+    lower = half_hull(points)
+    upper = half_hull(reversed(points))
+    return lower[:-1] + upper[:-1]
 
 
 def dimensions_from_min_max(min_pt, max_pt, x_axis=None):
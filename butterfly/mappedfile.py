@@ -0,0 +1,337 @@
+# coding=utf-8
+"""Memory-mapped reader for OpenFOAM files in binary format.
+
+Lists are not loaded into memory. Items are unpacked from the mapped file on
+access so a large mesh or result can be post-processed a slice at a time.
+"""
+import os
+import re
+import sys
+import mmap
+import struct
+from array import array
+
+from .utilities import read_of_file_header, _of_typecode, OF_FIELD_WIDTHS
+
+
+class MappedList(object):
+    """A binary OpenFOAM list in a memory-mapped file.
+
+    Attributes:
+        buffer: Memory-mapped file.
+        offset: Offset of the first byte of the list in buffer.
+        size: Number of items in the list.
+        typecode: Array typecode for values (e.g. d for 64-bit scalars).
+        width: Number of values for each item (e.g. 3 for a vector list).
+        byteorder: Byte order of the values (little / big).
+    """
+
+    __slots__ = ('buffer', 'offset', 'size', 'typecode', 'width', 'byteorder',
+                 '__item')
+
+    def __init__(self, buffer, offset, size, typecode, width=1,
+                 byteorder='little'):
+        """Init a mapped list."""
+        self.buffer = buffer
+        self.offset = offset
+        self.size = size
+        self.typecode = typecode
+        self.width = width
+        self.byteorder = byteorder
+        fmt = {'i': 'i', 'l': 'q' if self.itemsize == 8 else 'i', 'q': 'q',
+               'f': 'f', 'd': 'd'}[typecode]
+        self.__item = struct.Struct(
+            '{}{}{}'.format('<' if byteorder == 'little' else '>', width, fmt))
+
+    @property
+    def itemsize(self):
+        """Size of each value in bytes."""
+        return array(self.typecode).itemsize
+
+    @property
+    def nbytes(self):
+        """Size of the list in bytes."""
+        return self.size * self.width * self.itemsize
+
+    def to_array(self, start=0, stop=None):
+        """Copy values for items start to stop into a flat array."""
+        start, stop, _ = slice(start, stop).indices(self.size)
+        values = array(self.typecode)
+        if stop <= start:
+            return values
+
+        data = self.__data(start, stop)
+        try:
+            values.frombytes(data)
+        except AttributeError:
+            # python 2
+            values.fromstring(data)
+
+        if self.byteorder != sys.byteorder:
+            values.byteswap()
+        return values
+
+    def view(self, start=0, stop=None):
+        """Get values for items start to stop in native byte order.
+
+        In Python 3 a zero-copy memoryview of the mapped file is returned and the
+        file can't be closed while the view is in use. memoryview can't be cast
+        to values in Python 2 and IronPython and the bytes for the items are
+        copied once from the mapped file to an array.
+        """
+        if self.byteorder != sys.byteorder:
+            raise ValueError(
+                'Values are in {} endian order. Use to_array.'.format(self.byteorder))
+        start, stop, _ = slice(start, stop).indices(self.size)
+        data = self.__data(start, max(start, stop))
+        try:
+            return data.cast(self.typecode)
+        except AttributeError:
+            # python 2
+            values = array(self.typecode)
+            values.fromstring(data)
+            return values
+
+    def __data(self, start, stop):
+        """Get bytes for items start to stop without copying the mapped file."""
+        step = self.width * self.itemsize
+        st = self.offset + start * step
+        try:
+            return buffer(self.buffer, st, (stop - start) * step)
+        except NameError:
+            # python 3
+            return memoryview(self.buffer)[st:self.offset + stop * step]
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.size)
+            values = self.to_array(start, stop)
+            if step == 1:
+                return values
+            w = self.width
+            return array(self.typecode, (
+                v for i in xrange(0, len(values), step * w) for v in values[i:i + w]))
+
+        if key < 0:
+            key += self.size
+        if not 0 <= key < self.size:
+            raise IndexError('list index out of range')
+
+        values = self.__item.unpack_from(
+            self.buffer, self.offset + key * self.__item.size)
+        return values[0] if self.width == 1 else values
+
+    def __iter__(self):
+        for i in xrange(self.size):
+            yield self[i]
+
+    def ToString(self):
+        """Overwrite .NET ToString method."""
+        return self.__repr__()
+
+    def __repr__(self):
+        """Mapped list representation."""
+        return 'MappedList::{}::{}'.format(self.typecode, self.size)
+
+
+class MappedFoamFile(object):
+    """Memory-mapped OpenFOAM file in binary format.
+
+    Use lists for polyMesh files (e.g. points, faces, owner) and internal_field
+    for volScalarField and volVectorField files. Gzip compressed files can't be
+    mapped. Use utilities.load_of_points_array, load_of_faces_array and
+    load_of_field_file instead.
+
+    Attributes:
+        filepath: Path to the file.
+        header: FoamFile header as a dictionary.
+    """
+
+    __list_start = re.compile(br'(\d+)\s*\(')
+    __internal_field = re.compile(
+        br'internalField\s+(?:uniform\s+([^;]*);'
+        br'|nonuniform\s+List<(\w+)>\s*(\d+)\s*\()')
+
+    def __init__(self, filepath):
+        """Init a memory-mapped foam file."""
+        assert os.path.isfile(filepath), 'Failed to find {}'.format(filepath)
+        if filepath.endswith('.gz'):
+            raise ValueError('Gzip compressed files can\'t be memory-mapped.')
+        self.filepath = filepath
+        self.__file = open(filepath, 'rb')
+        try:
+            self.__buffer = mmap.mmap(self.__file.fileno(), 0,
+                                      access=mmap.ACCESS_READ)
+        except Exception:
+            self.__file.close()
+            raise
+        self.header = read_of_file_header(self.__buffer)
+        self.__body = self.__buffer.tell()
+        self.__lists = None
+
+    @property
+    def is_binary(self):
+        """Return True if file format is binary."""
+        return self.header.get('format') == 'binary'
+
+    @property
+    def byteorder(self):
+        """Byte order for binary values (little / big)."""
+        return 'big' if self.header.get('arch', 'LSB').strip('"').startswith('MSB') \
+            else 'little'
+
+    @property
+    def lists(self):
+        """A tuple of MappedList for top-level lists in the file.
+
+        faces in faceCompactList format has two lists for offsets and indices.
+        """
+        if self.__lists is None:
+            self.__lists = tuple(self.__find_lists())
+        return self.__lists
+
+    @property
+    def internal_field(self):
+        """internalField values of a vol*Field file.
+
+        A MappedList is returned for a nonuniform field and the value is returned
+        as a float or a tuple for a uniform field.
+        """
+        self.__check_binary()
+        m = self.__internal_field.search(self.__buffer, self.__body)
+        if not m:
+            raise ValueError('Failed to find internalField in {}'.format(self.filepath))
+
+        if m.group(1) is not None:
+            value = tuple(float(v) for v in
+                          m.group(1).replace(b'(', b' ').replace(b')', b' ').split())
+            return value[0] if len(value) == 1 else value
+
+        kind = m.group(2).decode()
+        try:
+            width = OF_FIELD_WIDTHS[kind]
+        except KeyError:
+            raise ValueError('Unsupported field type: List<{}>'.format(kind))
+
+        return MappedList(
+            self.__buffer, m.end(), int(m.group(3)),
+            _of_typecode(self.header, 'label' if kind == 'label' else 'scalar'),
+            width, self.byteorder)
+
+    def __check_binary(self):
+        if not self.is_binary:
+            raise ValueError(
+                '{} is not in binary format.'.format(self.filepath))
+
+    def __find_lists(self):
+        """Find top-level lists by skipping over the binary data of each list."""
+        self.__check_binary()
+        cls = self.header.get('class', '')
+        if cls == 'vectorField':
+            typecode, width = _of_typecode(self.header, 'scalar'), 3
+        elif cls == 'scalarField':
+            typecode, width = _of_typecode(self.header, 'scalar'), 1
+        else:
+            # labelList, faceCompactList
+            typecode, width = _of_typecode(self.header, 'label'), 1
+
+        position = self.__body
+        while True:
+            m = self.__list_start.search(self.__buffer, position)
+            if not m:
+                break
+            values = MappedList(self.__buffer, m.end(), int(m.group(1)),
+                                typecode, width, self.byteorder)
+            position = m.end() + values.nbytes
+            if position > len(self.__buffer):
+                raise ValueError(
+                    'Unexpected end of file in the binary list: {}'.format(
+                        self.filepath))
+            yield values
+
+    def close(self):
+        """Close the memory-mapped file."""
+        self.__buffer.close()
+        self.__file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def ToString(self):
+        """Overwrite .NET ToString method."""
+        return self.__repr__()
+
+    def __repr__(self):
+        """Mapped foam file representation."""
+        return 'MappedFoamFile::{}::{}'.format(
+            self.header.get('class'), self.filepath)
+
+
+class MappedPolyMesh(object):
+    """Memory-mapped polyMesh in binary format.
+
+    Args:
+        folder: Path to polyMesh folder (e.g. constant/polyMesh).
+    """
+
+    def __init__(self, folder):
+        """Init a memory-mapped polyMesh."""
+        self.folder = folder
+        self.__files = {}
+
+    def __get_file(self, name):
+        if name not in self.__files:
+            self.__files[name] = MappedFoamFile(os.path.join(self.folder, name))
+        return self.__files[name]
+
+    @property
+    def points(self):
+        """Points as a MappedList of (x, y, z)."""
+        return self.__get_file('points').lists[0]
+
+    @property
+    def faces(self):
+        """Faces as (offsets, indices) MappedLists.
+
+        Vertex indices for face i are indices[offsets[i]:offsets[i + 1]].
+        """
+        lists = self.__get_file('faces').lists
+        if len(lists) != 2:
+            raise ValueError('Binary faces should be written as faceCompactList.')
+        return lists
+
+    @property
+    def owner(self):
+        """Owner cell for each face as a MappedList."""
+        return self.__get_file('owner').lists[0]
+
+    @property
+    def neighbour(self):
+        """Neighbour cell for each internal face as a MappedList."""
+        return self.__get_file('neighbour').lists[0]
+
+    def close(self):
+        """Close the memory-mapped files."""
+        for f in self.__files.itervalues():
+            f.close()
+        self.__files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def ToString(self):
+        """Overwrite .NET ToString method."""
+        return self.__repr__()
+
+    def __repr__(self):
+        """Mapped polyMesh representation."""
+        return 'MappedPolyMesh::{}'.format(self.folder)
@@ -0,0 +1,224 @@
+# coding=utf-8
+"""Butterfly mesh cache.
+
+Meshes are stored by a key which is calculated from the content of the files that
+define the mesh (blockMeshDict, snappyHexMeshDict, surfaceFeatureExtractDict and
+the stl files). A case with the same files can copy constant/polyMesh from the
+cache instead of running blockMesh and snappyHexMesh again. The least recently
+used meshes are removed once the cache is larger than its maximum size.
+"""
+import os
+import glob
+import stat
+import shutil
+import hashlib
+
+from .version import Version
+from .utilities import calculate_file_hash
+
+
+def _remove_readonly(func, path, exc_info):
+    """Make a read-only file writable and remove it again. see shutil.rmtree.
+
+    Only Windows fails to remove read-only files. Files are not made writable
+    in advance since a file in a case can be a hard link to a file in the
+    cache and both share the same permissions.
+    """
+    os.chmod(path, stat.S_IREAD | stat.S_IWRITE)
+    func(path)
+
+
+def _remove_file(path):
+    """Remove a file which can be read-only."""
+    try:
+        os.remove(path)
+    except OSError:
+        _remove_readonly(os.remove, path, None)
+
+
+class MeshCache(object):
+    """A local cache for OpenFOAM meshes.
+
+    Args:
+        folder: Path to cache folder (default: ~/butterfly/.meshcache).
+        max_size: Maximum size of the cache in bytes. Once the cache is larger
+            than max_size the least recently used meshes will be removed
+            (default: 10 GB).
+        hardlink: Set to True to hard-link mesh files into the case instead of
+            copying them. Cached files are read-only so OpenFOAM will fail to
+            overwrite a linked mesh instead of changing the cache. Use
+            Case.remove_polyMesh_content before meshing a linked case again
+            (default: False).
+    """
+
+    # files that define a mesh relative to case folder
+    INPUTS = (os.path.join('system', 'blockMeshDict'),
+              os.path.join('system', 'snappyHexMeshDict'),
+              os.path.join('system', 'surfaceFeatureExtractDict'),
+              os.path.join('constant', 'triSurface', '*.stl'))
+
+    def __init__(self, folder=None, max_size=10 * 1024 ** 3, hardlink=False):
+        """Init mesh cache."""
+        self.folder = folder or os.path.join(
+            os.path.expanduser('~'), 'butterfly', '.meshcache')
+        self.max_size = max_size
+        self.hardlink = hardlink and hasattr(os, 'link')
+
+    @property
+    def keys(self):
+        """Keys for meshes in the cache."""
+        if not os.path.isdir(self.folder):
+            return ()
+        return tuple(k for k in os.listdir(self.folder)
+                     if os.path.isfile(os.path.join(self.folder, k, 'size')))
+
+    @property
+    def size(self):
+        """Total size of the meshes in the cache in bytes."""
+        return sum(self.__entry_size(k) for k in self.keys)
+
+    def key(self, case):
+        """Calculate the key for the mesh of a saved case.
+
+        The key is a md5 hash of OpenFOAM version and the content of the files in
+        MeshCache.INPUTS. Meshing parameters are included through blockMeshDict
+        and snappyHexMeshDict.
+        """
+        md5 = hashlib.md5()
+        md5.update(Version.of_full_ver.encode('utf-8'))
+        for pattern in self.INPUTS:
+            for fp in sorted(glob.glob(os.path.join(case.project_dir, pattern))):
+                md5.update('{}:{}\n'.format(
+                    os.path.relpath(fp, case.project_dir).replace('\\', '/'),
+                    calculate_file_hash(fp)).encode('utf-8'))
+        return md5.hexdigest()
+
+    def has(self, key):
+        """Check if a mesh is in the cache."""
+        return os.path.isfile(os.path.join(self.folder, key, 'size'))
+
+    def get(self, key, polyMesh_folder):
+        """Copy a mesh from the cache to a polyMesh folder.
+
+        Current content of the polyMesh folder will be removed except
+        blockMeshDict.
+
+        Returns:
+            True if the mesh is found in the cache otherwise False.
+        """
+        if not self.has(key):
+            return False
+
+        entry = os.path.join(self.folder, key)
+        source = os.path.join(entry, 'polyMesh')
+
+        if os.path.isdir(polyMesh_folder):
+            for f in os.listdir(polyMesh_folder):
+                if f == 'blockMeshDict':
+                    continue
+                fp = os.path.join(polyMesh_folder, f)
+                if os.path.isdir(fp):
+                    shutil.rmtree(fp, onerror=_remove_readonly)
+                else:
+                    _remove_file(fp)
+
+        for root, dirs, files in os.walk(source):
+            target = os.path.join(polyMesh_folder, os.path.relpath(root, source))
+            if not os.path.isdir(target):
+                os.makedirs(target)
+            for f in files:
+                if self.hardlink:
+                    os.link(os.path.join(root, f), os.path.join(target, f))
+                else:
+                    shutil.copyfile(os.path.join(root, f), os.path.join(target, f))
+
+        # update last use time for LRU
+        os.utime(os.path.join(entry, 'size'), None)
+        return True
+
+    def put(self, key, polyMesh_folder):
+        """Add the mesh in a polyMesh folder to the cache.
+
+        blockMeshDict is not copied to the cache. The least recently used meshes
+        will be removed if the cache is larger than max_size.
+
+        Returns:
+            Size of the mesh in bytes.
+        """
+        entry = os.path.join(self.folder, key)
+        if self.has(key):
+            os.utime(os.path.join(entry, 'size'), None)
+            return self.__entry_size(key)
+
+        # copy to a temp folder first so a failed copy doesn't end up in cache
+        temp = '{}.{}.tmp'.format(entry, os.getpid())
+        if os.path.isdir(temp):
+            shutil.rmtree(temp, onerror=_remove_readonly)
+        shutil.copytree(polyMesh_folder, os.path.join(temp, 'polyMesh'),
+                        ignore=shutil.ignore_patterns('blockMeshDict'))
+
+        size = 0
+        for root, dirs, files in os.walk(temp):
+            for f in files:
+                fp = os.path.join(root, f)
+                size += os.path.getsize(fp)
+                # read-only so a hard-linked mesh can't be changed from a case
+                os.chmod(fp, stat.S_IREAD | stat.S_IRGRP | stat.S_IROTH)
+
+        with open(os.path.join(temp, 'size'), 'w') as sf:
+            sf.write(str(size))
+
+        try:
+            os.rename(temp, entry)
+        except OSError:
+            # the same mesh is added by another case
+            shutil.rmtree(temp, onerror=_remove_readonly)
+
+        self.evict()
+        return size
+
+    def remove(self, key):
+        """Remove a mesh from the cache."""
+        entry = os.path.join(self.folder, key)
+        if os.path.isdir(entry):
+            shutil.rmtree(entry, onerror=_remove_readonly)
+
+    def clear(self):
+        """Remove all the meshes from the cache."""
+        for key in self.keys:
+            self.remove(key)
+
+    def evict(self, max_size=None):
+        """Remove the least recently used meshes until cache is smaller than max_size.
+
+        Returns:
+            A tuple of removed keys.
+        """
+        max_size = self.max_size if max_size is None else max_size
+        entries = sorted(
+            (os.path.getmtime(os.path.join(self.folder, k, 'size')),
+             self.__entry_size(k), k) for k in self.keys)
+        total = sum(e[1] for e in entries)
+        removed = []
+        for last_used, size, key in entries:
+            if total <= max_size:
+                break
+            self.remove(key)
+            total -= size
+            removed.append(key)
+        return tuple(removed)
+
+    def __entry_size(self, key):
+        try:
+            with open(os.path.join(self.folder, key, 'size')) as sf:
+                return int(sf.read())
+        except (IOError, OSError, ValueError):
+            return 0
+
+    def ToString(self):
+        """Overwrite .NET ToString method."""
+        return self.__repr__()
+
+    def __repr__(self):
+        """Mesh cache representation."""
+        return 'MeshCache::{}::{} meshes'.format(self.folder, len(self.keys))
@@ -1,5 +1,9 @@
 """OpenFOAM/c++ dictionary parser."""
+import os
 import re
+import math
+from array import array
+from bisect import bisect_left, bisect_right
 from collections import OrderedDict
 
 
@@ -8,21 +12,49 @@ class CppDictParser(object):
 
     Use values property to get the dictionary.
 
+    The text is tokenized in a single pass and the tokens are folded into nested
+    dictionaries as they are read. Sub-dictionaries are returned as dictionaries
+    and every other entry is returned as a string with its whitespace collapsed.
+    Lists in parentheses, quoted strings, $macros and #directives (e.g.
+    #include "initialConditions") are kept as they are.
+
     Attributes:
         text: OpenFOAM dictionary as a single multiline string.
     """
 
+    # comments, whole entries, sub-dictionary keys and ends, quoted strings,
+    # #{ code #} blocks, punctuation and plain text. An entry without #directives
+    # and brackets is matched up to its ; and a sub-dictionary key up to its { so
+    # most of the entries are a single token. Plain text includes parentheses
+    # and a list is a single token.
+    __string = r'"[^"\\]*(?:\\.[^"\\]*)*"'
+    __tokens = re.compile(
+        r'(?P<comment>\s*(?://[^\n]*|/\*.*?\*/))'
+        r'|(?P<entry>[^{};"#/]*(?:(?:' + __string + r'|/(?![/*]))[^{};"#/]*)*;)'
+        r'|(?P<key>[^{};"#/()]*\{)'
+        r'|(?P<end>\s*\})'
+        r'|(?P<string>' + __string + r')'
+        r'|(?P<code>#\{.*?#\})'
+        r'|(?P<punct>[{};])'
+        r'|(?P<text>(?:[^{};"#/]|#(?!\{)|/(?![/*]))[^{};"#/]*'
+        r'(?:(?:#(?!\{)|/(?![/*]))[^{};"#/]*)*|.)',
+        re.DOTALL)
+
+    # an entry split to strings and plain text if it can't take the fast path
+    __entry_tokens = re.compile(r'(?P<string>' + __string + r')|(?P<text>[^"]+)')
+
+    # plain text split on parentheses for the arguments of #directives
+    __list_tokens = re.compile(r'(?P<punct>[()])|(?P<text>[^()]+)')
+
     def __init__(self, text):
         """Init an OpenFOAMDictParser."""
-        _t = self.remove_comments(text)
-        _t = ''.join(_t.replace('\r\n', ' ').replace('\n', ' '))
-        self.__values = self._convert_to_dict(self._parse_nested(_t))
+        self.__values = self._parse(text)
 
     @classmethod
     def from_file(cls, filepath):
         """Create a parser from an OpenFOAM file."""
         with open(filepath) as f:
-            return cls('\n'.join(f.readlines()))
+            return cls(f.read())
 
     @property
     def values(self):
@@ -37,55 +69,137 @@ class CppDictParser(object):
         # remove all occurance singleline comments (//COMMENT\n ) from string
         return re.sub(re.compile('//.*?\n'), '', text)
 
-    def _convert_to_dict(self, parsed):
-        """Convert parsed list to a dictionary."""
-        d = dict()
-        itp = iter(parsed)
-        for pp in itp:
-            if not isinstance(pp, list):
-                if pp.find(';') == -1:
-                    # if not a list and doesn't include ';' it's a key and
-                    # next item is the value
-                    d[pp.strip()] = self._convert_to_dict(next(itp))
-                else:
-                    s = pp.split(';')
-                    if not pp.endswith(';'):
-                        # last item is a key and next item is the value
-                        d[s[-1].strip()] = self._convert_to_dict(next(itp))
-                        s = s[:-1]
-                    for ppp in s:
-                        ss = ppp.split()
-                        if ss:
-                            d[ss[0].strip()] = ' '.join(ss[1:]).strip()
-        return d
+    def _parse(self, text):
+        """Tokenize text and convert it to a dictionary in a single pass."""
+        stack = [dict()]
+        pieces = []  # raw text for the current entry
+        depth = 0  # depth of parentheses in the current entry
+        directive = None  # name of the #directive for the current entry
 
-    @staticmethod
-    def _parse_nested(text, left=r'[{]', right=r'[}]', sep='#'):
-        """Parse nested.
+        def add_entry(entry):
+            kv = entry.split(None, 1)
+            if not kv:
+                return
+            stack[-1][kv[0]] = ' '.join(kv[1].split()) if len(kv) == 2 else ''
 
-        http://stackoverflow.com/a/14715850/4394669
-        """
-        pat = r'({}|{}|{})'.format(left, right, sep)
-        tokens = re.split(pat, text)
-        stack = [[]]
-        for x in tokens:
-            if not x.strip() or re.match(sep, x):
+        for m in self.__tokens.finditer(text):
+            kind = m.lastgroup
+            if kind == 'comment':
                 continue
-            if re.match(left, x):
-                # Nest a new list inside the current list
-                current = []
-                stack[-1].append(current)
-                stack.append(current)
-            elif re.match(right, x):
-                stack.pop()
-                if not stack:
-                    raise ValueError('error: opening bracket is missing')
+            token = m.group(kind)
+
+            if kind == 'entry' or kind == 'key' or kind == 'end':
+                if not pieces and not directive:
+                    # fast path for whole entries and sub-dictionaries
+                    if kind == 'entry':
+                        if '(' not in token or \
+                                token.count('(') == token.count(')'):
+                            kv = token[:-1].split(None, 1)
+                            if len(kv) == 2:
+                                stack[-1][kv[0]] = ' '.join(kv[1].split())
+                            elif kv:
+                                stack[-1][kv[0]] = ''
+                            continue
+                    elif kind == 'key':
+                        d = dict()
+                        key = token[:-1].strip()
+                        if key:
+                            stack[-1][key] = d
+                        stack.append(d)
+                        continue
+                    else:
+                        stack.pop()
+                        if not stack:
+                            raise ValueError('error: opening bracket is missing')
+                        continue
+                parts = [(t.lastgroup, t.group())
+                         for t in self.__entry_tokens.finditer(token[:-1])]
+                parts.append(('punct', token[-1]))
             else:
-                stack[-1].append(x.strip())
+                parts = ((kind, token),)
+
+            for kind, token in parts:
+                if kind == 'text':
+                    if not directive and (pieces or token.lstrip()[:1] != '#'):
+                        # plain text and lists
+                        pieces.append(token)
+                        if '(' in token or ')' in token:
+                            depth += token.count('(') - token.count(')')
+                            if depth < 0:
+                                # unbalanced ) is kept as part of the entry
+                                depth = 0
+                        continue
+                    # #directives are rare. split the text on parentheses to
+                    # find the end of their argument.
+                    tokens = [(t.lastgroup, t.group())
+                              for t in self.__list_tokens.finditer(token)]
+                else:
+                    tokens = ((kind, token),)
+
+                for kind, token in tokens:
+                    if kind == 'text' and not pieces and not directive and \
+                            token.lstrip().startswith('#'):
+                        # #include "file", #inputMode merge, etc. take one
+                        # argument and no ;
+                        words = token.split(None, 2)
+                        while words and words[0][0] == '#':
+                            if len(words) == 1:
+                                directive = words[0]
+                                break
+                            stack[-1][words[0]] = words[1]
+                            token = words[2] if len(words) == 3 else ''
+                            words = token.split(None, 2)
+                        else:
+                            pieces.append(token)
+                        continue
+
+                    if kind == 'punct' and depth == 0 and token != '(':
+                        if token == ')':
+                            # unbalanced ) is kept as part of the entry
+                            pieces.append(token)
+                            continue
+                        elif token == '{':
+                            # start of a sub-dictionary. The entry so far is
+                            # its key.
+                            d = dict()
+                            if directive:
+                                stack[-1][directive] = d
+                            elif pieces:
+                                stack[-1][''.join(pieces).strip()] = d
+                            stack.append(d)
+                        else:
+                            if directive:
+                                stack[-1][directive] = ''.join(pieces).strip()
+                            else:
+                                add_entry(''.join(pieces))
+                            if token == '}':
+                                stack.pop()
+                                if not stack:
+                                    raise ValueError(
+                                        'error: opening bracket is missing')
+                        pieces, directive = [], None
+                        continue
+
+                    pieces.append(token)
+                    if token == '(':
+                        depth += 1
+                    elif token == ')':
+                        depth -= 1
+
+                    if directive and depth == 0 and \
+                            (kind != 'text' or token.strip()):
+                        # the directive has its argument
+                        stack[-1][directive] = ''.join(pieces).strip()
+                        pieces, directive = [], None
+
         if len(stack) > 1:
-            print(stack)
             raise ValueError('error: closing bracket is missing')
-        return stack.pop()
+
+        if directive:
+            stack[-1][directive] = ''
+        else:
+            add_entry(''.join(pieces))
+        return stack[0]
 
     def ToString(self):
         """Overwrite ToString method."""
@@ -99,6 +213,14 @@ class CppDictParser(object):
 class ResidualParser(object):
     """Paeser for residual values from a log file.
 
+    The parser keeps the position of the last byte that it has read. Every call
+    to parse only reads the lines that are appended to the log file since the
+    last call which makes it cheap to poll the log file of a running solution.
+
+    Residuals are stored in columns: one array of floats for timesteps and one
+    array of floats for the initial residual of each quantity. If a quantity is
+    not solved for in a timestep its value will be nan.
+
     Attributes:
         filepath: Full file path to .log file.
         parser: If ture Parser will start parsing the values once initiated.
@@ -107,30 +229,52 @@ class ResidualParser(object):
     def __init__(self, filepath, parse=True):
         """Init residual parser."""
         self.filepath = filepath
-        self.__residuals = OrderedDict()
+        self.reset()
         if parse:
             self.parse()
 
+    def reset(self):
+        """Remove parsed values and start over from the beginning of the file."""
+        self.__times = array('d')
+        self.__residuals = OrderedDict()
+        self.__offset = 0
+        self.__partial_line = ''
+        self.timestep = None
+
     def parse(self):
-        """Parse the log file."""
-        # open the file
-        # try to find the first line with Time =
-        # send the file to a recursive residualParser
+        """Parse the lines that are added to the log file since the last parse.
+
+        Returns:
+            Number of new timesteps.
+        """
         try:
+            if os.path.getsize(self.filepath) < self.__offset:
+                # the log file is overwritten by a new run
+                self.reset()
+
             with open(self.filepath, 'rb') as f:
-                for line in f:
-                    if line.startswith('Time ='):
-                        self.timestep = self.__get_time(line)
-                        self.__residuals[self.timestep] = {}
-                        self.__parse_residuals(f)
+                f.seek(self.__offset)
+                lines = (self.__partial_line + f.read()).split('\n')
+                self.__offset = f.tell()
         except Exception as e:
             raise Exception('Failed to parse {}:\n\t{}'.format(self.filepath, e))
 
+        # the last line is not complete yet. keep it for the next parse.
+        self.__partial_line = lines.pop()
+        count = len(self.__times)
+        self.__parse_residuals(lines)
+        return len(self.__times) - count
+
     @property
     def residuals(self):
-        """Get residuals as a dictionary."""
+        """Get residuals as a dictionary of {quantity: array of values}."""
         return self.__residuals
 
+    @property
+    def quantities(self):
+        """Get list of quantities in the order that they appear in the log."""
+        return self.__residuals.keys()
+
     @property
     def time_range(self):
         """Get time range as a tuple."""
@@ -138,43 +282,147 @@ class ResidualParser(object):
         return _times[0], _times[-1]
 
     def get_times(self):
-        """Get time steps."""
-        return self.__residuals.keys()
+        """Get time steps as an array."""
+        return self.__times
+
+    def get_latest_residuals(self):
+        """Get residuals for the latest timestep as a dictionary."""
+        return OrderedDict((q, v[-1]) for q, v in self.__residuals.iteritems()
+                           if v and not math.isnan(v[-1]))
 
-    def get_residuals(self, quantity, time_range):
-        """Get residuals for a quantity."""
-        if quantity not in self.quantities:
+    def __slice(self, time_range):
+        """Get slice of time steps in time range as (t0 index, t1 index)."""
+        if not time_range:
+            return 0, len(self.__times)
+        try:
+            t0, t1 = time_range[0], time_range[1]
+        except IndexError as e:
+            raise ValueError('Failed to read time_range:\n{}'.format(e))
+
+        return bisect_left(self.__times, t0), bisect_right(self.__times, t1)
+
+    def get_residuals(self, quantity, time_range=None):
+        """Get residuals for a quantity.
+
+        Args:
+            quantity: A quantity name (e.g. Ux, p).
+            time_range: An optional (start, end) time range. Both ends are
+                included.
+        Returns:
+            An array of residual values.
+        """
+        if quantity not in self.__residuals:
             print ('Invalid quantity [{}]. Try from the list below:\n{}'
                    .format(quantity, self.quantities))
             return ()
 
-        if not time_range:
-            return (v[quantity] for v in self.__residuals.itervalues())
-        else:
-            available_time_range = self.time_range
-            try:
-                t0 = max(available_time_range[0], time_range[0])
-                t1 = min(available_time_range[1], time_range[1])
-            except IndexError as e:
-                raise ValueError('Failed to read time_range:\n{}'.format(e))
+        i0, i1 = self.__slice(time_range)
+        return self.__residuals[quantity][i0:i1]
 
-            return (self.__residuals[int(t)][quantity] for t in xrange(t0, t1))
+    def decimate(self, quantity, count=1000, time_range=None):
+        """Get a reduced number of residuals for a quantity for plotting.
+
+        Args:
+            quantity: A quantity name (e.g. Ux, p).
+            count: Maximum number of values (default: 1000).
+            time_range: An optional (start, end) time range.
+        Returns:
+            (times, residuals) as two arrays.
+        """
+        if quantity not in self.__residuals:
+            print ('Invalid quantity [{}]. Try from the list below:\n{}'
+                   .format(quantity, self.quantities))
+            return (), ()
+
+        i0, i1 = self.__slice(time_range)
+        step = max(1, int(math.ceil((i1 - i0) / float(count))))
+        return self.__times[i0:i1:step], self.__residuals[quantity][i0:i1:step]
+
+    def slope(self, quantity, window=100):
+        """Slope of log10 of residuals per timestep for the last timesteps.
+
+        A steep negative slope means the residuals are still dropping and a slope
+        close to 0 means they have reached a plateau.
+
+        Args:
+            quantity: A quantity name (e.g. Ux, p).
+            window: Number of latest timesteps to be used (default: 100).
+        """
+        values = self.__residuals[quantity][-window:]
+        times = self.__times[-len(values):]
+        points = tuple((t, math.log10(v)) for t, v in zip(times, values)
+                       if v > 0)
+        if len(points) < 2:
+            return None
+
+        # least squares fit
+        n = float(len(points))
+        mx = sum(p[0] for p in points) / n
+        my = sum(p[1] for p in points) / n
+        sxx = sum((p[0] - mx) ** 2 for p in points)
+        if not sxx:
+            return None
+        return sum((p[0] - mx) * (p[1] - my) for p in points) / sxx
+
+    def is_converged(self, residual=None, tolerance=1e-4, window=100,
+                     quantities=None):
+        """Check if the solution has converged.
+
+        A quantity is converged if its latest residual is less than residual or
+        if log10 of its residuals has reached a plateau for the last timesteps.
+
+        Args:
+            residual: Target residual value (default: None).
+            tolerance: Maximum absolute slope of log10 of residuals per timestep
+                to be considered as a plateau (default: 1e-4).
+            window: Number of latest timesteps to check for a plateau
+                (default: 100).
+            quantities: List of quantities to be checked (default: all).
+        """
+        latest = self.get_latest_residuals()
+        quantities = quantities or latest.keys()
+        if not quantities:
+            return False
+
+        for q in quantities:
+            if residual is not None and latest.get(q, residual) < residual:
+                continue
+            if len(self.__times) < window:
+                return False
+            s = self.slope(q, window)
+            if s is None or abs(s) > tolerance:
+                return False
+
+        return True
 
     @staticmethod
     def __get_time(line):
-        return int(line.split('Time =')[-1])
+        t = line.split('Time =')[-1].strip()
+        try:
+            return int(t)
+        except ValueError:
+            return float(t)
 
-    def __parse_residuals(self, f):
-        for line in f:
-            if not line.startswith('Time ='):
+    def __parse_residuals(self, lines):
+        times = self.__times
+        residuals = self.__residuals
+        nan = float('nan')
+        for line in lines:
+            if line.startswith('Time ='):
+                self.timestep = self.__get_time(line)
+                times.append(self.timestep)
+                for v in residuals.itervalues():
+                    v.append(nan)
+            elif self.timestep is not None:
                 try:
                     # quantity, Initial residual, Final residual, No Iterations
                     q, ir, fr, ni = line.split(':  Solving for ')[1].split(',')
-                    self.__residuals[self.timestep][q] = ir.split('= ')[-1]
-                except IndexError:
-                    pass
-            else:
-                self.timestep = self.__get_time(line)
-                self.__residuals[self.timestep] = {}
-
-        self.quantities = self.__residuals[self.timestep].keys()
+                    ir = float(ir.split('= ')[-1])
+                except (IndexError, ValueError):
+                    continue
+                try:
+                    residuals[q][-1] = ir
+                except KeyError:
+                    # new quantity
+                    residuals[q] = array('d', (nan,) * len(times))
+                    residuals[q][-1] = ir
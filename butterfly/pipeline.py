@@ -0,0 +1,460 @@
+# coding=utf-8
+"""Butterfly Pipeline.
+
+A pipeline runs the steps of a case (blockMesh, surfaceFeatureExtract,
+snappyHexMesh, checkMesh and the solver) as a graph of dependencies. Each step
+declares its input and output files. Once a step is executed successfully the
+fingerprints of its inputs and outputs are stored in log/pipeline.json and the
+step will be skipped in the next runs as long as they haven't changed. Steps which
+don't depend on each other run at the same time.
+"""
+import os
+import glob
+import json
+import hashlib
+import threading
+from collections import namedtuple, OrderedDict
+
+try:
+    from Queue import Queue, Empty
+except ImportError:
+    # python 3
+    from queue import Queue, Empty
+
+from .utilities import calculate_file_hash
+
+
+class Step(object):
+    """A step in a butterfly Pipeline.
+
+    Args:
+        name: A unique name for this step.
+        func: A function with no arguments to execute the step. The step fails if
+            the function raises an exception or returns False or an object with
+            success set to False (e.g. the namedtuple from Case.command).
+        depends_on: Name of the steps that should be executed before this step.
+        inputs: Path to input files or folders relative to case folder. Glob
+            patterns are accepted. e.g. ('system/blockMeshDict',
+            'constant/triSurface/*.stl')
+        outputs: Path to output files or folders relative to case folder. Glob
+            patterns are accepted. e.g. ('constant/polyMesh',)
+    """
+
+    def __init__(self, name, func, depends_on=None, inputs=None, outputs=None):
+        """Init step."""
+        self.name = name
+        assert callable(func), '{} is not callable.'.format(func)
+        self.func = func
+        self.depends_on = tuple(depends_on or ())
+        self.inputs = tuple(os.path.normpath(p) for p in inputs or ())
+        self.outputs = tuple(os.path.normpath(p) for p in outputs or ())
+
+    def execute(self):
+        """Execute the step.
+
+        Returns:
+            (success, error)
+        """
+        log = namedtuple('log', 'success error')
+        try:
+            res = self.func()
+        except Exception as e:
+            return log(False, '{}: {}'.format(e.__class__.__name__, e))
+
+        if res is False:
+            return log(False, '{} failed.'.format(self.name))
+        elif hasattr(res, 'success') and not res.success:
+            return log(False, getattr(res, 'error', None) or
+                       '{} failed.'.format(self.name))
+        return log(True, None)
+
+    def ToString(self):
+        """Overwrite .NET ToString method."""
+        return self.__repr__()
+
+    def __repr__(self):
+        """Step representation."""
+        return 'Step::{}'.format(self.name)
+
+
+class Pipeline(object):
+    """Butterfly Pipeline.
+
+    Args:
+        case: A butterfly case.
+        steps: A list of Steps. Steps should be added after the steps that they
+            depend on.
+    """
+
+    def __init__(self, case, steps=None):
+        """Init pipeline."""
+        assert hasattr(case, 'isCase'), \
+            'ValueError:: {} is not a Butterfly.Case'.format(case)
+        self.__case = case
+        self.__steps = OrderedDict()
+        # file hashes by full path as ((mtime, size), md5). see fingerprint
+        self.__file_hashes = {}
+        for step in steps or ():
+            self.add_step(step)
+
+    @classmethod
+    def from_case(cls, case, solution=None, mesh_cache=None):
+        """Create the meshing pipeline for a case.
+
+        blockMesh and surfaceFeatureExtract run in parallel. snappyHexMesh runs
+        once both of them are finished and is followed by checkMesh and the
+        solution if provided. butterfly doesn't write surfaceFeatureExtractDict
+        and surfaceFeatureExtract is only added if the case folder already has
+        system/surfaceFeatureExtractDict.
+
+        Args:
+            case: A butterfly case.
+            solution: An optional butterfly Solution to be executed after
+                checkMesh.
+            mesh_cache: An optional MeshCache. If the mesh for the case is in the
+                cache blockMesh and snappyHexMesh will copy the mesh from the
+                cache instead of running. New meshes are added to the cache.
+        """
+        _polyMesh = os.path.join('constant', 'polyMesh')
+        _stl = os.path.join('constant', 'triSurface', '*.stl')
+
+        def block_mesh():
+            if mesh_cache and mesh_cache.has(mesh_cache.key(case)):
+                # snappyHexMesh will copy the mesh from cache
+                return True
+            return case.blockMesh()
+
+        def snappy_hex_mesh():
+            if not mesh_cache:
+                return case.snappyHexMesh(args=('-overwrite',))
+
+            key = mesh_cache.key(case)
+            if mesh_cache.get(key, case.polyMesh_folder):
+                print('Butterfly loaded the mesh from cache: {}'.format(key))
+                return True
+            log = case.snappyHexMesh(args=('-overwrite',))
+            if log.success:
+                mesh_cache.put(key, case.polyMesh_folder)
+            return log
+
+        steps = [
+            Step('blockMesh', block_mesh,
+                 inputs=(os.path.join('system', 'blockMeshDict'),),
+                 outputs=(_polyMesh,))
+        ]
+
+        _sfe_dict = os.path.join('system', 'surfaceFeatureExtractDict')
+        if os.path.isfile(os.path.join(case.project_dir, _sfe_dict)):
+            steps.append(
+                Step('surfaceFeatureExtract', case.surfaceFeatureExtract,
+                     inputs=(_sfe_dict, _stl),
+                     outputs=(os.path.join('constant', 'triSurface', '*.eMesh'),)))
+
+        steps.extend((
+            Step('snappyHexMesh', snappy_hex_mesh,
+                 depends_on=tuple(s.name for s in steps),
+                 inputs=(os.path.join('system', 'snappyHexMeshDict'), _stl),
+                 outputs=(_polyMesh,)),
+            Step('checkMesh', case.check_mesh,
+                 depends_on=('snappyHexMesh',),
+                 outputs=(os.path.join('log', 'checkMesh.log'),))
+        ))
+
+        if solution:
+            steps.append(cls.solution_step(solution, depends_on=('checkMesh',)))
+
+        return cls(case, steps)
+
+    @staticmethod
+    def solution_step(solution, depends_on=None):
+        """Create a step to run a butterfly Solution.
+
+        The step is named after the application of the recipe (e.g. simpleFoam).
+
+        Args:
+            solution: A butterfly Solution.
+            depends_on: Name of the steps that should be executed before the
+                solution (default: None).
+        """
+        def run_solution():
+            log = namedtuple('log', 'success error')
+            solution.run(wait=True)
+            failed, err = solution.case.runmanager.check_file_contents(
+                solution.err_files, mute=True)
+            return log(not failed, err)
+
+        return Step(solution.recipe.application, run_solution,
+                    depends_on=depends_on,
+                    inputs=('0', os.path.join('constant', '*Properties'),
+                            os.path.join('constant', 'g'),
+                            os.path.join('system', 'controlDict'),
+                            os.path.join('system', 'fvSchemes'),
+                            os.path.join('system', 'fvSolution')),
+                    outputs=(os.path.join('log', solution.recipe.log_file),))
+
+    @property
+    def case(self):
+        """Butterfly case."""
+        return self.__case
+
+    @property
+    def steps(self):
+        """Steps in the order that they are added."""
+        return tuple(self.__steps.values())
+
+    @property
+    def manifest_file(self):
+        """Path to the file that keeps fingerprints of executed steps."""
+        return os.path.join(self.case.log_folder, 'pipeline.json')
+
+    def add_step(self, step):
+        """Add a step to pipeline."""
+        assert isinstance(step, Step), '{} is not a Step.'.format(step)
+        assert step.name not in self.__steps, \
+            'A step named {} already exists.'.format(step.name)
+        for dep in step.depends_on:
+            assert dep in self.__steps, \
+                '{} depends on {} which is not in the pipeline.'.format(
+                    step.name, dep)
+        self.__steps[step.name] = step
+
+    def get_step(self, name):
+        """Get a step by name."""
+        return self.__steps[name]
+
+    def downstream(self, name):
+        """Get name of all the steps that depend on a step directly or indirectly."""
+        names = set((name,))
+        for step in self.steps:
+            if names.intersection(step.depends_on):
+                names.add(step.name)
+        names.remove(name)
+        return names
+
+    def fingerprint(self, patterns):
+        """Calculate a single hash for a list of files and folders.
+
+        Args:
+            patterns: A list of paths or glob patterns relative to case folder.
+
+        Returns:
+            A md5 hex string or None if no file is found.
+        """
+        project_dir = self.case.project_dir
+        files = []
+        for pattern in patterns:
+            for p in sorted(glob.glob(os.path.join(project_dir, pattern))):
+                if os.path.isdir(p):
+                    for root, dirs, names in os.walk(p):
+                        dirs.sort()
+                        files.extend(os.path.join(root, n) for n in sorted(names))
+                else:
+                    files.append(p)
+
+        if not files:
+            return None
+
+        md5 = hashlib.md5()
+        for f in files:
+            md5.update(('{}:{}\n'.format(
+                os.path.relpath(f, project_dir).replace('\\', '/'),
+                self.__file_hash(f))).encode('utf-8'))
+        return md5.hexdigest()
+
+    def __file_hash(self, fp):
+        """Get file hash and reuse the hash if the file hasn't changed."""
+        st = os.stat(fp)
+        key = (st.st_mtime, st.st_size)
+        try:
+            cached_key, md5 = self.__file_hashes[fp]
+        except KeyError:
+            pass
+        else:
+            if cached_key == key:
+                return md5
+
+        md5 = calculate_file_hash(fp)
+        self.__file_hashes[fp] = (key, md5)
+        return md5
+
+    def load_manifest(self):
+        """Load fingerprints of the steps from the latest executions."""
+        try:
+            with open(self.manifest_file, 'rb') as inf:
+                return json.loads(inf.read().decode('utf-8'))
+        except (IOError, OSError, ValueError):
+            return {'steps': {}, 'artifacts': {}}
+
+    def __save_manifest(self, manifest):
+        if not os.path.isdir(self.case.log_folder):
+            os.makedirs(self.case.log_folder)
+        with open(self.manifest_file, 'wb') as outf:
+            outf.write(json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+
+    def __key(self, step, keys):
+        """Key of a step based on its inputs and the keys of its dependencies."""
+        md5 = hashlib.md5()
+        md5.update(('{}:{}\n'.format(step.name, self.fingerprint(step.inputs)))
+                   .encode('utf-8'))
+        for dep in step.depends_on:
+            md5.update('{}:{}\n'.format(dep, keys[dep]).encode('utf-8'))
+        return md5.hexdigest()
+
+    def plan(self, force=False):
+        """Get name of the steps that should be executed.
+
+        A step is executed if its inputs or the steps that it depends on have
+        changed since the last successful execution or if its outputs are missing
+        or have been changed outside the pipeline. An output which wasn't created
+        by the last successful execution (e.g. no *.eMesh from surfaceFeatureExtract)
+        is up to date as long as it is still missing. If a step that should be
+        executed overwrites the output of a previous step (e.g. snappyHexMesh
+        overwrites constant/polyMesh from blockMesh) the previous step will be
+        executed too.
+
+        Args:
+            force: Set to True to execute all the steps.
+        """
+        if force:
+            return tuple(self.__steps)
+
+        manifest = self.load_manifest()
+        recorded = manifest['steps']
+        artifacts = manifest['artifacts']
+        keys = {}
+        stale = set()
+        for step in self.steps:
+            keys[step.name] = self.__key(step, keys)
+            # outputs shouldn't be changed outside the pipeline. a missing output
+            # is recorded as None once the step is executed.
+            is_up_to_date = step.name in recorded and \
+                recorded[step.name]['key'] == keys[step.name] and \
+                all(o in artifacts and artifacts[o] == self.fingerprint((o,))
+                    for o in step.outputs)
+
+            if not is_up_to_date or stale.intersection(step.depends_on):
+                stale.add(step.name)
+
+        # steps that produce an artifact which is overwritten by a stale step. if
+        # the artifact is still the output of the step (e.g. snappyHexMesh has
+        # failed before changing constant/polyMesh) the step doesn't run again.
+        changed = True
+        while changed:
+            changed = False
+            for step in self.steps:
+                if step.name in stale:
+                    continue
+                outputs = recorded[step.name]['outputs']
+                down = self.downstream(step.name)
+                overwritten = set(o for s in down.intersection(stale)
+                                  for o in self.__steps[s].outputs)
+                if any(outputs.get(o) != artifacts.get(o)
+                       for o in overwritten.intersection(step.outputs)):
+                    stale.add(step.name)
+                    stale.update(down)
+                    changed = True
+
+        return tuple(name for name in self.__steps if name in stale)
+
+    def run(self, force=False, max_workers=None):
+        """Execute the steps that are not up to date.
+
+        Independent steps are executed at the same time. Once a step fails the
+        steps that depend on it won't be executed. The successful steps are
+        recorded so the next run resumes from the failed step.
+
+        Args:
+            force: Set to True to execute all the steps (default: False).
+            max_workers: Maximum number of steps to be executed at the same time.
+                By default there is no limit.
+
+        Returns:
+            A namedtuple as (success, executed, skipped, failed, errors).
+            success: True if all the steps are up to date.
+            executed: Name of the steps that are executed successfully.
+            skipped: Name of the steps that were up to date.
+            failed: Name of the steps that failed or were not executed because a
+                step that they depend on has failed.
+            errors: A dictionary of error messages for failed steps.
+        """
+        report = namedtuple('report', 'success executed skipped failed errors')
+        to_run = self.plan(force)
+        skipped = tuple(name for name in self.__steps if name not in to_run)
+        max_workers = max_workers or len(to_run) or 1
+
+        manifest = self.load_manifest()
+        if force:
+            manifest = {'steps': {}, 'artifacts': {}}
+
+        # keys of finished steps. keys are calculated once a step is executed.
+        keys = {}
+        for name in skipped:
+            keys[name] = self.__key(self.__steps[name], keys)
+
+        pending = list(to_run)
+        running = set()
+        executed, failed, errors = [], [], {}
+        results = Queue()
+
+        def execute(step):
+            results.put((step.name, step.execute()))
+
+        while pending or running:
+            # start steps which their dependencies are finished
+            for name in tuple(pending):
+                if len(running) >= max_workers:
+                    break
+                step = self.__steps[name]
+                if any(dep not in keys for dep in step.depends_on):
+                    continue
+                pending.remove(name)
+                running.add(name)
+                print('Butterfly pipeline is running {}...'.format(name))
+                thread = threading.Thread(target=execute, args=(step,))
+                thread.daemon = True
+                thread.start()
+
+            if not running:
+                break
+
+            # get with a timeout so KeyboardInterrupt is not blocked in python 2
+            while True:
+                try:
+                    name, log = results.get(timeout=0.1)
+                except Empty:
+                    continue
+                break
+            running.remove(name)
+            step = self.__steps[name]
+            if not log.success:
+                failed.append(name)
+                errors[name] = log.error
+                print('Butterfly pipeline failed to run {}:\n{}'.format(
+                    name, log.error))
+                # remove steps that depend on the failed step
+                down = self.downstream(name)
+                for n in tuple(pending):
+                    if n in down:
+                        pending.remove(n)
+                        failed.append(n)
+                continue
+
+            keys[name] = self.__key(step, keys)
+            outputs = dict((o, self.fingerprint((o,))) for o in step.outputs)
+            manifest['steps'][name] = {'key': keys[name], 'outputs': outputs}
+            manifest['artifacts'].update(outputs)
+            # save after each step so a failed run resumes from the last step
+            self.__save_manifest(manifest)
+            executed.append(name)
+
+        failed.extend(pending)
+        return report(not failed, tuple(executed), skipped, tuple(failed), errors)
+
+    def ToString(self):
+        """Overwrite .NET ToString method."""
+        return self.__repr__()
+
+    def __repr__(self):
+        """Pipeline representation."""
+        return 'Pipeline::{}::{}'.format(
+            self.case.project_name, ' -> '.join(self.__steps))
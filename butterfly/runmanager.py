@@ -2,8 +2,7 @@
 """Runmanager for butterfly.
 
 Run manager is only useful for running OpenFOAM for Windows which runs in a
-docker container. For linux systems simply use .bash files or libraries such as
-pyFOAM.
+docker container. For linux systems use RunManagerPosix from runmanager_posix.
 """
 import os
 import ctypes
@@ -44,6 +43,8 @@ class RunManager(object):
         assert os.name == 'nt', "Currently RunManager is only supported on Windows."
 
         self.__project_name = project_name
+        self.__project_folder = os.path.join(
+            os.path.expanduser('~'), 'butterfly', project_name)
         self.__separator = '&'
         self.is_using_docker_machine = True \
             if hasattr(Version, 'is_using_docker_machine') and \
@@ -57,6 +58,9 @@ class RunManager(object):
         self.log_folder = './log'
         self.errFolder = './log'
         self._pid = None
+        self._process = None
+        # pid files for the latest command. see run
+        self._pidfiles = ()
 
     @property
     def container_id(self):
@@ -66,9 +70,27 @@ class RunManager(object):
 
         return self.__containerId
 
+    @property
+    def process(self):
+        """Return Popen process for the latest command."""
+        return self._process
+
     @property
     def pid(self):
-        """Return PID for the latest command."""
+        """Return PID for the latest command.
+
+        Each command writes its PID inside the container to log/{cmd}.pid as it
+        starts. PID is None if the command has not started yet.
+        """
+        for pidfile in reversed(self._pidfiles):
+            try:
+                with open(pidfile, 'rb') as pf:
+                    self._pid = int(pf.read().strip())
+            except (IOError, OSError, ValueError):
+                # the command has not started yet
+                continue
+            else:
+                return self._pid
         return self._pid
 
     @property
@@ -155,7 +177,11 @@ class RunManager(object):
         self.__containerId = _id
 
     def get_pid(self, command, timeout=5):
-        """Get pid of a command."""
+        """Get pid of a command by name using pgrep inside the container.
+
+        Use pid property for the latest command. It reads the PID that is written
+        by the command itself and doesn't need to poll the container.
+        """
         if not self.container_id:
             self.get_container_id()
 
@@ -181,6 +207,7 @@ class RunManager(object):
             self.get_container_id()
         pid = pid or self.pid
         if not pid:
+            print('Failed to find PID. The command has not started yet.')
             return
         if force:
             killer = 'docker exec -i {} kill -9 {}'.format(self.container_id, pid)
@@ -290,8 +317,10 @@ class RunManager(object):
         # containerId is found. put the commands together
         _base = 'start /wait docker exec -i {} su - ofuser -c ' \
             '"cd /home/ofuser/workingDir/butterfly/{}; {}"'
-        _basecmd = '{0} {1} > >(%s %s/{2}.log) 2> >(%s %s/{2}.err >&2)' \
-            % (tee, self.log_folder, tee, self.errFolder)
+        # run the command in background to write its pid and wait for it
+        _basecmd = '{0} {1} > >(%s %s/{2}.log) 2> >(%s %s/{2}.err >&2) & ' \
+            'echo $! > %s/{2}.pid; wait $!' \
+            % (tee, self.log_folder, tee, self.errFolder, self.log_folder)
 
         # join arguments for the command
         arguments = '' if not args else '{}'.format(' '.join(args))
@@ -340,24 +369,28 @@ class RunManager(object):
         # get the command as a single line
         cmd, logfiles, errfiles = self.command(command, args, decomposeParDict)
 
+        # remove pid files from previous runs. commands write them as they start.
+        self._pid = None
+        self._pidfiles = tuple(
+            os.path.normpath(os.path.join(self.__project_folder, f[:-4] + '.pid'))
+            for f in logfiles)
+        for pidfile in self._pidfiles:
+            if os.path.isfile(pidfile):
+                os.remove(pidfile)
+
         # run the command.
         # shell should be True to run multiple commands at the same time.
         log = namedtuple('log', 'process logfiles errorfiles')
         p = Popen(cmd, shell=True)
-        c = command.split()[0].strip()
-        if c in ('blockMesh', 'surfaceFeatureExtract', 'postProcess'):
-            timeout = 1
-        else:
-            timeout = 5
-        time.sleep(0.5)  # wait 0.5 second to make sure the command has started
-        ppid = self.get_pid(command.split()[0], timeout)
-        print('Butterfly is running {}. PID: {}'.format(command, ppid))
+        self._process = p
+        print('Butterfly is running {}.'.format(command))
         if wait:
             p.communicate()
             # once over try to kill the process if exist.
             # This will ensure that the command will be terminated even if the
             # user has canceled the run by closing the batch window.
-            self.terminate(ppid)
+            if p.returncode != 0 and self.pid:
+                self.terminate(self.pid)
 
         return log(p, logfiles, errfiles)
 
@@ -0,0 +1,416 @@
+# coding=utf-8
+"""Runmanager for butterfly on Linux and other POSIX systems.
+
+OpenFOAM should be installed and sourced so its executables (blockMesh,
+simpleFoam, etc.) are available on PATH. Commands are launched from argument
+lists without a shell and their outputs are redirected to the log files.
+"""
+import os
+import signal
+import threading
+from subprocess import Popen
+from collections import namedtuple
+from copy import deepcopy
+from shutil import rmtree
+
+try:
+    string_types = basestring
+except NameError:
+    # python 3
+    string_types = str
+
+
+class ProcessChain(object):
+    """Run a sequence of commands one after another.
+
+    ProcessChain exposes the parts of Popen that butterfly uses (pid, poll, wait,
+    returncode, terminate and kill) so a single command and a chain of commands
+    for a parallel run are handled the same way. Each command runs in its own
+    process group so terminating the chain also stops the children of the
+    command (e.g. mpirun ranks). The chain stops at the first command that fails.
+
+    Args:
+        commands: A list of commands as argument lists. e.g. (('blockMesh',),)
+        logfiles: Full path to log file for each command. stdout is written to
+            this file.
+        errorfiles: Full path to error file for each command. stderr is written
+            to this file.
+        cwd: Working directory for commands (default: None).
+        env: Environment variables for commands. By default the environment of
+            the current process is used (default: None).
+        on_success: An optional function to be called once all the commands are
+            executed successfully (default: None).
+    """
+
+    def __init__(self, commands, logfiles, errorfiles, cwd=None, env=None,
+                 on_success=None):
+        """Init process chain."""
+        assert len(commands) == len(logfiles) == len(errorfiles), \
+            'Length of commands, logfiles and errorfiles should be the same.'
+        self.commands = tuple(tuple(cmd) for cmd in commands)
+        self.logfiles = tuple(logfiles)
+        self.errorfiles = tuple(errorfiles)
+        self.cwd = cwd
+        self.env = env
+        self.on_success = on_success
+        self.returncode = None
+        self.returncodes = []
+        self.__process = None
+        self.__thread = None
+        self.__terminated = False
+        self.__lock = threading.Lock()
+
+    @property
+    def process(self):
+        """Popen process for the command which is running or has run last."""
+        return self.__process
+
+    @property
+    def pid(self):
+        """PID of the command which is running or has run last."""
+        if self.__process:
+            return self.__process.pid
+
+    def start(self, wait=True):
+        """Start running the commands.
+
+        The first command is launched before this method returns so an OSError is
+        raised if the command cannot be found. If wait is False the rest of the
+        commands are executed in a background thread.
+        """
+        assert self.__process is None, 'ProcessChain has already started.'
+        self.__launch(0)
+        if wait:
+            self.__run()
+        else:
+            self.__thread = threading.Thread(target=self.__run)
+            # do not keep the interpreter alive for a running solution
+            self.__thread.daemon = True
+            self.__thread.start()
+        return self
+
+    def __launch(self, index):
+        """Launch a command and redirect its outputs to log files."""
+        cmd = self.commands[index]
+        with open(self.logfiles[index], 'wb') as outf, \
+                open(self.errorfiles[index], 'wb') as errf:
+            try:
+                self.__process = Popen(
+                    cmd, stdout=outf, stderr=errf, cwd=self.cwd, env=self.env,
+                    close_fds=True, preexec_fn=os.setsid)
+            except OSError as e:
+                raise OSError(
+                    'Failed to run "{}": {}\nMake sure OpenFOAM is installed and '
+                    'its environment is sourced.'.format(' '.join(cmd), e))
+
+    def __run(self):
+        """Wait for commands and launch the next one once a command is finished."""
+        try:
+            for index in range(len(self.commands)):
+                if index > 0:
+                    with self.__lock:
+                        if self.__terminated:
+                            break
+                        try:
+                            self.__launch(index)
+                        except OSError as e:
+                            with open(self.errorfiles[index], 'ab') as errf:
+                                errf.write(str(e).encode('utf-8'))
+                            self.returncodes.append(127)
+                            break
+
+                code = self.__process.wait()
+                self.returncodes.append(code)
+                if code != 0:
+                    if code > 0 and os.path.getsize(self.errorfiles[index]) == 0:
+                        # make sure the failure shows up in the error file
+                        with open(self.errorfiles[index], 'ab') as errf:
+                            errf.write('{} exited with code {}.'.format(
+                                self.commands[index][0], code).encode('utf-8'))
+                    break
+            else:
+                if self.on_success:
+                    self.on_success()
+        except BaseException:
+            # on_success failed or waiting for the command was interrupted
+            if not self.returncodes or self.returncodes[-1] == 0:
+                self.returncodes.append(1)
+            raise
+        finally:
+            # set returncode last so poll only reports a finished chain
+            self.returncode = next((c for c in self.returncodes if c != 0), 0)
+
+    def poll(self):
+        """Return None if the chain is still running otherwise the return code."""
+        return self.returncode
+
+    def wait(self):
+        """Wait until the chain is finished and return the return code."""
+        if self.__thread:
+            # join with a timeout so KeyboardInterrupt is not blocked
+            while self.__thread.is_alive():
+                self.__thread.join(0.1)
+        return self.returncode
+
+    def send_signal(self, sig):
+        """Send a signal to the process group of the running command."""
+        with self.__lock:
+            self.__terminated = True
+            if self.returncode is not None or self.__process is None or \
+                    self.__process.returncode is not None:
+                return
+            try:
+                os.killpg(self.__process.pid, sig)
+            except OSError:
+                # process group is already gone
+                pass
+
+    def terminate(self):
+        """Terminate the chain. The remaining commands won't be executed."""
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self):
+        """Kill the chain. The remaining commands won't be executed."""
+        self.send_signal(signal.SIGKILL)
+
+    def ToString(self):
+        """Overwrite .NET ToString method."""
+        return self.__repr__()
+
+    def __repr__(self):
+        """Process chain representation."""
+        return 'ProcessChain::{}::{}'.format(
+            ' | '.join(cmd[0] for cmd in self.commands),
+            'running' if self.returncode is None else self.returncode)
+
+
+class RunManagerPosix(object):
+    """RunManager to run OpenFOAM commands on Linux and other POSIX systems.
+
+    Commands are executed as argument lists without a shell. stdout and stderr
+    of each command are written directly to log and err files under log folder.
+
+    Args:
+        project_name: A string for project name.
+        project_folder: Full path to project folder. By default the project
+            folder is set to ~/butterfly/project_name.
+        env: An optional dictionary of environment variables for commands. Use
+            it to set PATH to a different OpenFOAM installation (default: None).
+    """
+
+    def __init__(self, project_name, project_folder=None, env=None):
+        """Init run manager for project."""
+        self.__project_name = project_name
+        self.project_folder = project_folder or os.path.join(
+            os.path.expanduser('~'), 'butterfly', project_name)
+        self.env = env
+        self.log_folder = './log'
+        self.errFolder = './log'
+        self._process = None
+
+    @property
+    def process(self):
+        """Return ProcessChain for the latest command."""
+        return self._process
+
+    @property
+    def pid(self):
+        """Return PID for the latest command."""
+        if self._process:
+            return self._process.pid
+
+    @property
+    def returncode(self):
+        """Return exit code for the latest command or None if it is running."""
+        if self._process:
+            return self._process.returncode
+
+    def terminate(self, pid=None, force=False):
+        """Kill the command using the pid.
+
+        Args:
+            pid: An optional pid. By default the latest command will be terminated.
+            force: Set to True to kill the command with SIGKILL instead of SIGTERM.
+        """
+        sig = signal.SIGKILL if force else signal.SIGTERM
+        if pid and (not self._process or pid != self._process.pid):
+            try:
+                os.kill(pid, sig)
+            except OSError as e:
+                print('Failed to terminate {}:\n\t{}'.format(pid, e))
+        elif self._process:
+            self._process.send_signal(sig)
+
+    @staticmethod
+    def _split_args(args):
+        """Split arguments to a flat tuple of arguments."""
+        if not args:
+            return ()
+        elif isinstance(args, string_types):
+            return tuple(args.split())
+        return tuple(a for arg in args if arg for a in str(arg).split())
+
+    def command(self, cmd, args=None, decomposeParDict=None, include_header=True):
+        """Get argument lists for an OpenFOAM command in parallel or serial.
+
+        Args:
+            cmd: An OpenFOAM command or a list of commands.
+            args: List of optional arguments for command. e.g. ('-latestTime',)
+            decomposeParDict: decomposeParDict for parallel runs (default: None).
+            include_header: Not used. The environment is inherited from the
+                current process or env input.
+        Returns:
+            (cmd, logfiles, errorfiles)
+            cmd: A tuple of commands as argument lists.
+        """
+        res = namedtuple('log', 'cmd logfiles errorfiles')
+        if isinstance(cmd, string_types):
+            return self.__command(cmd, args, decomposeParDict)
+        elif isinstance(cmd, (list, tuple)):
+            # a list of commands
+            logs = []
+            for count, c in enumerate(cmd):
+                if c == 'blockMesh':
+                    decomposeParDict = None
+                try:
+                    arg = args[count]
+                except TypeError:
+                    arg = args
+
+                logs.append(self.__command(c, (arg,), decomposeParDict))
+
+            return res(tuple(c for log in logs for c in log.cmd),
+                       tuple(ff for log in logs for ff in log.logfiles),
+                       tuple(ff for log in logs for ff in log.errorfiles))
+
+    def __command(self, cmd, args=None, decomposeParDict=None):
+        """Get argument lists for a single OpenFOAM command."""
+        res = namedtuple('log', 'cmd logfiles errorfiles')
+        cmd = tuple(cmd.split())
+        arguments = cmd[1:] + self._split_args(args)
+        cmd = cmd[0]
+
+        if decomposeParDict:
+            # run in parallel
+            n = str(decomposeParDict.numberOfSubdomains)
+            reconstruct = ('reconstructParMesh', '-constant') \
+                if cmd == 'snappyHexMesh' else ('reconstructPar',)
+            cmds = (
+                ('decomposePar',),
+                ('mpirun', '-np', n, cmd) + arguments + ('-parallel',),
+                reconstruct
+            )
+            cmd_name_list = ('decomposePar', cmd, reconstruct[0])
+        else:
+            # run is serial
+            cmds = ((cmd,) + arguments,)
+            cmd_name_list = (cmd,)
+
+        errfiles = tuple('{}/{}.err'.format(self.errFolder, name)
+                         for name in cmd_name_list)
+        logfiles = tuple('{}/{}.log'.format(self.log_folder, name)
+                         for name in cmd_name_list)
+
+        return res(cmds, logfiles, errfiles)
+
+    def remove_processor_folders(self):
+        """Remove processor folders after a parallel run."""
+        for d in os.listdir(self.project_folder):
+            fp = os.path.join(self.project_folder, d)
+            if d.startswith('processor') and os.path.isdir(fp):
+                try:
+                    rmtree(fp)
+                except Exception as e:
+                    print('Failed to remove processor folder:\n{}'.format(e))
+
+    def run(self, command, args=None, decomposeParDict=None, wait=True):
+        """Run OpenFOAM command.
+
+        Returns:
+            (process, logfiles, errorfiles)
+            process: A ProcessChain for the commands.
+        """
+        log = namedtuple('log', 'process logfiles errorfiles')
+        cmds, logfiles, errfiles = self.command(command, args, decomposeParDict)
+
+        for folder in set((self.log_folder, self.errFolder)):
+            folder = os.path.join(self.project_folder, folder)
+            if not os.path.isdir(folder):
+                try:
+                    os.makedirs(folder)
+                except OSError:
+                    # created by another command which is running in parallel
+                    pass
+
+        on_success = self.remove_processor_folders if decomposeParDict else None
+        process = ProcessChain(
+            cmds,
+            tuple(os.path.join(self.project_folder, f) for f in logfiles),
+            tuple(os.path.join(self.project_folder, f) for f in errfiles),
+            self.project_folder, self.env, on_success)
+        self._process = process
+
+        try:
+            process.start(wait=False)
+            print('Butterfly is running {}. PID: {}'.format(command, process.pid))
+            if wait:
+                process.wait()
+        except KeyboardInterrupt:
+            process.terminate()
+            print('The process is interrupted by user!')
+
+        return log(process, logfiles, errfiles)
+
+    def check_file_contents(self, files, mute=False):
+        """Check files for content and print them out if any.
+
+        args:
+            files: A list of ASCII files.
+
+        returns:
+            (hasContent, content)
+            hasContent: A boolean that shows if there is any contents.
+            content: Files content if any
+        """
+        def read_file(f):
+            try:
+                with open(f, 'r') as log:
+                    return log.read().strip()
+            except Exception as e:
+                err = 'Failed to read {}:\n\t{}'.format(f, e)
+                print(err)
+                return ''
+
+        _lines = '\n'.join(tuple(read_file(f) for f in files)).strip()
+
+        if len(_lines) > 0:
+            if not mute:
+                print(_lines)
+            return True, _lines
+        else:
+            return False, _lines
+
+    def duplicate(self):
+        """Return a copy of this object."""
+        return deepcopy(self)
+
+    def __deepcopy__(self, memo):
+        """Copy run manager without the running process.
+
+        ProcessChain holds a lock and a thread which can't be copied and a copy
+        of the run manager shouldn't be able to terminate the original command.
+        """
+        cls = self.__class__
+        result = cls.__new__(cls)
+        memo[id(self)] = result
+        for k, v in self.__dict__.items():
+            setattr(result, k, None if k == '_process' else deepcopy(v, memo))
+        return result
+
+    def ToString(self):
+        """Overwrite .NET ToString method."""
+        return self.__repr__()
+
+    def __repr__(self):
+        """Run manager representation."""
+        return """RunManager::{}""".format(self.__project_name)
@@ -0,0 +1,378 @@
+# coding=utf-8
+"""Sample cell values at arbitrary points without running postProcess."""
+import os
+import math
+from array import array
+from heapq import heappush, heapreplace
+
+from .utilities import load_of_points_array, load_of_faces_array, \
+    load_of_labels_array
+
+
+def calculate_cell_centres(points, offsets, indices, owner, neighbour):
+    """Calculate cell centres for a polyMesh.
+
+    Cell centres are calculated the same way as OpenFOAM. Faces are split into
+    triangles around their average point to calculate face centres and areas.
+    Cells are split into pyramids from their faces to an estimated centre (the
+    average of face centres) and the cell centre is the volume-weighted average
+    of the centres of the pyramids.
+
+    Args:
+        points: A flat array of x, y, z values for points.
+        offsets: Face offsets (see utilities.load_of_faces_array).
+        indices: Face vertex indices (see utilities.load_of_faces_array).
+        owner: Owner cell for each face.
+        neighbour: Neighbour cell for each internal face.
+
+    Returns:
+        A flat array of x, y, z values for cell centres.
+    """
+    cell_count = max(max(owner), max(neighbour) if neighbour else -1) + 1
+    face_count = len(offsets) - 1
+    internal_count = len(neighbour)
+    small = 1e-300
+
+    # face centres and area vectors
+    fc = array('d', [0.0]) * (3 * face_count)
+    fa = array('d', [0.0]) * (3 * face_count)
+    # sum of face centres and number of faces for estimated cell centres
+    ex = [0.0] * cell_count
+    ey = [0.0] * cell_count
+    ez = [0.0] * cell_count
+    en = [0] * cell_count
+
+    for f in xrange(face_count):
+        vertices = [3 * v for v in indices[offsets[f]:offsets[f + 1]]]
+        n = len(vertices)
+        px = sum(points[v] for v in vertices) / n
+        py = sum(points[v + 1] for v in vertices) / n
+        pz = sum(points[v + 2] for v in vertices) / n
+
+        # triangles from each edge to the average point
+        nx = ny = nz = 0.0
+        sa = sax = say = saz = 0.0
+        x0, y0, z0 = points[vertices[-1]], points[vertices[-1] + 1], \
+            points[vertices[-1] + 2]
+        for v in vertices:
+            x1, y1, z1 = points[v], points[v + 1], points[v + 2]
+            ux, uy, uz = x1 - x0, y1 - y0, z1 - z0
+            wx, wy, wz = px - x0, py - y0, pz - z0
+            tx = uy * wz - uz * wy
+            ty = uz * wx - ux * wz
+            tz = ux * wy - uy * wx
+            a = math.sqrt(tx * tx + ty * ty + tz * tz)
+            nx += tx
+            ny += ty
+            nz += tz
+            sa += a
+            sax += a * (x0 + x1 + px)
+            say += a * (y0 + y1 + py)
+            saz += a * (z0 + z1 + pz)
+            x0, y0, z0 = x1, y1, z1
+
+        if sa > small:
+            px, py, pz = sax / (3 * sa), say / (3 * sa), saz / (3 * sa)
+        fc[3 * f], fc[3 * f + 1], fc[3 * f + 2] = px, py, pz
+        fa[3 * f], fa[3 * f + 1], fa[3 * f + 2] = 0.5 * nx, 0.5 * ny, 0.5 * nz
+
+        for c in ((owner[f], neighbour[f]) if f < internal_count else (owner[f],)):
+            ex[c] += px
+            ey[c] += py
+            ez[c] += pz
+            en[c] += 1
+
+    for c in xrange(cell_count):
+        if en[c]:
+            ex[c] /= en[c]
+            ey[c] /= en[c]
+            ez[c] /= en[c]
+
+    # pyramids from faces to the estimated cell centres
+    sx = [0.0] * cell_count
+    sy = [0.0] * cell_count
+    sz = [0.0] * cell_count
+    sv = [0.0] * cell_count
+    for f in xrange(face_count):
+        px, py, pz = fc[3 * f], fc[3 * f + 1], fc[3 * f + 2]
+        ax, ay, az = fa[3 * f], fa[3 * f + 1], fa[3 * f + 2]
+        for c, sign in ((owner[f], 1), (neighbour[f], -1)) if f < internal_count \
+                else ((owner[f], 1),):
+            # 3 x pyramid volume. area vector points out of the owner cell.
+            vol = sign * (ax * (px - ex[c]) + ay * (py - ey[c]) + az * (pz - ez[c]))
+            vol = max(vol, small)
+            sx[c] += vol * (0.75 * px + 0.25 * ex[c])
+            sy[c] += vol * (0.75 * py + 0.25 * ey[c])
+            sz[c] += vol * (0.75 * pz + 0.25 * ez[c])
+            sv[c] += vol
+
+    centres = array('d', [0.0]) * (3 * cell_count)
+    for c in xrange(cell_count):
+        v = sv[c]
+        if v > small:
+            centres[3 * c] = sx[c] / v
+            centres[3 * c + 1] = sy[c] / v
+            centres[3 * c + 2] = sz[c] / v
+        else:
+            centres[3 * c] = ex[c]
+            centres[3 * c + 1] = ey[c]
+            centres[3 * c + 2] = ez[c]
+
+    return centres
+
+
+class KDTree(object):
+    """A static KD-tree for nearest neighbour queries on 3D points.
+
+    Args:
+        points: A flat array of x, y, z values or a list of (x, y, z) points.
+        leaf_size: Maximum number of points in a leaf (default: 16).
+    """
+
+    def __init__(self, points, leaf_size=16):
+        """Build the tree."""
+        try:
+            points[0][0]
+        except TypeError:
+            # flat list of values
+            xyz = (points[0::3], points[1::3], points[2::3])
+        except IndexError:
+            # empty list
+            xyz = ((), (), ())
+        else:
+            xyz = tuple(zip(*points)) or ((), (), ())
+
+        self.__xyz = tuple(list(c) for c in xyz)
+        self.leaf_size = max(1, int(leaf_size))
+
+        # nodes are stored in parallel lists. axis is -1 for leaves and for a
+        # leaf left and right are the range of its points in self.__order.
+        self.__axis = []
+        self.__split = []
+        self.__left = []
+        self.__right = []
+        self.__order = []
+        if self.__xyz[0]:
+            self.__build(list(xrange(len(self.__xyz[0]))))
+
+    def __len__(self):
+        return len(self.__xyz[0])
+
+    def __add_node(self, axis, split, left, right):
+        self.__axis.append(axis)
+        self.__split.append(split)
+        self.__left.append(left)
+        self.__right.append(right)
+        return len(self.__axis) - 1
+
+    def __build(self, ids):
+        """Build the tree nodes for ids and return the root node index."""
+        if len(ids) <= self.leaf_size:
+            st = len(self.__order)
+            self.__order.extend(ids)
+            return self.__add_node(-1, 0.0, st, len(self.__order))
+
+        # split along the longest side of the bounding box
+        spread = []
+        for c in self.__xyz:
+            values = [c[i] for i in ids]
+            spread.append(max(values) - min(values))
+        axis = spread.index(max(spread))
+        if not spread[axis]:
+            # all the points are at the same location
+            st = len(self.__order)
+            self.__order.extend(ids)
+            return self.__add_node(-1, 0.0, st, len(self.__order))
+
+        coordinates = self.__xyz[axis]
+        ids.sort(key=coordinates.__getitem__)
+        mid = len(ids) // 2
+        node = self.__add_node(axis, coordinates[ids[mid]], -1, -1)
+        self.__left[node] = self.__build(ids[:mid])
+        self.__right[node] = self.__build(ids[mid:])
+        return node
+
+    def query(self, point, k=1):
+        """Find k nearest points to a point.
+
+        Args:
+            point: A point as (x, y, z).
+            k: Number of nearest points (default: 1).
+
+        Returns:
+            A list of (squared distance, index) sorted by distance.
+        """
+        x, y, z = point[0], point[1], point[2]
+        xs, ys, zs = self.__xyz
+        axes, splits, lefts, rights = \
+            self.__axis, self.__split, self.__left, self.__right
+        order = self.__order
+
+        # max heap of (-squared distance, index)
+        heap = []
+        if not order:
+            return heap
+
+        best = -1
+        worst = float('inf')
+        pt = (x, y, z)
+        stack = [(0, 0.0)]
+        while stack:
+            node, bound = stack.pop()
+            if bound >= worst:
+                continue
+            axis = axes[node]
+            if axis == -1:
+                for i in order[lefts[node]:rights[node]]:
+                    dx = xs[i] - x
+                    dy = ys[i] - y
+                    dz = zs[i] - z
+                    d = dx * dx + dy * dy + dz * dz
+                    if d >= worst:
+                        continue
+                    elif k == 1:
+                        best, worst = i, d
+                    elif len(heap) < k:
+                        heappush(heap, (-d, i))
+                        if len(heap) == k:
+                            worst = -heap[0][0]
+                    else:
+                        heapreplace(heap, (-d, i))
+                        worst = -heap[0][0]
+                continue
+
+            diff = pt[axis] - splits[node]
+            if diff < 0:
+                near, far = lefts[node], rights[node]
+            else:
+                near, far = rights[node], lefts[node]
+            far_bound = diff * diff
+            if far_bound < bound:
+                far_bound = bound
+            stack.append((far, far_bound))
+            stack.append((near, bound))
+
+        if k == 1:
+            return [(worst, best)]
+        return sorted((-d, i) for d, i in heap)
+
+    def nearest(self, points):
+        """Find the index of the nearest point for each point in points."""
+        query = self.query
+        return array('l', (query(pt)[0][1] for pt in points))
+
+    def ToString(self):
+        """Overwrite .NET ToString method."""
+        return self.__repr__()
+
+    def __repr__(self):
+        """KDTree representation."""
+        return 'KDTree::{}'.format(len(self))
+
+
+class CellSampler(object):
+    """Sample cell values at points using the cell centres of a mesh.
+
+    Args:
+        centres: A flat array of x, y, z values or a list of (x, y, z) for cell
+            centres.
+        leaf_size: Maximum number of cells in a KD-tree leaf (default: 16).
+    """
+
+    def __init__(self, centres, leaf_size=16):
+        """Init cell sampler."""
+        self.tree = KDTree(centres, leaf_size)
+
+    @classmethod
+    def from_polyMesh(cls, folder, leaf_size=16):
+        """Create a sampler from the cell centres of a polyMesh folder.
+
+        Args:
+            folder: Path to polyMesh folder (e.g. constant/polyMesh).
+        """
+        points = load_of_points_array(os.path.join(folder, 'points'))
+        offsets, indices = load_of_faces_array(os.path.join(folder, 'faces'))
+        owner = load_of_labels_array(os.path.join(folder, 'owner'))
+        neighbour = load_of_labels_array(os.path.join(folder, 'neighbour'))
+        return cls(calculate_cell_centres(points, offsets, indices, owner,
+                                          neighbour), leaf_size)
+
+    @property
+    def cell_count(self):
+        """Number of cells."""
+        return len(self.tree)
+
+    def nearest_cells(self, points):
+        """Get the index of the cell with the nearest centre for each point."""
+        return self.tree.nearest(points)
+
+    def sample(self, values, points, method='nearest', k=8, power=2):
+        """Sample cell values at points.
+
+        Args:
+            values: Cell values as a flat array or list. For vector fields use a
+                flat list of x, y, z values (e.g. load_field('U').internal_field).
+                A uniform value as a float or a tuple (e.g. (0, 0, 1)) will be
+                returned for every point.
+            points: A list of points as (x, y, z).
+            method: nearest or idw (inverse distance weighting) (default: nearest).
+            k: Number of nearest cells for idw (default: 8).
+            power: Power of distance for idw weights (default: 2).
+
+        Returns:
+            A list of values. Vector values are returned as tuples.
+        """
+        if isinstance(values, tuple):
+            # uniform vector value
+            return [values for _ in points]
+        try:
+            count = len(values)
+        except TypeError:
+            # uniform value
+            return [values for _ in points]
+
+        if count == self.cell_count:
+            width = 1
+        elif self.cell_count and count % self.cell_count == 0:
+            width = count // self.cell_count
+        else:
+            raise ValueError(
+                'Number of values ({}) does not match the number of cells ({}).'
+                .format(count, self.cell_count))
+
+        query = self.tree.query
+        if method == 'nearest':
+            if width == 1:
+                return [values[query(pt)[0][1]] for pt in points]
+            return [tuple(values[width * i:width * (i + 1)])
+                    for i in (query(pt)[0][1] for pt in points)]
+        elif method != 'idw':
+            raise ValueError(
+                'Invalid sampling method: {}. Use nearest or idw.'.format(method))
+
+        half_power = power / 2.0
+        results = []
+        for pt in points:
+            neighbours = query(pt, k)
+            if neighbours[0][0] == 0:
+                # exactly at the cell centre
+                weights = ((1.0, neighbours[0][1]),)
+            else:
+                weights = tuple((1.0 / d ** half_power, i) for d, i in neighbours)
+            total = sum(w for w, _ in weights)
+            if width == 1:
+                results.append(sum(w * values[i] for w, i in weights) / total)
+            else:
+                results.append(tuple(
+                    sum(w * values[width * i + j] for w, i in weights) / total
+                    for j in xrange(width)))
+
+        return results
+
+    def ToString(self):
+        """Overwrite .NET ToString method."""
+        return self.__repr__()
+
+    def __repr__(self):
+        """Cell sampler representation."""
+        return 'CellSampler::{}'.format(self.cell_count)
@@ -368,6 +368,71 @@ class SnappyHexMeshDict(FoamFile):
 
         self.values['geometry'].update(stl)
 
+    def split_stl_geometry(self):
+        """Reference a separate stl file for each region of stl geometries.
+
+        Each stl geometry with regions is replaced by a triSurfaceMesh for each
+        region (e.g. {region}.stl) and refinementSurfaces are updated to keep
+        the refinement levels. Features which reference the eMesh file of a
+        split stl file are repeated for the eMesh file of each region. Patch
+        names will not change. This is useful for binary stl files which can't
+        have named regions.
+
+        Returns:
+            An OrderedDict of split stl file names and the names of the new stl
+            files for their regions. Names don't include .stl.
+        """
+        geometry = self.values['geometry']
+        surfaces = self.values['castellatedMeshControls']['refinementSurfaces']
+        split = OrderedDict()
+
+        for file_name in self.stl_file_names:
+            stl_file = '{}.stl'.format(file_name)
+            try:
+                regions = geometry[stl_file]['regions']
+            except (KeyError, TypeError):
+                continue
+            if not regions:
+                continue
+
+            geo = geometry.pop(stl_file)
+            surface = surfaces.pop(geo.get('name', file_name), None) or {}
+            region_levels = surface.get('regions') or {}
+            for region, values in regions.iteritems():
+                name = values.get('name', region)
+                geometry['{}.stl'.format(region)] = OrderedDict(
+                    (('type', geo.get('type', 'triSurfaceMesh')), ('name', name)))
+                level = (region_levels.get(region) or {}).get(
+                    'level', surface.get('level', '(0 0)'))
+                surfaces[name] = {'level': level}
+            split[file_name] = tuple(regions)
+
+        if split:
+            self.__split_features(split)
+        return split
+
+    def __split_features(self, split):
+        """Repeat features of split stl files for the eMesh file of each region."""
+        features = self.values['castellatedMeshControls'].get('features')
+        if not features:
+            return
+
+        entries = []
+        is_changed = False
+        for entry in re.findall(r'\{[^{}]*\}', str(features)):
+            m = re.search(r'\bfile\s+"([^"]+)\.eMesh"', entry)
+            if not m or m.group(1) not in split:
+                entries.append(entry)
+                continue
+            old = '"{}.eMesh"'.format(m.group(1))
+            entries.extend(entry.replace(old, '"{}.eMesh"'.format(region))
+                           for region in split[m.group(1)])
+            is_changed = True
+
+        if is_changed:
+            self.values['castellatedMeshControls']['features'] = \
+                '({} )'.format(' '.join(entries))
+
     def add_refinementRegion(self, refinementRegion=None):
         """Add refinement region to snappyHexMeshDict."""
         if refinementRegion is None:
@@ -4,8 +4,8 @@ from copy import deepcopy
 from collections import namedtuple, OrderedDict
 import os
 
-from .utilities import tail, load_skipped_probes
-from .parser import CppDictParser
+from .utilities import load_skipped_probes
+from .parser import CppDictParser, ResidualParser
 
 
 class Solution(object):
@@ -39,6 +39,7 @@ class Solution(object):
 
         # place holder for residuals
         self.__residualValues = OrderedDict.fromkeys(self.residual_fields, 0)
+        self.__residualParser = None
         self.__isRunStarted = False
         self.__isRunFinished = False
         self.__process = None
@@ -133,8 +134,11 @@ class Solution(object):
 
     @property
     def is_running(self):
-        """Check if the solution is still running."""
-        if not self.__isRunStarted and not self.__isRunFinished:
+        """Check if the solution is still running.
+
+        Logs and errors are checked only once after the run is finished.
+        """
+        if not self.__isRunStarted or self.__isRunFinished:
             return False
         elif self.__process.poll() is None:
             return True
@@ -146,6 +150,7 @@ class Solution(object):
             failed, err = self.case.runmanager.check_file_contents(self.err_files)
 
             assert not failed, err
+            return False
 
     @property
     def timestep(self):
@@ -165,43 +170,39 @@ class Solution(object):
         """Get timestep and residual values as a tuple."""
         return self.__get_info()
 
+    @property
+    def residual_parser(self):
+        """Get the ResidualParser for the log file of this solution.
+
+        The parser only reads the lines that are added to the log file since the
+        last call. Returns None if the log file is not created yet.
+        """
+        if not self.__residualParser:
+            if not os.path.isfile(self.residual_file):
+                return None
+            self.__residualParser = ResidualParser(self.residual_file, parse=False)
+
+        self.__residualParser.parse()
+        return self.__residualParser
+
     def __get_info(self):
         i = namedtuple('Info', 'timestep residualValues')
-        # get end of the log file
-        if not os.path.isfile(self.residual_file):
+        rp = self.residual_parser
+        if not rp or rp.timestep is None:
             return i(0, self.__residualValues.values())
 
-        text = tail(self.residual_file).split("\nTime =")[-1].split('\n')
-        # get timestep
-        try:
-            t = int(text[0])
-        except ValueError:
-            t = 0
-
-        # read residual values
-        for line in text:
-            try:
-                # quantity, Initial residual, Final residual, No Iterations
-                q, ir, fr, ni = line.split(':  Solving for ')[1].split(',')
-                # use final residual
-                if q in self.__residualValues:
-                    self.__residualValues[q] = ir.split('= ')[-1]
-            except IndexError:
-                pass
+        # read residual values for the latest timestep
+        for q, ir in rp.get_latest_residuals().items():
+            if q in self.__residualValues:
+                self.__residualValues[q] = ir
 
-        return i(t, self.__residualValues.values())
+        return i(rp.timestep, self.__residualValues.values())
 
     def __get_latestTime(self):
-        # get end of the log file
-        if not os.path.isfile(self.residual_file):
+        rp = self.residual_parser
+        if not rp or rp.timestep is None:
             return 0
-        text = tail(self.residual_file).split("\nTime =")[-1].split('\n')
-        # get timestep
-        try:
-            t = int(text[0])
-        except ValueError:
-            t = 0
-        return t
+        return rp.timestep
 
     def update_from_recipe(self, recipe):
         """Update solution from recipe inputs.
@@ -269,6 +270,8 @@ class Solution(object):
     def run(self, wait=False):
         """Execute the solution."""
         self.case.rename_snappyHexMesh_folders()
+        # the log file will be overwritten by the new run
+        self.__residualParser = None
         log = self.case.command(
             cmd=self.recipe.application,
             args=None,
@@ -294,7 +297,10 @@ class Solution(object):
 
     def terminate(self):
         """Cancel the solution."""
-        self.case.runmanager.terminate()
+        if self.__process is not None and self.__process.poll() is None and \
+                getattr(self.case.runmanager, 'process', None) is self.__process:
+            # only terminate the latest command if it belongs to this solution
+            self.case.runmanager.terminate()
         if self.decomposeParDict:
             # remove processor folders if they haven't been removed already.
             self.case.remove_processor_folders()
@@ -307,6 +313,14 @@ class Solution(object):
         """Return OpenFOAM probes location for a given field (e.g. U)."""
         return self.case.load_probes(field)
 
+    def load_probe_history(self, field):
+        """Return OpenFOAM probes results for all time steps for a field (e.g. U)."""
+        return self.case.load_probe_history(field)
+
+    def load_probe_statistics(self, field, count=None):
+        """Return time-averaged probes results for the last count time steps."""
+        return self.case.load_probe_statistics(field, count)
+
     def skipped_probes(self):
         """Get list of probes that are skipped from the solution."""
         return load_skipped_probes(os.path.join(self.case.log_folder,
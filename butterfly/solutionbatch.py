@@ -0,0 +1,211 @@
+# coding=utf-8
+"""Butterfly SolutionBatch.
+
+Run a number of cases (e.g. a case for each wind direction) at the same time
+without using more cores than available.
+"""
+import os
+import time
+import threading
+from collections import namedtuple
+
+try:
+    from Queue import Queue
+except ImportError:
+    # python 3
+    from queue import Queue
+
+from .decomposeParDict import DecomposeParDict
+from .pipeline import Pipeline
+from .solution import Solution
+
+
+def cpu_count():
+    """Number of cores on this machine."""
+    try:
+        import multiprocessing
+        return multiprocessing.cpu_count()
+    except (ImportError, NotImplementedError):
+        # IronPython
+        try:
+            return int(os.environ['NUMBER_OF_PROCESSORS'])
+        except (KeyError, ValueError):
+            return 1
+
+
+class SolutionBatch(object):
+    """Run a batch of solutions in parallel.
+
+    Each job is a case and a recipe. Jobs start in order once there are enough
+    free cores and run in parallel with decomposeParDict if they have more than
+    one core. By default the cores are split evenly between the jobs so all of
+    them can run at the same time.
+
+    Args:
+        jobs: A list of (case, recipe) pairs. Each case should have a unique
+            project folder.
+        cores: Total number of cores for this batch (default: number of cores).
+        cores_per_job: Number of cores for each job. By default total number of
+            cores is divided by number of jobs.
+        mesh: Set to True to mesh the case before running the solution. Meshing
+            steps are skipped if the mesh is up to date. see Pipeline
+            (default: True).
+        mesh_cache: An optional MeshCache to reuse meshes between cases.
+    """
+
+    def __init__(self, jobs, cores=None, cores_per_job=None, mesh=True,
+                 mesh_cache=None):
+        """Init solution batch."""
+        self.__jobs = []
+        for case, recipe in jobs:
+            assert hasattr(case, 'isCase'), \
+                'ValueError:: {} is not a Butterfly.Case'.format(case)
+            assert hasattr(recipe, 'isRecipe'), '{} is not a recipe.'.format(recipe)
+            self.__jobs.append((case, recipe))
+
+        folders = [case.project_dir for case, recipe in self.__jobs]
+        assert len(set(folders)) == len(folders), \
+            'Cases in a SolutionBatch should have unique project folders.'
+
+        self.cores = cores or cpu_count()
+        self.cores_per_job = cores_per_job
+        self.mesh = mesh
+        self.mesh_cache = mesh_cache
+        self.__running = {}
+        self.__terminated = False
+
+    @property
+    def jobs(self):
+        """List of (case, recipe) pairs."""
+        return tuple(self.__jobs)
+
+    @property
+    def cores_per_job(self):
+        """Number of cores for each job."""
+        if self.__cores_per_job:
+            return min(self.__cores_per_job, self.cores)
+        return max(1, self.cores // max(1, len(self.__jobs)))
+
+    @cores_per_job.setter
+    def cores_per_job(self, n):
+        assert n is None or int(n) > 0, \
+            'cores_per_job should be larger than 0 not {}.'.format(n)
+        self.__cores_per_job = None if n is None else int(n)
+
+    @property
+    def running(self):
+        """Project name of the jobs that are running."""
+        return tuple(case.project_name for case in self.__running.values())
+
+    @property
+    def decomposeParDict(self):
+        """Get a new decomposeParDict for a job. None if jobs use one core."""
+        n = self.cores_per_job
+        return DecomposeParDict.scotch(n) if n > 1 else None
+
+    def __run_job(self, case, recipe, cores):
+        """Run a single job. Returns (success, error, solution, steps)."""
+        log = namedtuple('log', 'success error solution steps')
+        dpd = self.decomposeParDict
+        case.save()
+        solution = Solution(case, recipe, decomposeParDict=dpd)
+        if self.mesh:
+            pipeline = Pipeline.from_case(case, solution, self.mesh_cache)
+        else:
+            pipeline = Pipeline(case, (Pipeline.solution_step(solution),))
+
+        report = pipeline.run(max_workers=cores)
+        error = '\n'.join('{}: {}'.format(step, err)
+                          for step, err in report.errors.items()) or None
+        return log(report.success, error, solution, report)
+
+    def run(self):
+        """Run the jobs.
+
+        Returns:
+            A namedtuple as (success, jobs, failed).
+            success: True if all the jobs are executed successfully.
+            jobs: A namedtuple for each job as (case, solution, success, error,
+                cores, elapsed, logfiles, errorfiles, steps). Use solution to load
+                the results. steps is the report from Pipeline.run.
+            failed: Project name of the failed jobs.
+        """
+        report = namedtuple('report', 'success jobs failed')
+        job_report = namedtuple(
+            'job', 'case solution success error cores elapsed logfiles errorfiles '
+            'steps')
+
+        cores = self.cores_per_job
+        pending = list(range(len(self.__jobs)))
+        free = self.cores
+        results = Queue()
+        reports = [None] * len(self.__jobs)
+        self.__terminated = False
+
+        def execute(index):
+            case, recipe = self.__jobs[index]
+            st = time.time()
+            try:
+                log = self.__run_job(case, recipe, cores)
+            except Exception as e:
+                res = (False, '{}: {}'.format(e.__class__.__name__, e), None, None)
+            else:
+                res = log
+            results.put((index, res, time.time() - st))
+
+        try:
+            while pending or self.__running:
+                while pending and free >= cores and not self.__terminated:
+                    index = pending.pop(0)
+                    case = self.__jobs[index][0]
+                    free -= cores
+                    self.__running[index] = case
+                    print('Butterfly batch is running {} on {} core(s)...'.format(
+                        case.project_name, cores))
+                    thread = threading.Thread(target=execute, args=(index,))
+                    thread.daemon = True
+                    thread.start()
+
+                if not self.__running:
+                    break
+
+                # poll the queue so KeyboardInterrupt is not blocked
+                while results.empty():
+                    time.sleep(0.1)
+                index, (success, error, solution, steps), elapsed = results.get()
+                case = self.__running.pop(index)
+                free += cores
+                reports[index] = job_report(
+                    case, solution, success, error, cores, elapsed,
+                    solution.log_files if solution else None,
+                    solution.err_files if solution else None, steps)
+                print('Butterfly batch {} {} in {:.1f} seconds.'.format(
+                    'finished' if success else 'failed to run',
+                    case.project_name, elapsed))
+        except KeyboardInterrupt:
+            self.terminate()
+            print('The batch is interrupted by user!')
+
+        for index in range(len(self.__jobs)):
+            if reports[index] is None:
+                reports[index] = job_report(
+                    self.__jobs[index][0], None, False, 'Job is not executed.',
+                    cores, 0, None, None, None)
+
+        failed = tuple(r.case.project_name for r in reports if not r.success)
+        return report(not failed, tuple(reports), failed)
+
+    def terminate(self):
+        """Terminate the running jobs. Pending jobs won't be started."""
+        self.__terminated = True
+        for case in self.__running.values():
+            case.runmanager.terminate()
+
+    def ToString(self):
+        """Overwrite .NET ToString method."""
+        return self.__repr__()
+
+    def __repr__(self):
+        """SolutionBatch representation."""
+        return 'SolutionBatch::{} jobs::{} cores'.format(
+            len(self.__jobs), self.cores)
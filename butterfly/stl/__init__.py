@@ -1,3 +1,4 @@
+import struct
 
 import ascii
 import binary
@@ -30,6 +31,41 @@ def read_binary_file(file):
     return binary.parse(file)
 
 
+def is_binary_file(file):
+    """Check if a seekable :py:class:`file`-like object is a *binary* STL file.
+
+    Binary files are detected by comparing the file size with the number of
+    facets in the header since binary headers can also start with ``solid``.
+    The file position is not changed.
+    """
+    start = file.tell()
+    header = file.read(84)
+    file.seek(0, 2)
+    size = file.tell() - start
+    file.seek(start)
+
+    if len(header) == 84:
+        facet_count = struct.unpack('<I', header[80:84])[0]
+        if size == 84 + 50 * facet_count:
+            return True
+
+    return not header.lstrip().startswith(b'solid')
+
+
+def iter_solids(file):
+    """Read solids from an STL file one at a time.
+
+    Takes a seekable :py:class:`file`-like object and yields a
+    :py:class:`stl.types.ArraySolid` for each solid in the file. The format is
+    detected using :py:func:`is_binary_file`. A binary file has a single solid.
+    """
+    if is_binary_file(file):
+        yield binary.parse(file)
+    else:
+        for solid in ascii.iter_solids(file):
+            yield solid
+
+
 def read_ascii_string(data):
     """Read geometry from a :py:class:`str` containing data in the STL *ASCII* format.
 
@@ -1,4 +1,5 @@
-from types import Solid, Vector3d, Facet
+from array import array
+from types import Solid, Vector3d, Facet, ArraySolid
 
 
 class KeywordToken(str):
@@ -154,96 +155,141 @@ class SyntaxError(ValueError):
     pass
 
 
-def parse(file):
-    scanner = Scanner(file)
+def _parse_facets(text, values):
+    """Convert a block of complete facets to numbers and add them to values."""
+    facet_count = text.count('endfacet')
+    if text.count('vertex') != 3 * facet_count:
+        raise SyntaxError(
+            "Expected 3 vertices for each facet in %i facets" % facet_count)
 
-    scanner.require_token(KeywordToken, "solid")
-    name = str(scanner.require_token(KeywordToken))
+    for keyword in ('endfacet', 'facet', 'normal', 'outer', 'endloop',
+                    'loop', 'vertex'):
+        text = text.replace(keyword, ' ')
+    numbers = text.split()
+    if len(numbers) != 12 * facet_count:
+        raise SyntaxError(
+            "Expected %i numbers for %i facets but found %i" % (
+                12 * facet_count, facet_count, len(numbers),
+            )
+        )
 
-    ret = Solid(name=name)
+    try:
+        values.extend(map(float, numbers))
+    except ValueError as e:
+        raise SyntaxError("Invalid float number: %s" % e)
 
-    def parse_facet():
-        scanner.require_token(KeywordToken, "facet")
-        scanner.require_token(KeywordToken, "normal")
-        normal_x = scanner.require_token(NumberToken)
-        normal_y = scanner.require_token(NumberToken)
-        normal_z = scanner.require_token(NumberToken)
-        normal = Vector3d(
-            x=normal_x,
-            y=normal_y,
-            z=normal_z,
-        )
 
-        scanner.require_token(KeywordToken, "outer")
-        scanner.require_token(KeywordToken, "loop")
-        vertices = []
-        for i in xrange(0, 3):
-            scanner.require_token(KeywordToken, "vertex")
-            vertex_x = scanner.require_token(NumberToken)
-            vertex_y = scanner.require_token(NumberToken)
-            vertex_z = scanner.require_token(NumberToken)
-            vertices.append(
-                Vector3d(
-                    x=vertex_x,
-                    y=vertex_y,
-                    z=vertex_z,
-                )
-            )
+def iter_solids(file, chunk_size=2 ** 22):
+    """Parse ASCII STL solids from a file one at a time.
 
-        ret = Facet(
-            normal=normal,
-            vertices=vertices,
-        )
+    Yields an :py:class:`stl.types.ArraySolid` for each ``solid ... endsolid``
+    block in the file. The file is read in chunks and the facets in each chunk
+    are converted at once so only the current solid is kept in memory.
+    """
+    text = ''
+    while True:
+        # read up to the end of the next header line
+        text = text.lstrip()
+        while '\n' not in text:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            text = (text + chunk).lstrip()
+        if not text:
+            return
 
-        scanner.require_token(KeywordToken, "endloop")
-        scanner.require_token(KeywordToken, "endfacet")
+        if not text.startswith('solid') or text[5:6].strip():
+            raise SyntaxError("Expected keyword 'solid' at the start of a solid")
 
-        return ret
+        line_end = text.find('\n')
+        if line_end == -1:
+            line_end = len(text)
+        name = text[5:line_end].strip()
+        text = text[line_end:]
 
-    while True:
-        token = scanner.peek_token()
-        token_type = type(token)
-
-        if token_type is KeywordToken and token == 'endsolid':
-            break
-        elif token_type is KeywordToken and token == 'facet':
-            facet = parse_facet()
-            ret.facets.append(facet)
-        else:
-            got_token_type = _token_type_name(token_type)
-            # expected_token_type = _token_type_name(token_type)
+        values = array('d')
+        while True:
+            end = text.find('endsolid')
+            if end != -1:
+                _parse_facets(text[:end], values)
+                text = text[end + 8:]
+                break
+
+            chunk = file.read(chunk_size)
+            if not chunk:
+                raise SyntaxError("Expected keyword 'endsolid' before end of file")
+
+            # only convert the complete facets and keep the rest for the next chunk
+            cut = text.rfind('endfacet')
+            if cut != -1:
+                cut += 8
+                _parse_facets(text[:cut], values)
+                text = text[cut:]
+            text += chunk
+
+        while '\n' not in text:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            text += chunk
+
+        end_name, _, text = text.partition('\n')
+        end_name = end_name.strip()
+        if end_name and end_name != name:
             raise SyntaxError(
-                "Unexpected %s %r at line %i, column %i" % (
-                    got_token_type,
-                    token,
-                    token.start_row,
-                    token.start_col,
+                "Solid started named %r but ended named %r" % (
+                    name, end_name,
                 )
             )
 
-    scanner.require_token(KeywordToken, "endsolid")
-    end_name = str(scanner.require_token(KeywordToken))
-    if name != end_name:
-        raise SyntaxError(
-            "Solid started named %r but ended named %r" % (
-                name, end_name,
-            )
-        )
+        yield ArraySolid(name=name, values=values)
 
-    return ret
 
+def parse(file, chunk_size=2 ** 22):
+    """Parse an ASCII STL file into an :py:class:`stl.types.ArraySolid`.
 
-def write(solid, file):
-    name = solid.name
+    Only the first solid in the file is parsed. Use :py:func:`iter_solids`
+    for files with several solids.
+    """
+    for solid in iter_solids(file, chunk_size):
+        return solid
+    raise SyntaxError("Expected keyword 'solid' at the start of the file")
+
+
+_FACET = (
+    '  facet normal %.12g %.12g %.12g\n'
+    '    outer loop\n' +
+    '      vertex %.12g %.12g %.12g\n' * 3 +
+    '    endloop\n'
+    '  endfacet\n'
+)
+
+
+def format_solid(name, values, chunk_size=4096):
+    """Format a solid as ASCII STL one chunk of facets at a time.
+
+    Takes a flat sequence of 12 values for each facet (see
+    :py:class:`stl.types.ArraySolid`) and yields strings which can be passed
+    to ``file.writelines``. Each chunk of facets is formatted by a single
+    string formatting operation.
+    """
     if name is None:
         name = "unnamed"
 
-    file.write(("solid %s\n" % name).encode())
-    for facet in solid.facets:
-        file.write(("  facet normal %g %g %g\n" % facet.normal).encode())
-        file.write(b"    outer loop\n")
-        for vertex in facet.vertices:
-            file.write(("      vertex %g %g %g\n" % vertex).encode())
-        file.write(b"    endloop\n")
-        file.write(b"  endfacet\n")
-    file.write(("endsolid %s\n" % name).encode())
+    yield "solid %s\n" % name
+    step = 12 * chunk_size
+    for i in xrange(0, len(values), step):
+        chunk = tuple(values[i:i + step])
+        yield _FACET * (len(chunk) // 12) % chunk
+    yield "endsolid %s\n" % name
+
+
+def write(solid, file):
+    values = getattr(solid, 'values', None)
+    if values is None:
+        values = [c for facet in solid.facets
+                  for c in facet.normal + facet.vertices[0] +
+                  facet.vertices[1] + facet.vertices[2]]
+
+    for text in format_solid(solid.name, values):
+        file.write(text.encode())
@@ -1,5 +1,7 @@
+import sys
 import struct
-from types import Vector3d, Solid
+from array import array
+from types import Vector3d, Solid, ArraySolid
 
 
 class Reader(object):
@@ -47,48 +49,91 @@ class FormatError(ValueError):
 
 
 def parse(file):
-    r = Reader(file)
+    """Parse a binary STL file into an :py:class:`stl.types.ArraySolid`.
 
-    name = r.read_header()[6:]
+    The facet table is read and decoded at once. Each facet record is 50 bytes:
+    12 floats for the normal and the vertices followed by a 16-bit attribute
+    value.
+    """
+    r = Reader(file)
 
-    ret = Solid(name=name)
+    name = name_from_header(r.read_header())
 
     num_facets = r.read_uint32()
+    data = r.read_bytes(num_facets * 50)
+
+    # drop the attribute bytes and decode all the floats at once
+    floats = b''.join([data[i:i + 48] for i in xrange(0, len(data), 50)])
+    values = array('f')
+    try:
+        values.frombytes(floats)
+    except AttributeError:
+        # python 2
+        values.fromstring(floats)
+
+    # attribute values are the last 2 bytes of each 50 bytes record
+    attributes = array('H')
+    try:
+        attributes.frombytes(data)
+    except AttributeError:
+        # python 2
+        attributes.fromstring(data)
+    attributes = attributes[24::25]
+    if sys.byteorder == 'big':
+        values.byteswap()
+        attributes.byteswap()
+
+    return ArraySolid(name=name, values=values, attributes=attributes)
+
+
+def name_from_header(header):
+    """Get solid name from the header of a binary STL file.
+
+    The name follows ``name: `` in files written by :py:func:`write_values`.
+    Headers of older files start with ``solid`` followed by the name.
+    """
+    for prefix in ('name: ', 'solid '):
+        if header.startswith(prefix):
+            return header[len(prefix):]
+    # unknown header. skip the first 6 characters as the name used to be read
+    return header[6:]
+
+
+def write_values(name, values, file, chunk_size=65536):
+    """Write a solid to a file in the *binary* STL format.
+
+    Takes a flat sequence of 12 values for each facet (see
+    :py:class:`stl.types.ArraySolid`). Values are converted to 32-bit floats
+    one chunk of facets at a time and the attribute bytes are set to zero.
+    The name is written to the header after ``name: ``. Binary headers
+    shouldn't start with ``solid`` which is the start of the *ASCII* format.
+    """
+    header = ('name: %s' % name if name else '')[:80]
+    file.write(header.encode().ljust(80, b'\0'))
 
-    for i in xrange(0, num_facets):
-        normal = r.read_vector3d()
-        vertices = tuple(
-            r.read_vector3d() for j in xrange(0, 3)
-        )
-
-        attr_byte_count = r.read_uint16()
-        if attr_byte_count > 0:
-            # The attribute bytes are not standardized, but some software
-            # encodes additional information here. We return the raw bytes
-            # to allow the caller to potentially do something with them if
-            # the format for a particular file is known.
-            attr_bytes = r.read_bytes(attr_byte_count)
-        else:
-            attr_bytes = None
-
-        ret.add_facet(
-            normal=normal,
-            vertices=vertices,
-            attributes=attr_bytes,
-        )
-
-    return ret
+    # Number of facets
+    file.write(struct.pack('<I', len(values) // 12))
+
+    step = 12 * chunk_size
+    for i in xrange(0, len(values), step):
+        floats = array('f', values[i:i + step])
+        if sys.byteorder == 'big':
+            floats.byteswap()
+        try:
+            data = floats.tobytes()
+        except AttributeError:
+            # python 2
+            data = floats.tostring()
+        # no attribute bytes
+        file.write(b'\0\0'.join(
+            [data[j:j + 48] for j in xrange(0, len(data), 48)]) + b'\0\0')
 
 
 def write(solid, file):
-    # Empty header
-    file.write(b'\0' * 80)
-
-    # Number of facets
-    file.write(struct.pack('<I', len(solid.facets)))
+    values = getattr(solid, 'values', None)
+    if values is None:
+        values = [c for facet in solid.facets
+                  for c in facet.normal + facet.vertices[0] +
+                  facet.vertices[1] + facet.vertices[2]]
 
-    for facet in solid.facets:
-        file.write(struct.pack('<3f', *facet.normal))
-        for vertex in facet.vertices:
-            file.write(struct.pack('<3f', *vertex))
-        file.write(b'\0\0')  # no attribute bytes
+    write_values(solid.name, values, file)
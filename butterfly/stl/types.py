@@ -1,4 +1,5 @@
 import math
+from array import array
 
 
 class Solid(object):
@@ -82,6 +83,82 @@ class Solid(object):
         )
 
 
+class ArraySolid(Solid):
+    """A solid object with facets stored in a flat array.
+
+    Each facet is stored as 12 values for normal and the three vertices
+    (nx, ny, nz, x0, y0, z0, x1, y1, z1, x2, y2, z2) in the same order as a
+    binary STL file. Facet objects are only created if facets is accessed.
+    """
+
+    def __init__(self, name=None, values=None, attributes=None):
+        self.name = name
+        #: Flat :py:class:`array.array` of 12 values for each facet.
+        self.values = values if values is not None else array('d')
+        #: Optional :py:class:`array.array` of attribute values for each facet.
+        self.attributes = attributes
+        self._facets = None
+
+    @property
+    def facet_count(self):
+        """Number of facets."""
+        return len(self.values) // 12
+
+    @property
+    def facets(self):
+        """:py:class:`list` of :py:class:`stl.Facet` objects."""
+        if self._facets is None:
+            v = self.values
+            self._facets = [
+                Facet(v[i:i + 3], (v[i + 3:i + 6], v[i + 6:i + 9], v[i + 9:i + 12]))
+                for i in xrange(0, len(v), 12)
+            ]
+        return self._facets
+
+    def add_facet(self, normal, vertices, attributes=None):
+        """Append a new facet to the object."""
+        if len(vertices) != 3:
+            raise ValueError('Must pass exactly three vertices')
+        self.values.extend(normal)
+        for vertex in vertices:
+            self.values.extend(vertex)
+        self._facets = None
+
+    @property
+    def normals(self):
+        """Get facet normals."""
+        v = self.values
+        return tuple(Vector3d(v[i], v[i + 1], v[i + 2])
+                     for i in xrange(0, len(v), 12))
+
+    @property
+    def surface_area(self):
+        """The sum of the areas of all facets in the object."""
+        v = self.values
+        area = 0.0
+        for i in xrange(3, len(v), 12):
+            ax, ay, az = v[i + 3] - v[i], v[i + 4] - v[i + 1], v[i + 5] - v[i + 2]
+            bx, by, bz = v[i + 6] - v[i], v[i + 7] - v[i + 1], v[i + 8] - v[i + 2]
+            cx, cy, cz = ay * bz - az * by, az * bx - ax * bz, ax * by - ay * bx
+            area += math.sqrt(cx * cx + cy * cy + cz * cz)
+        return area / 2.0
+
+    @property
+    def vertices(self):
+        """Unique vertices for all facets."""
+        v = self.values
+        return tuple(set(
+            Vector3d(v[j], v[j + 1], v[j + 2])
+            for i in xrange(3, len(v), 12) for j in (i, i + 3, i + 6)
+        ))
+
+    def __repr__(self):
+        return '<stl.types.ArraySolid name=%r, facets=%r>' % (
+            self.name,
+            self.facet_count,
+        )
+
+
 class Facet(object):
     """A facet (triangle) from a :py:class:`stl.Solid`."""
 
@@ -6,7 +6,14 @@ import sys
 import collections
 from collections import OrderedDict, namedtuple
 from subprocess import Popen, PIPE
+from array import array
 import gzip
+import hashlib
+import re
+import math
+from bisect import bisect_left
+
+from .parser import CppDictParser
 
 
 def list_files(folder, fullpath=False):
@@ -63,6 +70,21 @@ def write_to_file(full_path, content):
     return full_path
 
 
+def calculate_file_hash(full_path, chunk_size=2 ** 20):
+    """Calculate md5 hash of file content as a hex string.
+
+    None will be returned if the file doesn't exist.
+    """
+    if not os.path.isfile(full_path):
+        return None
+
+    md5 = hashlib.md5()
+    with open(full_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
 def run_batch_file(filepath, wait=True):
     """run an executable .bat file.
 
@@ -284,6 +306,35 @@ def load_skipped_probes(log_file):
     return _pts
 
 
+def _get_probes_time_folders(probes_folder):
+    """Return time folders in a probes folder sorted by start time."""
+    if not os.path.isdir(probes_folder):
+        raise ValueError(
+            'Failed to find probes folder folder at {}'.format(probes_folder))
+
+    folders = []
+    for f in os.listdir(probes_folder):
+        if not os.path.isdir(os.path.join(probes_folder, f)):
+            continue
+        try:
+            folders.append((float(f), os.path.join(probes_folder, f)))
+        except ValueError:
+            # not a time folder
+            continue
+
+    return [f for _, f in sorted(folders)]
+
+
+def _parse_probe_values(line):
+    """Convert values in a line of a probes file to a tuple of numbers or vectors."""
+    if '(' in line:
+        # vectors
+        return tuple(tuple(float(v) for v in seg.split())
+                     for seg in line.split('(')[1:])
+    else:
+        return tuple(float(v) for v in line.split())
+
+
 def load_probes_from_postProcessing_file(probes_folder, field):
     """Return a generator of probes as tuples.
 
@@ -291,72 +342,170 @@ def load_probes_from_postProcessing_file(probes_folder, field):
         probes_folder: full path to probes folder.
         field: Probes field (e.g. U, p, T).
     """
-    if not os.path.isdir(probes_folder):
-        raise ValueError(
-            'Failed to find probes folder folder at {}'.format(probes_folder))
-
-    folders = [os.path.join(probes_folder, f) for f in os.listdir(probes_folder)
-               if (os.path.isdir(os.path.join(probes_folder, f)) and
-                   f.isdigit())]
+    folders = _get_probes_time_folders(probes_folder)
+    assert folders, 'Found no time folder in {}!'.format(probes_folder)
 
-    # sort based on last modified
-    folders = sorted(folders, key=lambda folder:
-                     max(tuple(os.stat(os.path.join(folder, f)).st_mtime
-                               for f in os.listdir(folder))))
-
-    # load the last line in the file
-    _f = os.path.join(probes_folder, str(folders[-1]), field)
+    # load the probes from the latest file
+    _f = os.path.join(folders[-1], field)
 
     assert os.path.isfile(_f), 'Cannot find {}!'.format(_f)
 
     with open(_f, 'rb') as inf:
         for line in inf:
-            if line.startswith('#        Probe'):
+            # probe locations are only in the header lines. e.g. # Probe 0 (1 2 3)
+            if not line.startswith('#') or '(' not in line:
                 break
             yield tuple(float(v) for v in line.strip().split('(')[-1][:-1].split())
 
 
+def _read_last_complete_line(filepath, block_size=1024):
+    """Read the last line of a file which ends with a newline.
+
+    A line which is still being written to the file is ignored.
+    """
+    with open(filepath, 'rb') as f:
+        f.seek(0, 2)
+        file_size = f.tell()
+        offset = 0
+        while offset < file_size:
+            offset = min(offset + block_size, file_size)
+            f.seek(-offset, 2)
+            text = f.read(offset)
+            end = text.rfind('\n')
+            start = text.rfind('\n', 0, end) + 1
+            if end != -1 and (start or offset == file_size):
+                return text[start:end].rstrip('\r')
+
+    return ''
+
+
 def load_probe_values_from_folder(probes_folder, field):
     """Return OpenFOAM probe values for a field for the last timestep.
 
     Args:
         field: Probes field (e.g. U, p, T).
     """
-    if not os.path.isdir(probes_folder):
-        raise ValueError(
-            'Failed to find probes folder folder at {}'.format(probes_folder))
+    folders = _get_probes_time_folders(probes_folder)
+    assert folders, 'Found no time folder in {}!'.format(probes_folder)
+
+    # load the last complete line in the latest file with values. the file for
+    # a restarted run only has the header until the first time step is written.
+    for folder in reversed(folders):
+        _f = os.path.join(folder, field)
+        assert os.path.isfile(_f), 'Cannot find {}!'.format(_f)
+        line = _read_last_complete_line(_f)
+        if line.strip() and not line.lstrip().startswith('#'):
+            break
 
-    folders = [os.path.join(probes_folder, f) for f in os.listdir(probes_folder)
-               if (os.path.isdir(os.path.join(probes_folder, f)) and
-                   f.isdigit())]
+    try:
+        # remove time and convert values to numbers or vectors
+        return _parse_probe_values(line.replace(')', ' ').split(None, 1)[1])
+    except Exception as e:
+        raise Exception('\nFailed to load probes:\n{}'.format(e))
 
-    # sort based on last modified
-    folders = sorted(folders, key=lambda folder:
-                     max(tuple(os.stat(os.path.join(folder, f)).st_mtime
-                               for f in os.listdir(folder))))
 
-    # load the last line in the file
-    _f = os.path.join(probes_folder, str(folders[-1]), field)
+def load_probe_history_from_folder(probes_folder, field):
+    """Load all the probe values for a field in a single pass.
 
-    assert os.path.isfile(_f), 'Cannot find {}!'.format(_f)
-    _res = read_last_line(_f).split()[1:]
+    Probe files in all the time folders are stitched together in order of time.
+    If the analysis is restarted from an earlier time the values from the
+    restarted run replace the overlapping values.
 
-    # convert values to tuple or number
-    _rawres = tuple(d.strip() for d in read_last_line(_f).split()
-                    if d.strip())[1:]
+    Args:
+        probes_folder: full path to probes folder.
+        field: Probes field (e.g. U, p, T).
 
-    try:
-        # it's a number
-        _res = tuple(float(r) for r in _rawres)
-    except ValueError:
-        try:
-            # it's a vector
-            _res = tuple(eval(','.join(_rawres[3 * i: 3 * (i + 1)]))
-                         for i in range(int(len(_rawres) / 3)))
-        except Exception as e:
-            raise Exception('\nFailed to load probes:\n{}'.format(e))
+    Returns:
+        namedtuple(times, values, probe_count, width). times is an array of
+        times and values is a flat array of values in (time, probe, component)
+        order. For a vector field value of probe j at time i is
+        values[(i * probe_count + j) * 3: (i * probe_count + j + 1) * 3].
+    """
+    times = array('d')
+    values = array('d')
+    probe_count = width = None
+
+    for folder in _get_probes_time_folders(probes_folder):
+        fp = os.path.join(folder, field)
+        if not os.path.isfile(fp):
+            continue
+        with open(fp, 'rb') as inf:
+            content = inf.read()
+
+        # only use the complete lines. solver may be writing to the file
+        lines = [line for line in content[:content.rfind('\n') + 1].splitlines()
+                 if line.strip() and not line.lstrip().startswith('#')]
+        if not lines:
+            continue
+
+        if probe_count is None:
+            count = len(lines[0].replace('(', ' ').replace(')', ' ').split()) - 1
+            probe_count = lines[0].count('(') or count
+            width = count // probe_count if probe_count else 1
+
+        row_size = 1 + probe_count * width
+        data = array('d', map(
+            float,
+            ' '.join(lines).replace('(', ' ').replace(')', ' ').split()))
+        if len(data) != row_size * len(lines):
+            raise ValueError(
+                'Failed to load probes from {}. Inconsistent number of values.'
+                .format(fp))
 
-    return _res
+        # remove overlapping values from a restarted run
+        first_time = data[0]
+        overlap = bisect_left(times, first_time)
+        if overlap < len(times):
+            del times[overlap:]
+            del values[overlap * (row_size - 1):]
+
+        times.extend(data[::row_size])
+        for st in xrange(0, len(data), row_size):
+            values.extend(data[st + 1:st + row_size])
+
+    ProbeHistory = namedtuple('ProbeHistory', 'times values probe_count width')
+    return ProbeHistory(times, values, probe_count or 0, width or 1)
+
+
+def calculate_probe_statistics(probe_history, count=None):
+    """Calculate time-averaged statistics for probe values.
+
+    Args:
+        probe_history: Probe values from load_probe_history_from_folder.
+        count: Number of last time steps to be used. By default all the values
+            will be used.
+
+    Returns:
+        namedtuple(average, minimum, maximum, std). Each item is a tuple with a
+        value for each probe. For vector fields values are calculated for each
+        component.
+    """
+    times, values, probe_count, width = probe_history
+    time_count = len(times)
+    if count:
+        time_count = min(count, time_count)
+    assert time_count, 'Found no probe values.'
+
+    row_size = probe_count * width
+    st = (len(times) - time_count) * row_size
+
+    results = []
+    for i in xrange(row_size):
+        column = values[st + i::row_size]
+        average = sum(column) / time_count
+        std = math.sqrt(sum((v - average) ** 2 for v in column) / time_count)
+        results.append((average, min(column), max(column), std))
+
+    stats = []
+    for res in zip(*results):
+        if width == 1:
+            stats.append(tuple(res))
+        else:
+            stats.append(tuple(
+                tuple(res[j * width:(j + 1) * width]) for j in xrange(probe_count)))
+
+    ProbeStatistics = namedtuple('ProbeStatistics', 'average minimum maximum std')
+    return ProbeStatistics(*stats)
 
 
 def load_probes_and_values_from_sample_file(fp):
@@ -374,76 +523,585 @@ def load_probes_and_values_from_sample_file(fp):
                 yield (x, y, z), v
 
 
-def load_of_points_file(path_to_file):
-    """Return points as a generator of tuples."""
+def open_of_file(path_to_file):
+    """Open an OpenFOAM file or its gzip compressed version for reading."""
+    if not os.path.isfile(path_to_file) and os.path.isfile(path_to_file + '.gz'):
+        path_to_file += '.gz'
+
     assert os.path.isfile(path_to_file), \
-        'Failed to find points file at {}'.format(path_to_file)
+        'Failed to find {}'.format(path_to_file)
 
     if path_to_file.endswith('.gz'):
-        pfile = gzip.open(path_to_file, 'rb')
+        return gzip.open(path_to_file, 'rb')
     else:
-        pfile = open(path_to_file, 'rb')
+        return open(path_to_file, 'rb')
+
+
+def read_of_file_header(f):
+    """Read FoamFile header from an open OpenFOAM file.
+
+    The file will be positioned right after the header.
+
+    Returns:
+        FoamFile values as a dictionary (e.g. {'format': 'binary', ...}).
+    """
+    lines = []
+    is_header = False
+    while True:
+        line = f.readline()
+        if not line:
+            break
+        lines.append(line)
+        if not is_header:
+            is_header = 'FoamFile' in line
+        elif '}' in line:
+            break
+
+    return CppDictParser(''.join(lines)).values.get('FoamFile', {})
+
+
+def _of_typecode(header, kind):
+    """Get array typecode for binary labels or scalars based on FoamFile arch.
+
+    Args:
+        header: FoamFile header as a dictionary.
+        kind: label or scalar.
+    """
+    # arch "LSB;label=32;scalar=64"
+    arch = dict(
+        v.split('=') for v in header.get('arch', '').strip('"').split(';') if '=' in v
+    )
+    size = int(arch.get(kind, 32 if kind == 'label' else 64)) // 8
+    for tc in (('i', 'l', 'q') if kind == 'label' else ('f', 'd')):
+        try:
+            if array(tc).itemsize == size:
+                return tc
+        except ValueError:
+            # typecode is not supported
+            continue
+
+    raise ValueError('Unsupported {} size: {}'.format(kind, size * 8))
+
+
+def _read_of_list_size(f):
+    """Read size of the next list in an OpenFOAM file.
+
+    Returns:
+        (size, rest) where rest is the rest of the line after size (e.g. '(').
+    """
+    while True:
+        line = f.readline()
+        if not line:
+            raise ValueError('Failed to find the start of the list.')
+        line = line.strip()
+        if not line or line.startswith('//'):
+            continue
+        m = re.match(r'(\d+)(.*)', line)
+        if not m:
+            raise ValueError('Invalid list size: {}'.format(line))
+        return int(m.group(1)), m.group(2).strip()
+
+
+def _read_binary_of_list(f, size, typecode, header):
+    """Read size values of typecode from the next binary list in an open file."""
+    values = array(typecode)
+    while True:
+        b = f.read(1)
+        if b == '(':
+            break
+        if not b or not b.isspace():
+            raise ValueError('Failed to find the start of the binary list.')
+
+    data = f.read(size * values.itemsize)
+    if len(data) != size * values.itemsize:
+        raise ValueError('Unexpected end of file in the binary list.')
 
     try:
-        for l in pfile:
-            if l.strip().startswith('(') and l.strip().endswith(')'):
-                yield eval(','.join(l.split()))
-    finally:
-        pfile.close()
+        values.frombytes(data)
+    except AttributeError:
+        # python 2
+        values.fromstring(data)
 
+    if header.get('arch', 'LSB').strip('"').startswith('MSB') != \
+            (sys.byteorder == 'big'):
+        values.byteswap()
 
-def load_of_faces_file(path_to_file, inner_mesh=True):
-    """Return faces indecies as a generator of tuples."""
-    assert os.path.isfile(path_to_file), \
-        'Failed to find faces file: {}'.format(path_to_file)
+    f.read(1)  # )
+    return values
 
-    if path_to_file.endswith('.gz'):
-        ffile = gzip.open(path_to_file, 'rb')
+
+def _read_ascii_of_list(f, size, rest, typecode, width=1, chunk_size=2 ** 24):
+    """Read size * width values from the next ascii list in an open file.
+
+    The list is read in large chunks and each chunk is converted in bulk.
+    """
+    values = array(typecode)
+    convert = float if typecode in ('f', 'd') else int
+    count = size * width
+
+    if rest.startswith('{'):
+        # uniform list. e.g. 10{0} or 10{(0 0 0)}
+        item = rest[1:rest.index('}')].replace('(', ' ').replace(')', ' ').split()
+        return array(typecode, [convert(v) for v in item] * size)
+
+    text = rest
+    while len(values) < count:
+        chunk = f.read(chunk_size)
+        text += chunk
+        if chunk:
+            # only convert the complete lines
+            cut = text.rfind('\n') + 1
+            text, tail = text[:cut], text[cut:]
+        else:
+            tail = ''
+        values.extend(map(
+            convert,
+            text.replace('(', ' ').replace(')', ' ').split()[:count - len(values)]
+        ))
+        if not chunk:
+            break
+        text = tail
+
+    if len(values) != count:
+        raise ValueError(
+            'Expected {} values in the list but found {}.'.format(count, len(values)))
+
+    return values
+
+
+def _read_of_list(f, header, kind, width=1):
+    """Read the next label or scalar list from an open OpenFOAM file.
+
+    Args:
+        f: An open file positioned after the header.
+        header: FoamFile header as a dictionary.
+        kind: label or scalar.
+        width: Number of values for each item (e.g. 3 for a vector list).
+
+    Returns:
+        A flat array of values.
+    """
+    size, rest = _read_of_list_size(f)
+    typecode = _of_typecode(header, kind)
+    if header.get('format') == 'binary' and not rest.startswith('{'):
+        return _read_binary_of_list(f, size * width, typecode, header)
     else:
-        ffile = open(path_to_file, 'rb')
+        return _read_ascii_of_list(f, size, rest, typecode, width)
 
-    if not inner_mesh:
-        p, f = os.path.split(path_to_file)
-        fins = load_of_boundary_file(os.path.join(p, f.replace('faces', 'boundary')))
-        try:
-            fin = -1
-            for l in ffile:
-                tl = l.strip()
-                try:
-                    if tl[1] == '(' and tl.endswith(')'):
-                        fin += 1  # add to face number
-                        if fin in fins:
-                            yield eval(','.join(tl[1:].split()))
-                except IndexError:
-                    continue
-        finally:
-            ffile.close()
+
+def load_of_points_array(path_to_file):
+    """Load points from an OpenFOAM points file in a single pass.
+
+    Both ascii and binary formats are supported and the file can be gzip
+    compressed.
+
+    Args:
+        path_to_file: Path to points file (e.g. constant/polyMesh/points).
+
+    Returns:
+        A flat array of x, y, z values for points. Point i is values[3 * i: 3 * i + 3].
+    """
+    with open_of_file(path_to_file) as pfile:
+        header = read_of_file_header(pfile)
+        return _read_of_list(pfile, header, 'scalar', 3)
+
+
+def load_of_points_file(path_to_file):
+    """Return points as a generator of tuples."""
+    pts = load_of_points_array(path_to_file)
+    for i in xrange(0, len(pts), 3):
+        yield tuple(pts[i:i + 3])
+
+
+def load_of_labels_array(path_to_file):
+    """Load labels from an OpenFOAM labelList file (e.g. owner, neighbour).
+
+    Both ascii and binary formats are supported and the file can be gzip
+    compressed.
+
+    Args:
+        path_to_file: Path to labelList file (e.g. constant/polyMesh/owner).
+
+    Returns:
+        An array of labels.
+    """
+    with open_of_file(path_to_file) as lfile:
+        header = read_of_file_header(lfile)
+        return _read_of_list(lfile, header, 'label')
+
+
+def _read_ascii_of_face_list(f, size, rest, typecode, start=0,
+                             chunk_size=2 ** 24):
+    """Read an ascii faceList (e.g. 4(0 1 2 3)) into offsets and indices.
+
+    The first start faces are counted but not converted.
+    """
+    sizes = array(typecode)
+    indices = array(typecode)
+
+    skip = start
+    text = rest
+    while len(sizes) < size - start:
+        chunk = f.read(chunk_size)
+        text += chunk
+        # there is no / in the list. cut the footer comment
+        footer = text.find('/')
+        if footer != -1:
+            text, tail = text[:footer], ''
+            chunk = ''
+        elif chunk:
+            # only convert the complete faces
+            cut = text.rfind(')') + 1
+            text, tail = text[:cut], text[cut:]
+        else:
+            tail = ''
+        text = text.strip()
+        if text.startswith('('):
+            # opening parenthesis of the list itself
+            text = text[1:]
+        if text.count(')') > text.count('('):
+            # closing parenthesis of the list itself
+            text = text[:text.rfind(')')]
+        # size(indices) size(indices) ... > [size, indices, size, indices, ...]
+        segments = text.replace(')', '(').split('(')
+        if skip:
+            count = len(segments) // 2
+            segments = segments[2 * min(skip, count):]
+            skip -= min(skip, count)
+        sizes.extend(map(int, segments[:-1:2]))
+        indices.extend(map(int, ' '.join(segments[1::2]).split()))
+        if not chunk:
+            break
+        text = tail
+
+    if len(sizes) != size - start:
+        raise ValueError(
+            'Expected {} faces in the list but found {}.'.format(
+                size, len(sizes) + start))
+
+    offsets = array(typecode, [0]) * (len(sizes) + 1)
+    total = 0
+    for i, s in enumerate(sizes):
+        total += s
+        offsets[i + 1] = total
+
+    if total != len(indices):
+        raise ValueError(
+            'Expected {} face indices but found {}.'.format(total, len(indices)))
+
+    return offsets, indices
+
+
+def _read_ascii_of_face_compact_list(f, typecode):
+    """Read offsets and indices lists of an ascii faceCompactList."""
+    list_start = re.compile(r'(\d+)\s*\(')
+    content = f.read()
+    lists = []
+    end = 0
+    for _ in range(2):
+        m = list_start.search(content, end)
+        if not m:
+            raise ValueError('Failed to find the start of the list.')
+        end = content.index(')', m.end())
+        values = array(typecode, map(int, content[m.end():end].split()))
+        if len(values) != int(m.group(1)):
+            raise ValueError(
+                'Expected {} values in the list but found {}.'.format(
+                    m.group(1), len(values)))
+        lists.append(values)
+
+    return lists[0], lists[1]
+
+
+def load_of_faces_array(path_to_file, start=0):
+    """Load faces from an OpenFOAM faces file in compact form.
+
+    Faces are returned as two flat arrays similar to OpenFOAM's faceCompactList.
+    Vertex indices for face i are indices[offsets[i]:offsets[i + 1]]. Both
+    faceList and faceCompactList in ascii and binary formats are supported and
+    the file can be gzip compressed.
+
+    Args:
+        path_to_file: Path to faces file (e.g. constant/polyMesh/faces).
+        start: Index of the first face to load. Use the startFace of the first
+            boundary patch to only load the boundary faces (default: 0).
+
+    Returns:
+        (offsets, indices)
+    """
+    with open_of_file(path_to_file) as ffile:
+        header = read_of_file_header(ffile)
+        if header.get('class') == 'faceCompactList':
+            if header.get('format') == 'binary':
+                offsets = _read_of_list(ffile, header, 'label')
+                indices = _read_of_list(ffile, header, 'label')
+            else:
+                offsets, indices = _read_ascii_of_face_compact_list(
+                    ffile, _of_typecode(header, 'label'))
+            if not start:
+                return offsets, indices
+            return slice_faces_array(
+                offsets, indices, start, len(offsets) - 1 - start)
+        elif header.get('format') == 'binary':
+            raise ValueError(
+                'Binary faces should be written as faceCompactList: {}'.format(
+                    path_to_file))
+        else:
+            size, rest = _read_of_list_size(ffile)
+            return _read_ascii_of_face_list(
+                ffile, size, rest, _of_typecode(header, 'label'), start)
+
+
+def slice_faces_array(offsets, indices, start, count):
+    """Get a contiguous range of faces from compact faces.
+
+    Args:
+        offsets: Face offsets from load_of_faces_array.
+        indices: Face vertex indices from load_of_faces_array.
+        start: Index of the first face.
+        count: Number of faces.
+
+    Returns:
+        (offsets, indices) for faces start to start + count.
+    """
+    st = offsets[start]
+    sub_offsets = offsets[start:start + count + 1]
+    if st:
+        sub_offsets = array(offsets.typecode, (o - st for o in sub_offsets))
+    return sub_offsets, indices[st:offsets[start + count]]
+
+
+def load_of_boundary_faces_array(path_to_file, patches=None):
+    """Load boundary faces from an OpenFOAM faces file in compact form.
+
+    Boundary faces for each patch are stored contiguously in faces file and
+    are sliced out using startFace and nFaces from the boundary file.
+
+    Args:
+        path_to_file: Path to faces file (e.g. constant/polyMesh/faces).
+        patches: Optional list of patch names. By default all the patches
+            will be loaded.
+
+    Returns:
+        An OrderedDict of patch names and (offsets, indices) for each patch.
+    """
+    p, f = os.path.split(path_to_file)
+    boundary = load_of_boundary_patches(
+        os.path.join(p, f.replace('faces', 'boundary').replace('.gz', '')))
+    if patches is not None:
+        for name in patches:
+            assert name in boundary, \
+                'Failed to find {} in boundary patches: {}'.format(
+                    name, tuple(boundary.keys()))
+        boundary = OrderedDict((name, boundary[name]) for name in patches)
+
+    # boundary faces are after the internal faces. skip the internal faces
+    first = min(st for st, _ in boundary.itervalues()) if boundary else 0
+    offsets, indices = load_of_faces_array(path_to_file, first)
+    return OrderedDict(
+        (name, slice_faces_array(offsets, indices, st - first, count))
+        for name, (st, count) in boundary.iteritems()
+    )
+
+
+def load_of_faces_file(path_to_file, inner_mesh=True):
+    """Return faces indecies as a generator of tuples.
+
+    Args:
+        path_to_file: Path to faces file (e.g. constant/polyMesh/faces).
+        inner_mesh: Set to False to only return boundary faces.
+    """
+    if inner_mesh:
+        faces = (load_of_faces_array(path_to_file),)
     else:
-        try:
-            for l in ffile:
-                tl = l.strip()
-                try:
-                    if tl[1] == '(' and tl.endswith(')'):
-                        yield eval(','.join(tl[1:].split()))
-                except IndexError:
-                    continue
-        finally:
-            ffile.close()
+        faces = load_of_boundary_faces_array(path_to_file).itervalues()
+
+    for offsets, indices in faces:
+        for i in xrange(len(offsets) - 1):
+            yield tuple(indices[offsets[i]:offsets[i + 1]])
+
+
+def load_of_boundary_patches(path_to_file):
+    """Return startFace and nFaces for boundary patches.
+
+    Returns:
+        An OrderedDict of patch names and (startFace, nFaces).
+    """
+    with open_of_file(path_to_file) as bf:
+        read_of_file_header(bf)
+        content = bf.read()
+
+    patches = OrderedDict()
+    for name, body in re.findall(r'([^\s{}()]+)\s*\{([^{}]*)\}', content):
+        st = re.search(r'\bstartFace\s+(\d+)\s*;', body)
+        count = re.search(r'\bnFaces\s+(\d+)\s*;', body)
+        if not st or not count:
+            raise ValueError(
+                'Failed to find startFace and nFaces for {} in {}'.format(
+                    name, path_to_file))
+        patches[name] = int(st.group(1)), int(count.group(1))
+
+    return patches
 
 
 def load_of_boundary_file(path_to_file):
     """Return Face indecies for boundary faces as a set."""
-    assert os.path.isfile(path_to_file), \
-        'Failed to find boundary file: {}'.format(path_to_file)
-
-    ind = []
-    with open(path_to_file, 'rb') as bf:
-        for line in bf:
-            line = line.strip()
-            if line.startswith('nFaces'):
-                count = int(line.split()[-1][:-1])
-                nl = next(bf)
-                st = int(nl.split()[-1][:-1])
-                ind.append(xrange(st, st + count))
-
-    return {i for rng in ind for i in rng}
+    return {i for st, count in load_of_boundary_patches(path_to_file).itervalues()
+            for i in xrange(st, st + count)}
+
+
+# number of values for each item in an OpenFOAM field
+OF_FIELD_WIDTHS = {'label': 1, 'scalar': 1, 'vector': 3, 'symmTensor': 6,
+                   'sphericalTensor': 1, 'tensor': 9}
+
+
+def _parse_of_field_value(content, pos, header):
+    """Parse a uniform or nonuniform field value.
+
+    Args:
+        content: Content of the field file after the header.
+        pos: Position of the value (e.g. uniform (0 0 0);).
+        header: FoamFile header as a dictionary.
+
+    Returns:
+        (value, end) where end is the position right after the value. Uniform
+        values are returned as a float or a tuple and nonuniform values as a
+        flat array.
+    """
+    if content.startswith('uniform', pos):
+        end = content.index(';', pos)
+        value = tuple(
+            float(v) for v in
+            content[pos + 7:end].replace('(', ' ').replace(')', ' ').split()
+        )
+        return value[0] if len(value) == 1 else value, end
+
+    m = re.compile(r'nonuniform\s+List<(\w+)>\s*(\d+)\s*').match(content, pos)
+    if not m:
+        raise ValueError('Invalid field value: {}'.format(content[pos:pos + 50]))
+
+    kind, size = m.group(1), int(m.group(2))
+    try:
+        width = OF_FIELD_WIDTHS[kind]
+    except KeyError:
+        raise ValueError('Unsupported field type: List<{}>'.format(kind))
+    typecode = _of_typecode(header, 'label' if kind == 'label' else 'scalar')
+    start = m.end()
+
+    if content.startswith('{', start):
+        # uniform list. e.g. 10{0} or 10{(0 0 0)}
+        end = content.index('}', start)
+        return _read_ascii_of_list(None, size, content[start:end + 1], typecode,
+                                   width), end + 1
+    elif header.get('format') == 'binary':
+        if not content.startswith('(', start):
+            raise ValueError('Failed to find the start of the binary list.')
+        values = array(typecode)
+        end = start + 1 + size * width * values.itemsize
+        try:
+            values.frombytes(content[start + 1:end])
+        except AttributeError:
+            # python 2
+            values.fromstring(content[start + 1:end])
+        if header.get('arch', 'LSB').strip('"').startswith('MSB') != \
+                (sys.byteorder == 'big'):
+            values.byteswap()
+        return values, end + 1
+    else:
+        end = re.compile(r'\)\s*;').search(content, start).start()
+        convert = float if typecode in ('f', 'd') else int
+        values = array(typecode, map(
+            convert,
+            content[start + 1:end].replace('(', ' ').replace(')', ' ').split()))
+        if len(values) != size * width:
+            raise ValueError(
+                'Expected {} values in the list but found {}.'.format(
+                    size * width, len(values)))
+        return values, end + 1
+
+
+def _parse_of_boundary_field(content, pos, header):
+    """Parse boundaryField patches starting from the opening brace."""
+    entry = re.compile(r'\s*(?://[^\n]*|/\*.*?\*/|#[^\n]*|([^\s{};]+)\s*)?',
+                       re.DOTALL)
+    patches = OrderedDict()
+    patch = None
+    pos += 1
+    while pos < len(content):
+        m = entry.match(content, pos)
+        pos = m.end()
+        if m.group(1):
+            key = m.group(1)
+            if content.startswith('{', pos):
+                if patch is not None:
+                    # nested dictionary inside a patch. keep it as a string
+                    end = pos
+                    depth = 0
+                    while True:
+                        end = re.compile(r'[{}]').search(content, end).start() + 1
+                        depth += 1 if content[end - 1] == '{' else -1
+                        if not depth:
+                            break
+                    patch[key] = content[pos:end]
+                    pos = end
+                else:
+                    patch = patches[key.strip('"')] = OrderedDict()
+                    pos += 1
+            elif content.startswith('#{', pos):
+                # code block
+                end = content.index('#}', pos) + 2
+                patch[key] = content[pos:end]
+                pos = end
+            elif content.startswith(('uniform', 'nonuniform'), pos):
+                patch[key], pos = _parse_of_field_value(content, pos, header)
+                pos = content.index(';', pos) + 1
+            else:
+                end = content.index(';', pos)
+                patch[key] = ' '.join(content[pos:end].split())
+                pos = end + 1
+        elif content.startswith('}', pos):
+            if patch is None:
+                # end of boundaryField
+                break
+            patch = None
+            pos += 1
+        elif content.startswith(';', pos):
+            pos += 1
+        elif m.end() == m.start():
+            raise ValueError(
+                'Failed to parse boundaryField: {}'.format(content[pos:pos + 50]))
+
+    return patches
+
+
+def load_of_field_file(path_to_file):
+    """Load internalField and boundaryField values from an OpenFOAM field file.
+
+    Both ascii and binary formats are supported and the file can be gzip
+    compressed.
+
+    Args:
+        path_to_file: Path to field file (e.g. 100/U).
+
+    Returns:
+        namedtuple(internal_field, boundary_field). internal_field is a flat array
+        for nonuniform fields (e.g. x, y, z values for a vector field) and a float
+        or a tuple for uniform fields. boundary_field is an OrderedDict of patch
+        names and their entries. Field values in patches (e.g. value) are loaded
+        the same way as internal_field and other entries are strings.
+    """
+    with open_of_file(path_to_file) as ffile:
+        header = read_of_file_header(ffile)
+        content = ffile.read()
+
+    m = re.compile(r'\binternalField\s+').search(content)
+    if not m:
+        raise ValueError('Failed to find internalField in {}'.format(path_to_file))
+    internal_field, pos = _parse_of_field_value(content, m.end(), header)
+
+    m = re.compile(r'\bboundaryField\s*\{').search(content, pos)
+    boundary_field = _parse_of_boundary_field(content, m.end() - 1, header) \
+        if m else OrderedDict()
+
+    FieldValues = namedtuple('FieldValues', 'internal_field boundary_field')
+    return FieldValues(internal_field, boundary_field)
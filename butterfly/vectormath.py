@@ -1,7 +1,15 @@
-"""Calculate anitclockwise angle between two vectors."""
+"""Calculate anitclockwise angle between two vectors.
+
+Functions with plural names (e.g. rotate_points) are batched versions which
+take a flat list or array of x, y, z values for several vectors and return a
+flat array.
+"""
 import math
+from array import array
 
-__all__ = ('angle_anitclockwise', 'cross_product', 'project')
+__all__ = ('angle_anitclockwise', 'cross_product', 'project', 'lengths',
+           'dot_products', 'cross_products', 'normalize_vectors', 'move_points',
+           'scale_vectors', 'rotate_points', 'project_points')
 
 
 def length(v):
@@ -128,3 +136,105 @@ def project(p, o, n):
     n = normalize(n)
     dif = scale(n, dot_product(subtract(p, o), n))
     return subtract(p, dif)
+
+
+def lengths(values):
+    """Calculate length of vectors."""
+    return array('d', [math.sqrt(x * x + y * y + z * z) for x, y, z in
+                       zip(values[0::3], values[1::3], values[2::3])])
+
+
+def dot_products(values1, values2):
+    """Calculate dot product of vectors in values1 and values2.
+
+    values2 can also be a single vector.
+    """
+    if len(values2) == 3:
+        a, b, c = values2
+        return array('d', [a * x + b * y + c * z for x, y, z in
+                           zip(values1[0::3], values1[1::3], values1[2::3])])
+    return array('d', [x * a + y * b + z * c for x, y, z, a, b, c in
+                       zip(values1[0::3], values1[1::3], values1[2::3],
+                           values2[0::3], values2[1::3], values2[2::3])])
+
+
+def cross_products(values1, values2, norm=True):
+    """Calculate cross product of vectors in values1 and values2."""
+    xs1, ys1, zs1 = values1[0::3], values1[1::3], values1[2::3]
+    xs2, ys2, zs2 = values2[0::3], values2[1::3], values2[2::3]
+    values = array('d', values1)
+    values[0::3] = array('d', [y1 * z2 - z1 * y2 for y1, z1, y2, z2 in
+                               zip(ys1, zs1, ys2, zs2)])
+    values[1::3] = array('d', [z1 * x2 - x1 * z2 for x1, z1, x2, z2 in
+                               zip(xs1, zs1, xs2, zs2)])
+    values[2::3] = array('d', [x1 * y2 - y1 * x2 for x1, y1, x2, y2 in
+                               zip(xs1, ys1, xs2, ys2)])
+
+    if norm:
+        return normalize_vectors(values)
+    else:
+        return values
+
+
+def normalize_vectors(values):
+    """Normalize vectors."""
+    lns = lengths(values)
+    if 0 in lns:
+        raise ValueError('A vector with length of 0 cannot be normalized.')
+    values = array('d', values)
+    for i in xrange(3):
+        values[i::3] = array('d', [c / ln for c, ln in zip(values[i::3], lns)])
+    return values
+
+
+def move_points(values, v):
+    """Move points along a vector."""
+    values = array('d', values)
+    for i in xrange(3):
+        d = v[i]
+        values[i::3] = array('d', [c + d for c in values[i::3]])
+    return values
+
+
+def scale_vectors(values, s):
+    """Scale vectors by s."""
+    return array('d', [c * s for c in values])
+
+
+def rotate_points(origin, values, angle):
+    u"""Rotate points anitclockwise by a given angle around a given origin.
+
+    Rotation is around the Z axis and the angle should be given in degrees.
+    """
+    angle = math.radians(angle)
+    ox, oy = origin[0], origin[1]
+    cosine = math.cos(angle)
+    sine = math.sin(angle)
+    xs, ys = values[0::3], values[1::3]
+    values = array('d', values)
+    values[0::3] = array('d', [ox + cosine * (x - ox) - sine * (y - oy)
+                               for x, y in zip(xs, ys)])
+    values[1::3] = array('d', [oy + sine * (x - ox) + cosine * (y - oy)
+                               for x, y in zip(xs, ys)])
+    return values
+
+
+def project_points(values, o, n):
+    """Project points on a plane.
+
+    Args:
+        values: Points as a flat list of x, y, z values.
+        o: Origin of plane.
+        n: Plane normal.
+    Returns:
+        projected points as a flat array of x, y, z values.
+    """
+    n = normalize(n)
+    distances = dot_products(values, n)
+    d0 = dot_product(o, n)
+    values = array('d', values)
+    for i in xrange(3):
+        c = n[i]
+        values[i::3] = array('d', [v - (d - d0) * c for v, d in
+                                   zip(values[i::3], distances)])
+    return values
@@ -0,0 +1,56 @@
+"""Tests for saving butterfly cases."""
+import os
+
+from butterfly.case import Case
+from butterfly.foamfile import foam_file_from_file
+from butterfly.stl import iter_solids
+
+from .conftest import cube
+
+
+def test_save_binary_stl(tmpdir):
+    case = Case.from_bf_geometries(
+        'split_case', [cube('a'), cube('b', origin=(2, 0, 0))])
+    case.working_dir = str(tmpdir)
+    case.snappyHexMeshDict.set_featureEdgeRefinement_to_explicit('split_case', 3)
+    case.save()
+
+    tri = case.triSurface_folder
+    assert os.path.isfile(os.path.join(tri, 'split_case.stl'))
+    # outputs of surfaceFeatureExtract for the combined stl file
+    with open(os.path.join(tri, 'split_case.eMesh'), 'w') as outf:
+        outf.write('edges')
+    with open(os.path.join(case.project_dir, 'system',
+                           'surfaceFeatureExtractDict'), 'w') as outf:
+        outf.write('split_case.stl\n{\n    extractionMethod extractFromSurface;\n'
+                   '    writeObj no;\n}\n')
+
+    saved = case.save(binary_stl=True)
+
+    # the combined stl file and its eMesh are replaced by a file for each region
+    assert sorted(os.listdir(tri)) == ['a.stl', 'b.stl']
+    for name in ('a', 'b'):
+        fp = os.path.join(tri, name + '.stl')
+        assert fp in saved.written
+        with open(fp, 'rb') as inf:
+            assert not inf.read(80).startswith(b'solid')
+            inf.seek(0)
+            solids = list(iter_solids(inf))
+        assert [s.name for s in solids] == [name]
+        assert len(solids[0].values) == 12 * 12
+
+    geometry = case.snappyHexMeshDict.values['geometry']
+    assert sorted(geometry) == ['a.stl', 'b.stl']
+    assert case.snappyHexMeshDict.features == \
+        '({file "a.eMesh"; level 3;} {file "b.eMesh"; level 3;} )'
+
+    sfe = foam_file_from_file(
+        os.path.join(case.project_dir, 'system', 'surfaceFeatureExtractDict'))
+    assert sfe == {
+        'a.stl': {'extractionMethod': 'extractFromSurface', 'writeObj': 'no'},
+        'b.stl': {'extractionMethod': 'extractFromSurface', 'writeObj': 'no'}}
+
+    # nothing changes in the next save
+    saved = case.save(binary_stl=True)
+    assert saved.written == []
+    assert sorted(os.listdir(tri)) == ['a.stl', 'b.stl']
@@ -0,0 +1,126 @@
+"""Shared fixtures for butterfly tests."""
+import os
+import gzip
+import stat
+import sys
+import struct
+
+import pytest
+
+if sys.version_info[0] > 2:
+    # butterfly uses python 2 implicit relative imports (e.g. butterfly.stl) and
+    # can't be imported under python 3.
+    collect_ignore = [f for f in os.listdir(os.path.dirname(__file__))
+                      if f.endswith('_test.py') and f != 'placeholder_test.py']
+
+# stub OpenFOAM executables. Each stub writes a line to stdout so log files can
+# be checked and creates the files that the real command would create.
+STUBS = {
+    'blockMesh':
+        'echo "blockMesh $@"\n'
+        'mkdir -p constant/polyMesh\n'
+        'echo block > constant/polyMesh/points\n',
+    'surfaceFeatureExtract':
+        'echo "surfaceFeatureExtract $@"\n'
+        'for f in constant/triSurface/*.stl; do\n'
+        '    echo edges > "${f%.stl}.eMesh"\n'
+        'done\n',
+    'snappyHexMesh':
+        'echo "snappyHexMesh $@"\n'
+        'test -f constant/polyMesh/points || exit 2\n'
+        'echo snappy > constant/polyMesh/points\n',
+    'checkMesh': 'echo "checkMesh $@"\n',
+    'simpleFoam':
+        'echo "simpleFoam $@"\n'
+        'echo "Time = 1"\n'
+        'sleep ${STUB_SLEEP:-0}\n',
+    'badFoam': 'echo "badFoam $@"\nexit 3\n',
+    'errFoam': 'echo "errFoam failed" >&2\nexit 1\n',
+    # start a child process in the same process group and wait for it
+    'groupFoam': 'sleep 30 &\necho $! > child.pid\nwait\n',
+    'decomposePar':
+        'echo "decomposePar $@"\n'
+        'mkdir -p processor0 processor1\n',
+    'mpirun': 'shift 2\nexec "$@"\n',
+    'reconstructPar': 'echo "reconstructPar $@"\n',
+    'reconstructParMesh': 'echo "reconstructParMesh $@"\n',
+}
+
+
+@pytest.fixture
+def stub_env(tmpdir):
+    """Environment with stub OpenFOAM executables on PATH."""
+    bin_folder = tmpdir.mkdir('stubs')
+    for name, body in STUBS.items():
+        fp = bin_folder.join(name)
+        fp.write('#!/bin/sh\n' + body)
+        os.chmod(str(fp), os.stat(str(fp)).st_mode | stat.S_IEXEC)
+    return dict(os.environ, PATH=str(bin_folder) + os.pathsep + os.environ['PATH'])
+
+
+def cube(name, size=1.0, origin=(0, 0, 0)):
+    """Create a butterfly geometry for a cube."""
+    from butterfly.geometry import BFGeometry
+    x, y, z = origin
+    vertices = [(x + dx * size, y + dy * size, z + dz * size)
+                for dz in (0, 1) for dy in (0, 1) for dx in (0, 1)]
+    faces = [(0, 2, 1), (1, 2, 3), (4, 5, 6), (5, 7, 6),
+             (0, 1, 4), (1, 5, 4), (2, 6, 3), (3, 6, 7),
+             (0, 4, 2), (2, 4, 6), (1, 3, 5), (3, 7, 5)]
+    return BFGeometry(name, vertices, faces)
+
+
+@pytest.fixture
+def case(tmpdir, stub_env):
+    """A butterfly case for a cube which runs stub OpenFOAM executables."""
+    from butterfly.case import Case
+    c = Case.from_bf_geometries('cube_case', [cube('cube')])
+    c.working_dir = str(tmpdir.mkdir('butterfly'))
+    c.runmanager.env = stub_env
+    return c
+
+
+def foam_header(cls, name, binary=False, location=None, byteorder='little'):
+    """FoamFile header for an OpenFOAM file."""
+    return (
+        'FoamFile\n{\n    version     2.0;\n    format      %s;\n'
+        '%s    class       %s;\n%s    object      %s;\n}\n\n' % (
+            'binary' if binary else 'ascii',
+            '    arch        "%s;label=32;scalar=64";\n' % (
+                'LSB' if byteorder == 'little' else 'MSB') if binary else '',
+            cls, '    location    "%s";\n' % location if location else '', name))
+
+
+def foam_list(values, width=1, binary=False, typecode='d', byteorder='little',
+              ascii_item=None):
+    """An OpenFOAM list of values as a string.
+
+    Args:
+        values: A flat list of values.
+        width: Number of values for each item.
+        ascii_item: Optional function to format an item in ascii format. By
+            default a single value is written as is and a vector as (x y z).
+    """
+    count = len(values) // width
+    if binary:
+        fmt = '%s%d%s' % ('<' if byteorder == 'little' else '>', len(values),
+                          {'d': 'd', 'i': 'i'}[typecode])
+        return '%d\n(%s)\n' % (count, struct.pack(fmt, *values))
+
+    items = [values[i:i + width] for i in range(0, len(values), width)]
+    if ascii_item is None:
+        def ascii_item(v):
+            return str(v[0]) if width == 1 else '(%s)' % ' '.join(map(str, v))
+    return '%d\n(\n%s\n)\n' % (count, '\n'.join(ascii_item(v) for v in items))
+
+
+def write_foam_file(fp, content, compress=False):
+    """Write an OpenFOAM file and return its path."""
+    if compress:
+        fp += '.gz'
+        f = gzip.open(fp, 'wb')
+    else:
+        f = open(fp, 'wb')
+    with f:
+        f.write(content)
+    return fp
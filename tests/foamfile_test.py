@@ -0,0 +1,212 @@
+"""Tests for writing, saving and updating foam files."""
+import os
+from collections import OrderedDict
+
+from butterfly.blockMeshDict import BlockMeshDict
+from butterfly.controlDict import ControlDict
+from butterfly.foamfile import FoamFile, foam_file_from_file
+
+
+def foam_file(values=None):
+    default_values = OrderedDict([
+        ('application', 'simpleFoam'),
+        ('deltaT', 1.5),
+        ('title', 'say "hi" @ 5'),
+        ('solvers', OrderedDict([
+            ('p', OrderedDict([('solver', 'GAMG'), ('tolerance', '1e-7'),
+                               ('relTol', 0.1)])),
+            ('U', OrderedDict([('solver', 'smoothSolver'), ('nSweeps', 2)]))])),
+        ('functions', {}),
+        ('writeCompression', None),
+        ('runTimeModifiable', True),
+        ('probeLocations', [(1, 2, 3), (4, 5.5, 6)])])
+    return FoamFile('testDict', 'dictionary', 'system',
+                    default_values=default_values, values=values)
+
+
+def test_body():
+    assert foam_file().body() == (
+        'application\t\tsimpleFoam;\n\n'
+        'deltaT\t\t1.5;\n\n'
+        'title\t\tsay "hi" @ 5;\n\n'
+        'solvers\n{\n\n'
+        '    p\n    {\n\n'
+        '        solver\t\tGAMG;\n\n'
+        '        tolerance\t\t1e-7;\n\n'
+        '        relTol\t\t0.1;\n\n'
+        '    }\n\n'
+        '    U\n    {\n\n'
+        '        solver\t\tsmoothSolver;\n\n'
+        '        nSweeps\t\t2;\n\n'
+        '    }\n\n'
+        '}\n\n'
+        'functions{}\n\n'
+        'runTimeModifiable\t\ttrue;\n\n'
+        'probeLocations\t\t((1 2 3) (4 5.5 6));')
+
+
+def test_round_trip(tmpdir):
+    ff = foam_file()
+    tmpdir.mkdir('system')
+    fp = ff.save(str(tmpdir))
+    assert fp == os.path.join(str(tmpdir), 'system', 'testDict')
+    with open(fp, 'rb') as inf:
+        assert inf.read() == ff.to_openfoam()
+
+    values = foam_file_from_file(fp)
+    assert values['title'] == 'say "hi" @ 5'
+    assert values['solvers']['p'] == \
+        {'solver': 'GAMG', 'tolerance': '1e-7', 'relTol': '0.1'}
+    assert values['probeLocations'] == '((1 2 3) (4 5.5 6))'
+    assert 'writeCompression' not in values
+
+    loaded = FoamFile.from_file(fp)
+    assert (loaded.name, loaded.location) == ('testDict', '"system"')
+    assert loaded.values == values
+
+
+def test_save_block_mesh_dict(tmpdir):
+    # blockMeshDict is written from its own to_openfoam
+    bmd = BlockMeshDict.from_min_max((0, 0, 0), (2, 2, 2))
+    tmpdir.mkdir('system')
+    fp = bmd.save(str(tmpdir))
+    with open(fp, 'rb') as inf:
+        content = inf.read()
+    assert content == bmd.to_openfoam()
+    assert 'convertToMeters 1.0000;' in content
+    assert bmd.is_saved(str(tmpdir))
+
+
+def test_is_saved(tmpdir):
+    project = str(tmpdir)
+    tmpdir.mkdir('system')
+    ff = foam_file()
+    assert not ff.is_saved(project)
+
+    fp = ff.save(project)
+    assert ff.is_saved(project)
+    assert ff.content_hash() == foam_file().content_hash()
+    # a new instance with the same values reads the file once
+    assert foam_file().is_saved(project)
+
+    ff.values['deltaT'] = 2
+    assert ff.content_hash() != foam_file().content_hash()
+    assert not ff.is_saved(project)
+    ff.save(project)
+    assert ff.is_saved(project)
+
+    # the file is changed by someone else
+    with open(fp, 'ab') as outf:
+        outf.write('\n')
+    assert not ff.is_saved(project)
+
+    assert ff.save(project, overwrite=False) is None
+    assert not ff.is_saved(project)
+
+
+def test_update_values():
+    ff = foam_file()
+    assert ff.update_values({}) == []
+    # values of different types are compared as strings
+    assert ff.update_values({'deltaT': '1.5', 'solvers': ff.values['solvers']}) == []
+    assert ff.update_values(
+        {'solvers': {'p': {'tolerance': '1e-7', 'relTol': '0.1'}}}) == []
+
+    changes = ff.update_values(
+        {'deltaT': 2, 'solvers': {'p': {'tolerance': '1e-6', 'maxIter': 10},
+                                  'U': {'nSweeps': 2}},
+         'endTime': 100}, mute=True)
+    assert sorted(changes) == [('deltaT',), ('endTime',),
+                               ('solvers', 'p', 'maxIter'),
+                               ('solvers', 'p', 'tolerance')]
+    assert ff.values['deltaT'] == 2
+    assert ff.values['endTime'] == 100
+    # only the changed values are updated
+    assert ff.values['solvers']['p'] == \
+        {'solver': 'GAMG', 'tolerance': '1e-6', 'relTol': 0.1, 'maxIter': 10}
+    assert ff.values['solvers']['U'] == {'solver': 'smoothSolver', 'nSweeps': 2}
+
+    # a dictionary replaced by a value and the other way round
+    changes = ff.update_values({'functions': 'none', 'deltaT': {'a': 1}}, mute=True)
+    assert sorted(changes) == [('deltaT',), ('functions',)]
+    assert ff.values['functions'] == 'none'
+    assert ff.values['deltaT'] == {'a': 1}
+
+    changes = ff.update_values({'solvers': {'p': {'solver': 'PCG'}}}, replace=True)
+    assert changes == [('solvers', 'p', 'solver')]
+    assert ff.values['solvers'] == {'p': {'solver': 'PCG'}}
+
+
+def test_update_values_log(capsys):
+    cd = ControlDict()
+    cd.update_values({'endTime': 2000, 'writeInterval': 100, 'newKey': 'a'})
+    out = capsys.readouterr()[0]
+    assert 'ControlDict.endTime is changed from "1000" to "2000".' in out
+    assert 'ControlDict :: New values are added for newKey.' in out
+    assert cd.update_values({'endTime': '2000'}) == []
+    assert capsys.readouterr()[0] == ''
+
+
+def test_case_save(case):
+    saved = case.save()
+    assert saved.unchanged == []
+    assert os.path.join(case.project_dir, 'system', 'controlDict') in saved.written
+    stl = os.path.join(case.triSurface_folder, 'cube_case.stl')
+    assert stl in saved.written
+
+    saved = case.save()
+    assert saved.written == []
+    assert stl in saved.unchanged
+
+    case.controlDict.endTime = 10
+    saved = case.save()
+    assert saved.written == [os.path.join(case.project_dir, 'system', 'controlDict')]
+
+    # the stl file is written again if it is changed on disk
+    with open(stl, 'ab') as outf:
+        outf.write('\n')
+    saved = case.save()
+    assert saved.written == [stl]
+
+    # or the geometry is changed
+    geo = case.geometries[0]
+    content_hash = geo.content_hash
+    geo.name = 'box'
+    assert geo.content_hash != content_hash
+    saved = case.save()
+    assert saved.written == [stl]
+
+
+def test_case_save_serializes_once(case, monkeypatch):
+    case.save()
+    calls = []
+
+    def count(ff, method):
+        # only count the outer call. to_openfoam and iter_openfoam call each other.
+        def wrapper():
+            if getattr(ff, '_serializing', False):
+                return method()
+            calls.append(ff.name)
+            ff._serializing = True
+            try:
+                return method()
+            finally:
+                ff._serializing = False
+        return wrapper
+
+    for ff in case.foam_files:
+        monkeypatch.setattr(ff, 'to_openfoam', count(ff, ff.to_openfoam))
+        monkeypatch.setattr(ff, 'iter_openfoam', count(ff, ff.iter_openfoam))
+
+    saved = case.save()
+    assert saved.written == []
+    names = [ff.name for ff in case.foam_files if ff.name in case.MINFOAMFIles]
+    assert sorted(calls) == sorted(names)
+
+    del calls[:]
+    case.controlDict.endTime = 10
+    saved = case.save()
+    assert saved.written == [os.path.join(case.project_dir, 'system', 'controlDict')]
+    assert sorted(calls) == sorted(names)
+    with open(saved.written[0], 'rb') as inf:
+        assert 'endTime\t\t10;' in inf.read()
@@ -0,0 +1,203 @@
+"""Tests for butterfly meshes and geometries."""
+from array import array
+
+import pytest
+
+from butterfly.geometry import BFGeometry, bf_geometry_from_stl_block, \
+    calculate_min_max, calculate_min_max_for_angles, convex_hull_2d, \
+    weld_vertices, _BFMesh, _FaceArray, _VectorArray, _calculate_rotated_min_max
+from butterfly.stl.ascii import format_solid
+from butterfly.vectormath import rotate
+
+from .conftest import cube
+
+
+def test_vector_array():
+    vectors = _VectorArray.from_vectors([(0, 1, 2), (3, 4, 5, 9), [6, 7, 8]])
+    assert vectors.values == array('d', range(9))
+    assert _VectorArray.from_vectors(vectors) is vectors
+    assert _VectorArray.from_vectors(vectors.values).values is vectors.values
+
+    assert len(vectors) == 3
+    assert vectors[0] == (0, 1, 2)
+    assert vectors[-1] == vectors[2] == (6, 7, 8)
+    assert vectors[-3] == (0, 1, 2)
+    for i in (3, -4):
+        with pytest.raises(IndexError):
+            vectors[i]
+    assert vectors[1:] == ((3, 4, 5), (6, 7, 8))
+    assert vectors[::-2] == ((6, 7, 8), (0, 1, 2))
+    assert vectors[5:] == ()
+    assert list(vectors) == [(0, 1, 2), (3, 4, 5), (6, 7, 8)]
+
+    # vectors are equal to tuples and lists with the same values
+    assert vectors == ((0, 1, 2), (3, 4, 5), (6, 7, 8))
+    assert vectors == [[0, 1, 2], [3, 4, 5], [6, 7, 8]]
+    assert vectors != ((0, 1, 2), (3, 4, 5))
+    assert vectors != ((0, 1, 2), (3, 4, 5), (6, 7, 9))
+    assert vectors != 5
+    assert repr(vectors) == '((0.0, 1.0, 2.0), (3.0, 4.0, 5.0), (6.0, 7.0, 8.0))'
+
+
+def test_face_array():
+    faces = _FaceArray.from_faces(((0, 1, 2), [2, 3, 0]))
+    assert (faces.width, faces.offsets) == (3, None)
+    assert faces.indices == array('l', (0, 1, 2, 2, 3, 0))
+    assert _FaceArray.from_faces(faces) is faces
+    assert _FaceArray.from_faces(faces.indices) == faces
+    assert len(_FaceArray.from_faces(())) == 0
+
+    assert len(faces) == 2
+    assert faces[-1] == faces[1] == (2, 3, 0)
+    with pytest.raises(IndexError):
+        faces[2]
+    assert faces[:1] == ((0, 1, 2),)
+    assert faces == [[0, 1, 2], [2, 3, 0]]
+    assert faces != ((0, 1, 2),)
+
+    # triangles and quads
+    mixed = _FaceArray.from_faces(((0, 1, 2, 3), (0, 1, 4), (1, 2, 3, 4)))
+    assert mixed.width is None
+    assert mixed.offsets == array('l', (0, 4, 7, 11))
+    assert len(mixed) == 3
+    assert mixed[0] == (0, 1, 2, 3)
+    assert mixed[-2] == (0, 1, 4)
+    assert mixed[1:] == ((0, 1, 4), (1, 2, 3, 4))
+    assert list(mixed) == [(0, 1, 2, 3), (0, 1, 4), (1, 2, 3, 4)]
+    assert mixed == ((0, 1, 2, 3), (0, 1, 4), (1, 2, 3, 4))
+    assert mixed != ((0, 1, 2, 3), (0, 1, 4), (1, 2, 3))
+    for i in (3, -4):
+        with pytest.raises(IndexError):
+            mixed[i]
+    assert repr(mixed) == '((0, 1, 2, 3), (0, 1, 4), (1, 2, 3, 4))'
+
+
+def test_bf_mesh():
+    # a square as a quad and a triangle on the xz plane
+    vertices = ((0, 0, 0), (2, 0, 0), (2, 2, 0), (0, 2, 0), (0, 0, 2))
+    mesh = _BFMesh('mixed', vertices, ((0, 1, 2, 3), (0, 1, 4)))
+    assert mesh.vertices == vertices
+    assert mesh.face_indices == ((0, 1, 2, 3), (0, 1, 4))
+    assert mesh.normals == ((0, 0, 1), (0, -1, 0))
+    assert mesh.area == pytest.approx(6)
+    assert list(mesh.min) == [0, 0, 0]
+    assert list(mesh.max) == [2, 2, 2]
+    assert mesh.height_range == (0, 2)
+    assert repr(mesh) == '_BFMesh:mixed'
+
+    # normals are not calculated if they are provided
+    mesh = _BFMesh('mixed', vertices, ((0, 1, 2, 3), (0, 1, 4)),
+                   ((0, 0, -1), (0, 1, 0)))
+    assert mesh.normals == ((0, 0, -1), (0, 1, 0))
+    with pytest.raises(AssertionError):
+        _BFMesh('mixed', vertices, ((0, 1, 2, 3), (0, 1, 4)), ((0, 0, 1),))
+    with pytest.raises(ValueError):
+        _BFMesh('line', vertices, ((0, 1, 0),))
+
+    duplicate = mesh.duplicate()
+    assert duplicate.vertices == mesh.vertices
+    assert duplicate.face_indices == mesh.face_indices
+    assert duplicate.content_hash == mesh.content_hash
+
+
+def test_weld_vertices():
+    corners = (0, 0, 0, 1, 0, 0, 0, 1, 0,
+               1, 0, 0, 1, 1, 0, 0, 1 + 1e-7, 0)
+    vertices, indices, merged = weld_vertices(corners)
+    assert len(vertices) == 3 * 5
+    assert tuple(indices) == (0, 1, 2, 1, 3, 4)
+    assert merged == 1
+
+    vertices, indices, merged = weld_vertices(corners, tolerance=1e-5)
+    assert len(vertices) == 3 * 4
+    assert tuple(indices) == (0, 1, 2, 1, 3, 2)
+    assert merged == 2
+
+
+def test_bf_geometry_from_stl_block():
+    geo = cube('box', size=2)
+    assert geo.merged_vertex_count == 0
+
+    stl = ''.join(format_solid('box', geo.facet_values()))
+    converted = bf_geometry_from_stl_block(stl, convert_from_meters=0.5)
+    assert converted.name == 'box'
+    assert len(converted.vertices) == 8
+    assert len(converted.face_indices) == 12
+    # 12 triangles have 36 corners and 8 distinct vertices
+    assert converted.merged_vertex_count == 28
+    assert list(converted.min) == [0, 0, 0]
+    assert list(converted.max) == [1, 1, 1]
+
+
+def test_vertices_setter():
+    geo = BFGeometry('square', ((0, 0, 0), (2, 0, 0), (2, 2, 0), (0, 2, 0)),
+                     ((0, 1, 2), (0, 2, 3)))
+    assert tuple(geo.normals) == ((0, 0, 1), (0, 0, 1))
+    hull = geo.convex_hull
+    assert hull == ((0, 0), (2, 0), (2, 2), (0, 2))
+    # the hull and the hash are calculated once
+    assert geo.convex_hull is hull
+    content_hash = geo.content_hash
+    assert geo.content_hash is content_hash
+
+    # rotate the square to stand on the yz plane
+    geo.vertices = ((0, 0, 0), (0, 2, 0), (0, 2, 2), (0, 0, 2))
+    assert geo.convex_hull is not hull
+    assert geo.convex_hull == ((0, 0), (0, 2))
+    assert geo.content_hash != content_hash
+    assert list(geo.min) == [0, 0, 0]
+    assert list(geo.max) == [0, 2, 2]
+    assert tuple(geo.normals) == ((1, 0, 0), (1, 0, 0))
+    assert geo.facet_values()[:3].tolist() == [1, 0, 0]
+
+
+def rotated_min_max(vertices, angle):
+    """Min and max of all the vertices rotated by -angle."""
+    rotated = [rotate((0, 0, 0), v, -angle) for v in vertices]
+    return [min(c) for c in zip(*rotated)], [max(c) for c in zip(*rotated)]
+
+
+def test_convex_hull_2d():
+    square = [(0, 0), (1, 0), (1, 1), (0, 1)]
+    # points inside and on the edges are not in the hull
+    assert convex_hull_2d(square + [(0.5, 0.5), (0.5, 0), (1, 1), (0, 0.5)]) == \
+        square
+    assert convex_hull_2d([(2, 2), (0, 0), (1, 1), (3, 3)]) == [(0, 0), (3, 3)]
+    assert convex_hull_2d([(1, 2), (1, 2)]) == [(1, 2)]
+    assert convex_hull_2d([]) == []
+
+
+@pytest.mark.parametrize('vertices', [
+    [(0, 0, 0), (1, 0, 1), (1, 1, 2), (0, 1, 3), (0.5, 0.5, 0), (0.2, 0.9, 1)],
+    # collinear points
+    [(0, 0, 0), (1, 2, 1), (2, 4, 0), (3, 6, 5)],
+    # a single vertex
+    [(1, 2, 3)]])
+def test_rotated_min_max(vertices):
+    angles = (0, 15, 45, 90, 135.5, 200, -30, 359)
+    hull = convex_hull_2d(v[:2] for v in vertices)
+    z_range = min(v[2] for v in vertices), max(v[2] for v in vertices)
+    for angle, min_max in zip(
+            angles, _calculate_rotated_min_max(hull, z_range, angles)):
+        expected = rotated_min_max(vertices, angle)
+        assert min_max[0] == pytest.approx(expected[0])
+        assert min_max[1] == pytest.approx(expected[1])
+
+
+def test_calculate_min_max_for_angles():
+    geometries = (cube('a'), cube('b', size=2, origin=(3, -1, 1)))
+    vertices = [v for geo in geometries for v in geo.vertices]
+    angles = (0, 30, 90, 212)
+    results = calculate_min_max_for_angles(geometries, angles)
+    assert len(results) == len(angles)
+    for angle, (min_pt, max_pt) in zip(angles, results):
+        # points are rotated back to XY coordinates
+        expected = [rotate((0, 0, 0), pt, angle)
+                    for pt in rotated_min_max(vertices, angle)]
+        assert min_pt == pytest.approx(expected[0])
+        assert max_pt == pytest.approx(expected[1])
+
+    min_pt, max_pt = calculate_min_max(geometries[1], 60)
+    expected = rotated_min_max(geometries[1].vertices, 60)
+    assert min_pt == pytest.approx(expected[0])
+    assert max_pt == pytest.approx(expected[1])
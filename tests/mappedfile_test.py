@@ -0,0 +1,80 @@
+"""Tests for memory-mapped OpenFOAM files in binary format."""
+import os
+
+import pytest
+
+from butterfly.mappedfile import MappedFoamFile, MappedPolyMesh
+
+from .conftest import foam_header, foam_list, write_foam_file
+
+POINTS = [0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 1.0, 1.0, 0.0, 0.0, 1.0, 0.5]
+
+
+def write_points(folder, byteorder='little'):
+    return write_foam_file(
+        os.path.join(str(folder), 'points'),
+        foam_header('vectorField', 'points', True, 'constant/polyMesh', byteorder) +
+        foam_list(POINTS, 3, True, 'd', byteorder))
+
+
+def test_mapped_list(tmpdir):
+    with MappedFoamFile(write_points(tmpdir)) as mf:
+        assert mf.is_binary
+        points = mf.lists[0]
+        assert len(points) == 4
+        assert points.width == 3
+        assert points[1] == (1.0, 0.0, 0.0)
+        assert points[-1] == (0.0, 1.0, 0.5)
+        assert list(points.to_array()) == POINTS
+        assert list(points.to_array(1, 3)) == POINTS[3:9]
+        assert list(points[::2]) == POINTS[0:3] + POINTS[6:9]
+        assert list(points) == [tuple(POINTS[i:i + 3]) for i in range(0, 12, 3)]
+        with pytest.raises(IndexError):
+            points[4]
+
+
+def test_view(tmpdir):
+    with MappedFoamFile(write_points(tmpdir)) as mf:
+        points = mf.lists[0]
+        assert list(points.view()) == POINTS
+        assert list(points.view(2)) == POINTS[6:]
+        assert list(points.view(1, 2)) == POINTS[3:6]
+        assert list(points.view(3, 1)) == []
+
+
+def test_big_endian(tmpdir):
+    with MappedFoamFile(write_points(tmpdir, 'big')) as mf:
+        points = mf.lists[0]
+        assert points.byteorder == 'big'
+        assert points[3] == (0.0, 1.0, 0.5)
+        assert list(points.to_array()) == POINTS
+        with pytest.raises(ValueError):
+            points.view()
+
+
+def test_mapped_polyMesh(tmpdir):
+    write_points(tmpdir)
+    write_foam_file(
+        str(tmpdir.join('faces')),
+        foam_header('faceCompactList', 'faces', True) +
+        foam_list([0, 3], 1, True, 'i') + foam_list([0, 1, 2], 1, True, 'i'))
+    with MappedPolyMesh(str(tmpdir)) as mesh:
+        offsets, indices = mesh.faces
+        assert list(offsets.to_array()) == [0, 3]
+        assert list(indices.view()) == [0, 1, 2]
+        assert mesh.points[2] == (1.0, 1.0, 0.0)
+
+
+def test_gzip_and_ascii(tmpdir):
+    fp = write_foam_file(
+        str(tmpdir.join('points')),
+        foam_header('vectorField', 'points', True) + foam_list(POINTS, 3, True),
+        compress=True)
+    with pytest.raises(ValueError):
+        MappedFoamFile(fp)
+
+    fp = write_foam_file(str(tmpdir.join('ascii')),
+                         foam_header('vectorField', 'points') + foam_list(POINTS, 3))
+    with MappedFoamFile(fp) as mf:
+        with pytest.raises(ValueError):
+            mf.lists
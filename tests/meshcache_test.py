@@ -0,0 +1,145 @@
+"""Tests for caching OpenFOAM meshes between cases."""
+import os
+import stat
+
+from butterfly.case import Case
+from butterfly.meshcache import MeshCache
+from butterfly.pipeline import Pipeline
+
+from .conftest import cube
+
+
+def write_polyMesh(folder, points='points'):
+    """Write a polyMesh folder with a blockMeshDict and a sets folder."""
+    folder.ensure('sets', dir=True)
+    folder.join('points').write(points)
+    folder.join('faces').write('faces')
+    folder.join('blockMeshDict').write('blockMeshDict')
+    folder.join('sets', 'cellZone').write('zone')
+    return str(folder)
+
+
+def test_put_and_get(tmpdir):
+    cache = MeshCache(str(tmpdir.join('cache')))
+    assert cache.keys == ()
+    assert not cache.get('abc', str(tmpdir.join('nothing')))
+
+    assert cache.put('abc', write_polyMesh(tmpdir.join('source'))) == 15
+    assert cache.has('abc')
+    assert cache.keys == ('abc',)
+    assert cache.size == 15
+    # blockMeshDict is not cached
+    assert not tmpdir.join('cache', 'abc', 'polyMesh', 'blockMeshDict').check()
+    assert repr(cache) == 'MeshCache::{}::1 meshes'.format(cache.folder)
+
+    # the mesh in the target replaces the current mesh
+    target = tmpdir.join('target')
+    write_polyMesh(target, 'old points')
+    target.join('old').write('old')
+    assert cache.get('abc', str(target))
+    assert sorted(os.listdir(str(target))) == \
+        ['blockMeshDict', 'faces', 'points', 'sets']
+    assert target.join('points').read() == 'points'
+    assert target.join('sets', 'cellZone').read() == 'zone'
+    # copies can be changed
+    target.join('points').write('new points')
+    assert tmpdir.join('cache', 'abc', 'polyMesh', 'points').read() == 'points'
+
+    # the same mesh is only added once
+    assert cache.put('abc', str(target)) == 15
+
+    cache.clear()
+    assert cache.keys == ()
+    assert cache.size == 0
+
+
+def test_hardlink(tmpdir):
+    cache = MeshCache(str(tmpdir.join('cache')), hardlink=True)
+    cache.put('abc', write_polyMesh(tmpdir.join('source')))
+    target = tmpdir.join('target')
+    assert cache.get('abc', str(target))
+    cached = tmpdir.join('cache', 'abc', 'polyMesh', 'points')
+    assert os.stat(str(target.join('points'))).st_ino == os.stat(str(cached)).st_ino
+    # cached files are read-only
+    assert not os.stat(str(target.join('points'))).st_mode & stat.S_IWUSR
+
+    # linked files are removed when another mesh is loaded
+    cache.put('def', write_polyMesh(tmpdir.join('other'), 'other'))
+    assert cache.get('def', str(target))
+    assert target.join('points').read() == 'other'
+    assert cached.read() == 'points'
+    # removing the links doesn't change the files in the cache
+    for key in ('abc', 'def'):
+        polyMesh = str(tmpdir.join('cache', key, 'polyMesh'))
+        for root, dirs, files in os.walk(polyMesh):
+            for f in files:
+                mode = stat.S_IMODE(os.stat(os.path.join(root, f)).st_mode)
+                assert mode == 0o444
+
+
+def test_evict(tmpdir):
+    cache = MeshCache(str(tmpdir.join('cache')), max_size=15 * 3)
+    for i, key in enumerate(('a', 'b', 'c')):
+        cache.put(key, write_polyMesh(tmpdir.join(key)))
+        os.utime(str(tmpdir.join('cache', key, 'size')), (i, i))
+
+    # a is used after b and c
+    cache.get('a', str(tmpdir.join('target')))
+    cache.put('d', write_polyMesh(tmpdir.join('d')))
+    assert sorted(cache.keys) == ['a', 'c', 'd']
+
+    assert cache.evict(15) == ('c', 'a')
+    assert cache.keys == ('d',)
+    assert cache.evict() == ()
+
+
+def test_key(case, tmpdir, stub_env):
+    case.save()
+    cache = MeshCache(str(tmpdir.join('cache')))
+    key = cache.key(case)
+
+    # the same geometry in another folder has the same key
+    other = Case.from_bf_geometries('cube_case', [cube('cube')])
+    other.working_dir = str(tmpdir.mkdir('other'))
+    other.save()
+    assert cache.key(other) == key
+
+    with open(os.path.join(case.project_dir, 'system', 'snappyHexMeshDict'),
+              'a') as outf:
+        outf.write('\n// changed\n')
+    assert cache.key(case) != key
+    key = cache.key(case)
+
+    with open(os.path.join(case.triSurface_folder, 'box.stl'), 'w') as outf:
+        outf.write('solid box\nendsolid box\n')
+    assert cache.key(case) != key
+
+    # files which don't define the mesh are not included
+    case.controlDict.endTime = 10
+    case.save()
+    key = cache.key(case)
+    with open(os.path.join(case.project_dir, 'system', 'controlDict'),
+              'a') as outf:
+        outf.write('\n// changed\n')
+    assert cache.key(case) == key
+
+
+def test_pipeline_with_mesh_cache(case, tmpdir, stub_env, capsys):
+    cache = MeshCache(str(tmpdir.join('cache')))
+    case.save()
+    assert Pipeline.from_case(case, mesh_cache=cache).run().success
+    assert cache.keys == (cache.key(case),)
+
+    other = Case.from_bf_geometries('cube_case', [cube('cube')])
+    other.working_dir = str(tmpdir.mkdir('other'))
+    other.runmanager.env = stub_env
+    other.save()
+    # no OpenFOAM executables. only checkMesh needs to run
+    other.runmanager.env = dict(stub_env, PATH='')
+    capsys.readouterr()
+    report = Pipeline.from_case(other, mesh_cache=cache).run()
+    assert 'Butterfly loaded the mesh from cache' in capsys.readouterr()[0]
+    assert report.executed == ('blockMesh', 'snappyHexMesh')
+    assert report.failed == ('checkMesh',)
+    with open(os.path.join(other.polyMesh_folder, 'points')) as inf:
+        assert inf.read() == 'snappy\n'
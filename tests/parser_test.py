@@ -0,0 +1,215 @@
+"""Tests for OpenFOAM dictionary and residual parsers."""
+import os
+
+import pytest
+
+from butterfly.parser import CppDictParser, ResidualParser
+from butterfly.snappyHexMeshDict import SnappyHexMeshDict
+
+ASSETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets')
+
+
+def test_snappyHexMeshDict():
+    values = CppDictParser.from_file(
+        os.path.join(ASSETS, 'snappyHexMeshDict')).values
+
+    assert values['FoamFile']['object'] == 'snappyHexMeshDict'
+    assert values['castellatedMesh'] == 'true'
+    assert values['geometry'] == {
+        'motorBike.obj': {'type': 'triSurfaceMesh', 'name': 'motorBike'},
+        'refinementBox': {'type': 'searchableBox', 'min': '(-1.0 -0.7 0.0)',
+                          'max': '( 8.0 0.7 2.5)'}}
+
+    cmc = values['castellatedMeshControls']
+    assert cmc['maxGlobalCells'] == '2000000'
+    # a list of dictionaries is a single value
+    assert cmc['features'] == '( { file "motorBike.eMesh"; level 6; } )'
+    assert cmc['refinementSurfaces'] == {
+        'motorBike': {'level': '(5 6)',
+                      'patchInfo': {'type': 'wall', 'inGroups': '(motorBikeGroup)'}}}
+    assert cmc['refinementRegions'] == {
+        'refinementBox': {'mode': 'inside', 'levels': '((1E15 4))'}}
+    assert cmc['locationInMesh'] == '(3.0001 3.0001 0.43)'
+
+    assert values['addLayersControls']['layers'] == {
+        '"(lowerWall|motorBike).*"': {'nSurfaceLayers': '1'}}
+    # #include doesn't swallow the entry after it
+    assert values['meshQualityControls'] == {
+        '#include': '"meshQualityDict"', 'nSmoothScale': '4',
+        'errorReduction': '0.75'}
+    assert values['writeFlags'] == '( scalarLevels layerSets layerFields )'
+    assert values['mergeTolerance'] == '1e-6'
+
+
+def test_controlDict():
+    values = CppDictParser.from_file(os.path.join(ASSETS, 'controlDict')).values
+
+    assert values['FoamFile'] == {
+        'version': '2.0', 'format': 'ascii', 'class': 'dictionary',
+        'location': '"system"', 'object': 'controlDict'}
+    assert values['application'] == 'simpleFoam'
+    assert values['startFrom'] == 'latestTime'
+    assert values['endTime'] == '500'
+    assert values['writeCompression'] == 'off'
+    assert values['runTimeModifiable'] == 'true'
+    # repeated keys are overwritten and only the last #include is kept
+    assert values['functions'] == {'#include': '"ensightWrite"'}
+
+
+def test_butterfly_dictionary():
+    s_hmd = SnappyHexMeshDict()
+    values = CppDictParser(s_hmd.to_openfoam()).values
+    assert values['FoamFile']['object'] == 'snappyHexMeshDict'
+    assert values['castellatedMeshControls']['features'] == '()'
+    assert values['snapControls']['nSmoothPatch'] == \
+        str(s_hmd.values['snapControls']['nSmoothPatch'])
+
+
+def test_directives():
+    values = CppDictParser(
+        '#include "initialConditions"\n'
+        'dimensions [0 1 -1 0 0 0 0];\n'
+        'internalField uniform $flowVelocity;\n'
+        '#inputMode merge\n'
+        'a 1;\n').values
+    assert values == {'#include': '"initialConditions"',
+                      'dimensions': '[0 1 -1 0 0 0 0]',
+                      'internalField': 'uniform $flowVelocity',
+                      '#inputMode': 'merge', 'a': '1'}
+
+
+def test_nested_dictionaries():
+    # entries and sub-dictionaries of function objects take the fast path
+    values = CppDictParser(
+        'functions\n{\n'
+        '    probes0 // first\n    {\n'
+        '        type probes;\n        libs ("libsampling.so");\n'
+        '        fields (p U);\n        enabled;\n'
+        '        dict { a  1 /2; "b.*" "x;y"; }\n'
+        '        #include "probeDict"\n        writeControl timeStep;\n'
+        '    }\n}\n').values
+    assert values == {'functions': {'probes0': {
+        'type': 'probes', 'libs': '("libsampling.so")', 'fields': '(p U)',
+        'enabled': '', 'dict': {'a': '1 /2', '"b.*"': '"x;y"'},
+        '#include': '"probeDict"', 'writeControl': 'timeStep'}}}
+
+
+def test_lists():
+    values = CppDictParser(
+        'boundary\n(\n    inlet\n    {\n        type patch;\n'
+        '        faces\n        (\n            (0 4 7 3)\n        );\n    }\n);\n'
+        'probeLocations ((0 0 1) (1 1 1));\n'
+        'b 2;\n').values
+    assert values == {
+        'boundary': '( inlet { type patch; faces ( (0 4 7 3) ); } )',
+        'probeLocations': '((0 0 1) (1 1 1))', 'b': '2'}
+
+
+def test_missing_semicolon():
+    # the last entry of a dictionary or file doesn't need a ;
+    assert CppDictParser('a 1;\nb 2').values == {'a': '1', 'b': '2'}
+    assert CppDictParser('d { a 1; b 2 }\nc 3;').values == \
+        {'d': {'a': '1', 'b': '2'}, 'c': '3'}
+    # a missing ; in the middle joins two entries
+    assert CppDictParser('a 1\nb 2;\n').values == {'a': '1 b 2'}
+
+
+def test_strings_comments_and_code():
+    values = CppDictParser(
+        '/* header\n comment */\n'
+        'a "http://example.com; b"; // comment\n'
+        'code\n#{\n    int i = 0; { }\n#};\n'
+        'c  3   4 ;\n').values
+    assert values == {'a': '"http://example.com; b"',
+                      'code': '#{ int i = 0; { } #}', 'c': '3 4'}
+
+
+def test_brackets():
+    with pytest.raises(ValueError):
+        CppDictParser('a { b 1; ')
+    with pytest.raises(ValueError):
+        CppDictParser('a 1; }')
+
+
+def test_repr():
+    parser = CppDictParser('a 1;')
+    assert parser.ToString() == repr(parser) == "{'a': '1'}"
+
+
+def log_lines(time, residuals):
+    """Lines of a solver log for a timestep."""
+    lines = ['Time = {}\n'.format(time), '\n']
+    for q, ir in residuals:
+        lines.append(
+            'smoothSolver:  Solving for {}, Initial residual = {}, '
+            'Final residual = {}, No Iterations 2\n'.format(q, ir, ir / 100))
+    lines.append('ExecutionTime = 0.1 s  ClockTime = 0 s\n\n')
+    return ''.join(lines)
+
+
+def test_residual_parser_incremental(tmpdir):
+    log = tmpdir.join('simpleFoam.log')
+    log.write('Starting time loop\n\n' + log_lines(1, (('Ux', 0.5), ('p', 1.0))))
+
+    parser = ResidualParser(str(log))
+    assert list(parser.get_times()) == [1]
+    assert parser.quantities == ['Ux', 'p']
+    assert parser.get_latest_residuals() == {'Ux': 0.5, 'p': 1.0}
+    # nothing new
+    assert parser.parse() == 0
+
+    # a timestep which is only partly written
+    text = log_lines(2, (('Ux', 0.25), ('p', 0.5)))
+    log.write(text[:40], mode='a')
+    assert parser.parse() == 1
+    assert parser.timestep == 2
+    assert parser.get_latest_residuals() == {}
+
+    log.write(text[40:] + log_lines(3, (('Ux', 0.125), ('p', 0.25))), mode='a')
+    assert parser.parse() == 1
+    assert list(parser.get_times()) == [1, 2, 3]
+    assert list(parser.get_residuals('Ux')) == [0.5, 0.25, 0.125]
+    assert list(parser.get_residuals('p')) == [1.0, 0.5, 0.25]
+
+
+def test_residual_parser_truncated_log(tmpdir):
+    log = tmpdir.join('simpleFoam.log')
+    log.write(''.join(log_lines(t, (('Ux', 1.0 / t),)) for t in range(1, 6)))
+    parser = ResidualParser(str(log))
+    assert len(parser.get_times()) == 5
+
+    # the log is overwritten by a new run
+    log.write(log_lines(1, (('k', 0.1),)))
+    assert parser.parse() == 1
+    assert list(parser.get_times()) == [1]
+    assert parser.quantities == ['k']
+    assert list(parser.get_residuals('k')) == [0.1]
+
+
+def test_residual_parser_columns(tmpdir):
+    log = tmpdir.join('simpleFoam.log')
+    # k is solved from the third timestep
+    log.write(''.join(
+        log_lines(t, (('Ux', 10.0 ** -t), ('k', 0.5)) if t > 2 else (('Ux', 10.0 ** -t),))
+        for t in range(1, 11)))
+    parser = ResidualParser(str(log))
+
+    assert parser.time_range == (1, 10)
+    k = parser.get_residuals('k')
+    assert k[0] != k[0] and k[1] != k[1]  # nan
+    assert list(k[2:]) == [0.5] * 8
+    assert list(parser.get_residuals('Ux', (3, 5))) == \
+        pytest.approx([1e-3, 1e-4, 1e-5])
+    assert list(parser.get_residuals('Ux', (2.5, 3.5))) == pytest.approx([1e-3])
+    assert parser.get_residuals('nothing') == ()
+
+    times, values = parser.decimate('Ux', count=4)
+    assert list(times) == [1, 4, 7, 10]
+    assert list(values) == pytest.approx([1e-1, 1e-4, 1e-7, 1e-10])
+
+    # log10 of Ux drops by one in each timestep and k is flat
+    assert parser.slope('Ux', window=5) == pytest.approx(-1)
+    assert parser.slope('k', window=5) == pytest.approx(0)
+    assert not parser.is_converged(window=5)
+    assert parser.is_converged(window=5, quantities=('k',))
+    assert parser.is_converged(residual=1e-6, window=5)
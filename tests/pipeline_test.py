@@ -0,0 +1,124 @@
+"""Tests for butterfly Pipeline against stub OpenFOAM executables."""
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+from butterfly.pipeline import Pipeline, Step
+
+
+def test_from_case_without_surfaceFeatureExtractDict(case):
+    case.save()
+    pipeline = Pipeline.from_case(case)
+    assert tuple(s.name for s in pipeline.steps) == \
+        ('blockMesh', 'snappyHexMesh', 'checkMesh')
+    assert pipeline.get_step('snappyHexMesh').depends_on == ('blockMesh',)
+
+
+def test_second_run_is_noop(case):
+    case.save()
+    pipeline = Pipeline.from_case(case)
+    report = pipeline.run()
+    assert report.success
+    assert report.executed == ('blockMesh', 'snappyHexMesh', 'checkMesh')
+    assert os.path.isfile(pipeline.manifest_file)
+
+    assert pipeline.plan() == ()
+    report = Pipeline.from_case(case).run()
+    assert report.success
+    assert report.executed == ()
+    assert report.skipped == ('blockMesh', 'snappyHexMesh', 'checkMesh')
+
+
+def test_surfaceFeatureExtract(case):
+    case.save()
+    with open(os.path.join(case.project_dir, 'system',
+                           'surfaceFeatureExtractDict'), 'w') as outf:
+        outf.write('cube.stl {extractionMethod extractFromSurface;}\n')
+
+    pipeline = Pipeline.from_case(case)
+    assert pipeline.get_step('snappyHexMesh').depends_on == \
+        ('blockMesh', 'surfaceFeatureExtract')
+    report = pipeline.run()
+    assert report.success
+    assert set(report.executed) == \
+        set(('blockMesh', 'surfaceFeatureExtract', 'snappyHexMesh', 'checkMesh'))
+    assert os.path.isfile(os.path.join(case.project_dir, 'constant', 'triSurface',
+                                       'cube_case.eMesh'))
+    assert Pipeline.from_case(case).run().executed == ()
+
+
+def test_changed_input_reruns_overwritten_steps(case):
+    case.save()
+    Pipeline.from_case(case).run()
+
+    with open(os.path.join(case.project_dir, 'system', 'snappyHexMeshDict'),
+              'a') as outf:
+        outf.write('\n// changed\n')
+
+    # snappyHexMesh overwrites the mesh from blockMesh so blockMesh runs again
+    pipeline = Pipeline.from_case(case)
+    assert pipeline.plan() == ('blockMesh', 'snappyHexMesh', 'checkMesh')
+    assert pipeline.run().executed == ('blockMesh', 'snappyHexMesh', 'checkMesh')
+    assert pipeline.plan() == ()
+    assert pipeline.plan(force=True) == ('blockMesh', 'snappyHexMesh', 'checkMesh')
+
+
+def test_missing_output_is_up_to_date(case):
+    calls = []
+    pipeline = Pipeline(case, [
+        Step('noOutput', lambda: calls.append('noOutput'),
+             outputs=('constant/notCreated',))])
+    assert pipeline.run().executed == ('noOutput',)
+    assert pipeline.plan() == ()
+    assert pipeline.run().executed == ()
+    assert calls == ['noOutput']
+
+    # once the output shows up it is not the output of the last execution
+    os.makedirs(os.path.join(case.project_dir, 'constant', 'notCreated'))
+    with open(os.path.join(case.project_dir, 'constant', 'notCreated', 'a'),
+              'w') as outf:
+        outf.write('a')
+    assert pipeline.plan() == ('noOutput',)
+
+
+def test_failed_step_resumes(case):
+    state = {'fail': True}
+
+    def second():
+        return not state['fail']
+
+    pipeline = Pipeline(case, [
+        Step('first', lambda: True),
+        Step('second', second, depends_on=('first',)),
+        Step('third', lambda: True, depends_on=('second',))])
+
+    report = pipeline.run()
+    assert not report.success
+    assert report.executed == ('first',)
+    assert report.failed == ('second', 'third')
+    assert report.errors == {'second': 'second failed.'}
+
+    state['fail'] = False
+    report = pipeline.run()
+    assert report.success
+    assert report.skipped == ('first',)
+    assert report.executed == ('second', 'third')
+
+
+def test_run_is_interruptible(case):
+    case.save()
+    done = threading.Event()
+    pipeline = Pipeline(case, [Step('wait', lambda: done.wait(30))])
+    timer = threading.Timer(0.2, os.kill, (os.getpid(), signal.SIGINT))
+    timer.start()
+    start = time.time()
+    try:
+        with pytest.raises(KeyboardInterrupt):
+            pipeline.run()
+    finally:
+        done.set()
+        timer.cancel()
+    assert time.time() - start < 5
@@ -0,0 +1,154 @@
+"""Tests for RunManagerPosix against stub OpenFOAM executables."""
+import os
+import signal
+import time
+
+import pytest
+
+from butterfly.runmanager_posix import ProcessChain, RunManagerPosix
+from butterfly.decomposeParDict import DecomposeParDict
+
+
+def read(fp):
+    with open(fp, 'r') as f:
+        return f.read()
+
+
+def is_alive(pid):
+    """Check if a process is running and is not a zombie."""
+    try:
+        with open('/proc/{}/stat'.format(pid)) as f:
+            return f.read().split(')')[-1].split()[0] != 'Z'
+    except IOError:
+        return False
+
+
+@pytest.fixture
+def rm(tmpdir, stub_env):
+    return RunManagerPosix('stub_case', str(tmpdir.mkdir('stub_case')), stub_env)
+
+
+def test_serial_run(rm):
+    log = rm.run('blockMesh', ('-dict', 'system/blockMeshDict'))
+    assert rm.returncode == 0
+    assert log.process.returncodes == [0]
+    assert log.logfiles == ('./log/blockMesh.log',)
+    assert log.errorfiles == ('./log/blockMesh.err',)
+
+    logfile = os.path.join(rm.project_folder, 'log', 'blockMesh.log')
+    errfile = os.path.join(rm.project_folder, 'log', 'blockMesh.err')
+    assert read(logfile).strip() == 'blockMesh -dict system/blockMeshDict'
+    assert read(errfile) == ''
+    assert os.path.isfile(
+        os.path.join(rm.project_folder, 'constant', 'polyMesh', 'points'))
+
+
+def test_err_file(rm):
+    log = rm.run('errFoam')
+    assert log.process.returncode == 1
+    errfile = os.path.join(rm.project_folder, log.errorfiles[0])
+    assert read(errfile).strip() == 'errFoam failed'
+    has_content, content = rm.check_file_contents(
+        [os.path.join(rm.project_folder, f) for f in log.errorfiles], mute=True)
+    assert has_content
+    assert content == 'errFoam failed'
+
+
+def test_missing_command(rm):
+    with pytest.raises(OSError):
+        rm.run('noSuchFoam')
+
+
+def test_unicode_command(rm):
+    # commands and arguments can be unicode strings in python 2
+    log = rm.command(u'simpleFoam', u'-case  folder')
+    assert log.cmd == (('simpleFoam', '-case', 'folder'),)
+    assert rm.run(u'blockMesh', (u'-dict system/blockMeshDict',)).process.returncode == 0
+
+
+def test_on_success_failure(rm):
+    def on_success():
+        raise ValueError('failed to rename the folders')
+
+    log = os.path.join(rm.project_folder, 'checkMesh.log')
+    chain = ProcessChain([('checkMesh',)], [log], [log + '.err'],
+                         rm.project_folder, rm.env, on_success)
+    with pytest.raises(ValueError):
+        chain.start()
+    # the chain is finished even though on_success failed
+    assert chain.returncodes == [0, 1]
+    assert chain.poll() == chain.wait() == 1
+
+    chain = ProcessChain([('checkMesh',)], [log], [log + '.err'],
+                         rm.project_folder, rm.env, on_success).start(wait=False)
+    timeout_start = time.time()
+    while chain.poll() is None:
+        assert time.time() < timeout_start + 10
+        time.sleep(0.05)
+    assert chain.wait() == 1
+
+
+def test_parallel_run(rm):
+    log = rm.run('simpleFoam', decomposeParDict=DecomposeParDict.scotch(2))
+    assert log.process.returncodes == [0, 0, 0]
+    assert log.logfiles == ('./log/decomposePar.log', './log/simpleFoam.log',
+                            './log/reconstructPar.log')
+    logfile = os.path.join(rm.project_folder, 'log', 'simpleFoam.log')
+    assert read(logfile).splitlines()[0] == 'simpleFoam -parallel'
+    # processor folders are removed after a successful run
+    assert not os.path.isdir(os.path.join(rm.project_folder, 'processor0'))
+
+
+def test_parallel_chain_stops_at_first_failure(rm):
+    log = rm.run('badFoam', decomposeParDict=DecomposeParDict.scotch(2))
+    assert log.process.returncode == 3
+    assert log.process.returncodes == [0, 3]
+
+    log_folder = os.path.join(rm.project_folder, 'log')
+    assert read(os.path.join(log_folder, 'badFoam.log')).strip() == \
+        'badFoam -parallel'
+    assert read(os.path.join(log_folder, 'badFoam.err')) == \
+        'mpirun exited with code 3.'
+    assert not os.path.exists(os.path.join(log_folder, 'reconstructPar.log'))
+    # processor folders are kept for inspection
+    assert os.path.isdir(os.path.join(rm.project_folder, 'processor0'))
+
+
+def test_terminate_kills_process_group(rm):
+    log = rm.run('groupFoam', wait=False)
+    assert log.process.poll() is None
+
+    child_file = os.path.join(rm.project_folder, 'child.pid')
+    for _ in range(100):
+        if os.path.isfile(child_file) and read(child_file).strip():
+            break
+        time.sleep(0.05)
+    child = int(read(child_file))
+    assert is_alive(child)
+
+    rm.terminate()
+    assert log.process.wait() == -signal.SIGTERM
+    for _ in range(100):
+        if not is_alive(child):
+            break
+        time.sleep(0.05)
+    assert not is_alive(child)
+
+
+def test_duplicate_after_run(rm):
+    rm.run('blockMesh')
+    dup = rm.duplicate()
+    assert dup.process is None
+    assert dup.project_folder == rm.project_folder
+    assert dup.env == rm.env
+    assert repr(dup) == repr(rm)
+    # the original still tracks its process
+    assert rm.returncode == 0
+
+
+def test_case_duplicate_after_run(case):
+    case.save()
+    assert case.blockMesh().success
+    dup = case.duplicate()
+    assert dup.runmanager.process is None
+    assert case.runmanager.returncode == 0
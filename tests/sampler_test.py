@@ -0,0 +1,146 @@
+"""Tests for sampling cell values without running postProcess."""
+import random
+from array import array
+
+import pytest
+
+from butterfly.sampler import CellSampler, KDTree, calculate_cell_centres
+
+
+def faces_array(faces):
+    offsets = array('i', [0])
+    indices = array('i')
+    for face in faces:
+        indices.extend(face)
+        offsets.append(len(indices))
+    return offsets, indices
+
+
+def side_faces(k):
+    """Outward side faces of a hexahedron with bottom points k..k+3."""
+    return [tuple(k + i for i in face) for face in
+            ((0, 1, 5, 4), (1, 2, 6, 5), (2, 3, 7, 6), (3, 0, 4, 7))]
+
+
+def test_cell_centre_of_frustum():
+    # a square frustum is a hexahedron which is not a parallelepiped
+    points = array('d', [-1, -1, 0, 1, -1, 0, 1, 1, 0, -1, 1, 0,
+                         -.5, -.5, 1, .5, -.5, 1, .5, .5, 1, -.5, .5, 1])
+    faces = [(0, 3, 2, 1), (4, 5, 6, 7)] + side_faces(0)
+    offsets, indices = faces_array(faces)
+
+    centres = calculate_cell_centres(points, offsets, indices, [0] * 6, [])
+    # centroid of a frustum with areas 4 and 1 and height 1
+    assert list(centres) == pytest.approx([0, 0, 11.0 / 28])
+
+
+def test_cell_centres_with_internal_faces():
+    points = array('d', [c for z in (0, 1, 2)
+                         for c in (0, 0, z, 1, 0, z, 1, 1, z, 0, 1, z)])
+    faces = [(4, 5, 6, 7),  # internal face
+             (0, 3, 2, 1), (8, 9, 10, 11)] + side_faces(0) + side_faces(4)
+    owner = [0, 0, 1, 0, 0, 0, 0, 1, 1, 1, 1]
+    offsets, indices = faces_array(faces)
+
+    centres = calculate_cell_centres(points, offsets, indices, owner, [1])
+    assert list(centres) == pytest.approx([0.5, 0.5, 0.5, 0.5, 0.5, 1.5])
+
+
+def random_points(count, seed=0):
+    rnd = random.Random(seed)
+    return [(rnd.random(), rnd.random(), rnd.random() * 0.1) for _ in range(count)]
+
+
+def brute_force(points, point, k=1):
+    """Sorted (squared distance, index) for k nearest points."""
+    return sorted((sum((a - b) ** 2 for a, b in zip(pt, point)), i)
+                  for i, pt in enumerate(points))[:k]
+
+
+@pytest.mark.parametrize('leaf_size', [1, 4, 16, 1000])
+def test_kdtree(leaf_size):
+    points = random_points(500)
+    tree = KDTree(points, leaf_size)
+    assert len(tree) == 500
+    assert repr(tree) == 'KDTree::500'
+    # a flat list of values creates the same tree
+    flat_tree = KDTree(array('d', (c for pt in points for c in pt)), leaf_size)
+
+    queries = random_points(50, seed=1) + [(-1, 2, 0.5), points[7]]
+    for pt in queries:
+        expected = brute_force(points, pt, 5)
+        assert tree.query(pt) == flat_tree.query(pt) == expected[:1]
+        neighbours = tree.query(pt, 5)
+        assert [i for _, i in neighbours] == [i for _, i in expected]
+        assert [d for d, _ in neighbours] == pytest.approx([d for d, _ in expected])
+    assert list(tree.nearest(queries)) == \
+        [brute_force(points, pt)[0][1] for pt in queries]
+
+    # k is larger than the number of points
+    assert len(tree.query((0, 0, 0), 600)) == 500
+
+
+def test_kdtree_duplicate_and_no_points():
+    tree = KDTree([(1, 1, 1)] * 20 + [(2, 2, 2)], leaf_size=2)
+    # any of the points at the same location is the nearest point
+    distance, index = tree.query((0, 0, 0))[0]
+    assert (distance, index < 20) == (3, True)
+    assert [d for d, _ in tree.query((2, 2, 1.9), 3)] == \
+        pytest.approx([0.01, 2.81, 2.81])
+
+    tree = KDTree([])
+    assert len(tree) == 0
+    assert tree.query((0, 0, 0)) == []
+
+
+def test_cell_sampler_nearest():
+    centres = random_points(200)
+    sampler = CellSampler(centres, leaf_size=8)
+    assert sampler.cell_count == 200
+    assert repr(sampler) == 'CellSampler::200'
+
+    points = random_points(30, seed=1)
+    nearest = [brute_force(centres, pt)[0][1] for pt in points]
+    assert list(sampler.nearest_cells(points)) == nearest
+
+    values = [float(i) for i in range(200)]
+    assert sampler.sample(values, points) == [values[i] for i in nearest]
+    # vector values are returned as tuples of the width of the field
+    vectors = array('d', (c for i in range(200) for c in (i, -i, 2 * i)))
+    assert sampler.sample(vectors, points) == \
+        [(i, -i, 2 * i) for i in nearest]
+    tensors = range(200 * 6)
+    assert sampler.sample(tensors, points[:1]) == \
+        [tuple(range(6 * nearest[0], 6 * nearest[0] + 6))]
+
+    # uniform fields
+    assert sampler.sample(1.5, points[:3]) == [1.5, 1.5, 1.5]
+    assert sampler.sample((0, 0, 1), points[:2], 'idw') == [(0, 0, 1), (0, 0, 1)]
+
+    with pytest.raises(ValueError):
+        sampler.sample(values[:-1], points)
+    with pytest.raises(ValueError):
+        sampler.sample(values, points, method='linear')
+
+
+@pytest.mark.parametrize('k, power', [(1, 2), (4, 2), (8, 1)])
+def test_cell_sampler_idw(k, power):
+    centres = random_points(100)
+    sampler = CellSampler(centres)
+    values = [random.Random(i).uniform(-5, 5) for i in range(100)]
+    vectors = [c for v in values for c in (v, 2 * v, 1)]
+    points = random_points(20, seed=2)
+
+    expected = []
+    for pt in points:
+        weights = [(d ** (-power / 2.0), i) for d, i in brute_force(centres, pt, k)]
+        total = sum(w for w, _ in weights)
+        expected.append(sum(w * values[i] for w, i in weights) / total)
+    assert sampler.sample(values, points, 'idw', k, power) == pytest.approx(expected)
+    sampled = sampler.sample(vectors, points, 'idw', k, power)
+    assert [v[0] for v in sampled] == pytest.approx(expected)
+    assert [v[1] for v in sampled] == pytest.approx([2 * v for v in expected])
+    assert [v[2] for v in sampled] == pytest.approx([1] * 20)
+
+    # the value of the cell is used at a cell centre
+    assert sampler.sample(values, centres[5:6], 'idw', k, power) == [values[5]]
@@ -0,0 +1,129 @@
+"""Tests for running and terminating a solution and the pid files of RunManager."""
+import os
+import time
+
+import pytest
+
+from butterfly import runmanager
+from butterfly.recipe import SteadyIncompressible
+from butterfly.solution import Solution
+
+
+def wait_for(condition, timeout=10):
+    timeout_start = time.time()
+    while not condition():
+        assert time.time() < timeout_start + timeout, 'timed out'
+        time.sleep(0.05)
+
+
+def test_is_running(case, stub_env):
+    case.runmanager.env = dict(stub_env, STUB_SLEEP='0.5')
+    case.save()
+    solution = Solution(case, SteadyIncompressible())
+    assert not solution.is_running
+
+    solution.run()
+    process = case.runmanager.process
+    assert solution.is_running
+    wait_for(lambda: process.poll() is not None)
+    assert process.returncode == 0
+    assert not solution.is_running
+    # the finished run is only checked once
+    assert not solution.is_running
+
+
+def test_terminate(case, stub_env):
+    case.runmanager.env = dict(stub_env, STUB_SLEEP='30')
+    case.save()
+    solution = Solution(case, SteadyIncompressible())
+    # nothing to terminate before the run
+    solution.terminate()
+
+    solution.run()
+    process = case.runmanager.process
+    assert solution.is_running
+    solution.terminate()
+    wait_for(lambda: process.poll() is not None)
+    assert process.returncode != 0
+    assert not solution.is_running
+
+
+def test_terminate_other_command(case, stub_env):
+    case.runmanager.env = dict(stub_env, STUB_SLEEP='30')
+    case.save()
+    solution = Solution(case, SteadyIncompressible())
+    solution.run()
+    process = case.runmanager.process
+    try:
+        # the latest command of the run manager doesn't belong to this solution
+        case.runmanager.run('checkMesh', wait=True)
+        solution.terminate()
+        time.sleep(0.2)
+        assert process.poll() is None
+        assert solution.is_running
+    finally:
+        process.kill()
+        process.wait()
+
+
+class FakePopen(object):
+    """Record commands instead of running them and write a pid file."""
+
+    commands = []
+    pidfile = None
+
+    def __init__(self, cmd, shell=False, stdout=None):
+        self.commands.append(cmd)
+        self.stdout = iter(())
+        self.returncode = None
+        if self.pidfile and 'echo $! >' in cmd:
+            with open(self.pidfile, 'wb') as pf:
+                pf.write('123\n')
+
+    def communicate(self):
+        self.returncode = 1
+        return None, None
+
+
+@pytest.fixture
+def docker_runmanager(tmpdir, monkeypatch):
+    """A docker RunManager with a container which runs FakePopen."""
+    monkeypatch.setattr(runmanager.os, 'name', 'nt')
+    monkeypatch.setenv('HOME', str(tmpdir))
+    monkeypatch.setattr(runmanager, 'Popen', FakePopen)
+    monkeypatch.setattr(FakePopen, 'commands', [])
+    rm = runmanager.RunManager('project')
+    monkeypatch.setattr(rm, '_RunManager__containerId', 'container')
+    rm.shellinit = ('init',)
+    tmpdir.ensure('butterfly', 'project', 'log', dir=True)
+    return rm
+
+
+def test_docker_pid_file(docker_runmanager, monkeypatch, capsys):
+    rm = docker_runmanager
+    pidfile = os.path.join(os.path.expanduser('~'), 'butterfly', 'project', 'log',
+                           'simpleFoam.pid')
+    cmd = rm.command('simpleFoam', include_header=False).cmd
+    assert 'echo $! > ./log/simpleFoam.pid; wait $!' in cmd
+
+    # the command hasn't written its pid file
+    assert rm.pid is None
+    rm.terminate()
+    assert 'Failed to find PID' in capsys.readouterr()[0]
+    assert FakePopen.commands == []
+
+    # the pid file from a previous run is removed
+    with open(pidfile, 'wb') as pf:
+        pf.write('99\n')
+    rm.run('simpleFoam', wait=False)
+    assert not os.path.isfile(pidfile)
+    assert rm.pid is None
+
+    # the command writes its pid file as it starts and is killed if it fails
+    monkeypatch.setattr(FakePopen, 'pidfile', pidfile)
+    rm.run('simpleFoam')
+    assert rm.pid == 123
+    assert FakePopen.commands[-1] == 'init&docker exec -i container kill 123'
+
+    rm.terminate(force=True)
+    assert FakePopen.commands[-1] == 'init&docker exec -i container kill -9 123'
@@ -0,0 +1,98 @@
+"""Tests for butterfly SolutionBatch against stub OpenFOAM executables."""
+import os
+import stat
+import threading
+import time
+
+from butterfly.case import Case
+from butterfly.recipe import SteadyIncompressible
+from butterfly.solutionbatch import SolutionBatch
+
+from .conftest import cube
+
+
+def create_case(name, working_dir, env):
+    case = Case.from_bf_geometries(name, [cube(name)])
+    case.working_dir = working_dir
+    case.runmanager.env = env
+    return case
+
+
+def failing_env(tmpdir, env):
+    """Put a simpleFoam which fails in front of the stubs."""
+    bin_folder = tmpdir.mkdir('failing_stubs')
+    fp = bin_folder.join('simpleFoam')
+    fp.write('#!/bin/sh\necho "simpleFoam diverged" >&2\nexit 1\n')
+    os.chmod(str(fp), os.stat(str(fp)).st_mode | stat.S_IEXEC)
+    return dict(env, PATH=str(bin_folder) + os.pathsep + env['PATH'])
+
+
+def test_cores_per_job():
+    batch = SolutionBatch([], cores=8)
+    assert batch.cores_per_job == 8
+    assert batch.decomposeParDict.numberOfSubdomains == '8'
+    batch.cores_per_job = 1
+    assert batch.decomposeParDict is None
+    batch.cores_per_job = 16
+    assert batch.cores_per_job == 8
+
+
+def test_batch_run(tmpdir, stub_env):
+    working_dir = str(tmpdir.mkdir('butterfly'))
+    env = dict(stub_env, STUB_SLEEP='0.5')
+    cases = [create_case('case_{}'.format(i), working_dir, env) for i in range(3)]
+    cases[2].runmanager.env = failing_env(tmpdir, env)
+
+    batch = SolutionBatch([(c, SteadyIncompressible()) for c in cases],
+                          cores=4, cores_per_job=2)
+
+    # sample number of running jobs while the batch is running
+    running = []
+    done = threading.Event()
+
+    def monitor():
+        while not done.is_set():
+            running.append(len(batch.running))
+            time.sleep(0.01)
+
+    thread = threading.Thread(target=monitor)
+    thread.start()
+    try:
+        report = batch.run()
+    finally:
+        done.set()
+        thread.join()
+
+    # 4 cores are shared by jobs with 2 cores
+    assert max(running) == 2
+    assert not batch.running
+
+    assert not report.success
+    assert report.failed == ('case_2',)
+    assert tuple(job.case for job in report.jobs) == tuple(cases)
+
+    for job in report.jobs[:2]:
+        assert job.success
+        assert job.error is None
+        assert job.cores == 2
+        assert job.elapsed >= 0.5
+        assert job.steps.executed == \
+            ('blockMesh', 'snappyHexMesh', 'checkMesh', 'simpleFoam')
+        assert job.solution.decomposeParDict.numberOfSubdomains == '2'
+        assert tuple(os.path.basename(f) for f in job.logfiles) == \
+            ('decomposePar.log', 'simpleFoam.log', 'reconstructPar.log')
+        with open(job.logfiles[1]) as inf:
+            assert inf.readline().strip() == 'simpleFoam -parallel'
+
+    failed = report.jobs[2]
+    assert not failed.success
+    assert failed.steps.failed == ('simpleFoam',)
+    assert 'simpleFoam diverged' in failed.error
+
+    # the mesh is up to date in the next run and only the failed solver runs
+    cases[2].runmanager.env = env
+    report = SolutionBatch([(cases[2], SteadyIncompressible())], cores=2).run()
+    assert report.success
+    assert report.jobs[0].steps.skipped == \
+        ('blockMesh', 'snappyHexMesh', 'checkMesh')
+    assert report.jobs[0].steps.executed == ('simpleFoam',)
@@ -0,0 +1,218 @@
+"""Tests for reading and writing ascii and binary stl files."""
+import struct
+from array import array
+from io import BytesIO
+
+import pytest
+
+from butterfly.geometry import bf_geometry_from_stl_file
+from butterfly.stl import ascii, binary, is_binary_file, iter_solids, \
+    read_ascii_string, read_binary_string
+from butterfly.stl.types import Solid
+
+from .conftest import cube
+
+# normal and three vertices for two facets of a unit square
+VALUES = [0, 0, 1, 0, 0, 0, 1, 0, 0, 1, 1, 0,
+          0, 0, 1, 0, 0, 0, 1, 1, 0, 0, 1, 0.5]
+
+ASCII_STL = '''solid square
+  facet normal 0 0 1
+    outer loop
+      vertex 0 0 0
+      vertex 1.0 0 0
+      vertex 1 1E0 0
+    endloop
+  endfacet
+  facet normal 0.0 0.0 1.0
+    outer loop
+      vertex 0 0 0
+      vertex 1 1 0
+      vertex 0 1 5e-1
+    endloop
+  endfacet
+endsolid square
+'''
+
+
+def binary_stl(header, values, attributes=(0, 0)):
+    """Binary stl file content for facets with attribute values."""
+    records = [struct.pack('<12fH', *(values[i:i + 12] + [attr]))
+               for i, attr in zip(range(0, len(values), 12), attributes)]
+    return header.ljust(80, '\0') + struct.pack('<I', len(records)) + \
+        ''.join(records)
+
+
+def test_read_ascii():
+    solid = read_ascii_string(ASCII_STL)
+    assert solid.name == 'square'
+    assert solid.facet_count == 2
+    assert list(solid.values) == VALUES
+    assert solid.normals == ((0, 0, 1), (0, 0, 1))
+    assert solid.facets[1].vertices == ((0, 0, 0), (1, 1, 0), (0, 1, 0.5))
+    assert sorted(solid.vertices) == [(0, 0, 0), (0, 1, 0.5), (1, 0, 0), (1, 1, 0)]
+    assert solid.surface_area == pytest.approx(0.5 + 0.5 * 1.5 ** 0.5)
+    assert solid.surface_area == pytest.approx(sum(f.area for f in solid.facets))
+    assert repr(solid) == "<stl.types.ArraySolid name='square', facets=2>"
+
+
+def test_read_ascii_invalid():
+    # a vertex is missing
+    with pytest.raises(ascii.SyntaxError):
+        read_ascii_string(ASCII_STL.replace('      vertex 0 1 5e-1\n', ''))
+    # a number is missing
+    with pytest.raises(ascii.SyntaxError):
+        read_ascii_string(ASCII_STL.replace('vertex 0 1 5e-1', 'vertex 0 1'))
+    with pytest.raises(ascii.SyntaxError):
+        read_ascii_string(ASCII_STL.replace('5e-1', '5f-1'))
+    with pytest.raises(ascii.SyntaxError):
+        read_ascii_string('')
+
+
+def test_read_binary():
+    # attribute values are not a count of extra bytes
+    solid = read_binary_string(binary_stl('name: square', VALUES, (7, 0)))
+    assert solid.name == 'square'
+    assert solid.values.typecode == 'f'
+    assert list(solid.values) == VALUES
+    assert list(solid.attributes) == [7, 0]
+    assert solid.facets[0].normal == (0, 0, 1)
+
+    # older files start with solid
+    solid = read_binary_string(binary_stl('solid square', VALUES))
+    assert solid.name == 'square'
+
+    with pytest.raises(binary.FormatError):
+        read_binary_string(binary_stl('name: square', VALUES)[:-10])
+
+
+def multi_solid_stl():
+    """An ascii stl file with three solids with different facet counts."""
+    facets = ASCII_STL.split('\n', 1)[1].rsplit('endsolid', 1)[0]
+    first_facet = facets[:facets.index('endfacet') + 9]
+    return 'solid first\n' + facets + 'endsolid first\n' + \
+        'solid second\n' + facets + 'endsolid\n\n' + \
+        'solid third_3\n' + first_facet + 'endsolid third_3'
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64, 100, 2 ** 22])
+def test_iter_ascii_solids(chunk_size):
+    # solids and facets span the chunks
+    solids = list(ascii.iter_solids(BytesIO(multi_solid_stl()), chunk_size))
+    assert [s.name for s in solids] == ['first', 'second', 'third_3']
+    assert [list(s.values) for s in solids] == [VALUES, VALUES, VALUES[:12]]
+
+    solid = ascii.parse(BytesIO(multi_solid_stl()), chunk_size)
+    assert solid.name == 'first'
+
+
+@pytest.mark.parametrize('chunk_size', [1, 64, 2 ** 22])
+def test_iter_ascii_solids_invalid(chunk_size):
+    content = multi_solid_stl()
+    with pytest.raises(ascii.SyntaxError):
+        list(ascii.iter_solids(
+            BytesIO(content.replace('endsolid first', 'endsolid other')),
+            chunk_size))
+    with pytest.raises(ascii.SyntaxError):
+        list(ascii.iter_solids(BytesIO(content[:-30]), chunk_size))
+    with pytest.raises(ascii.SyntaxError):
+        list(ascii.iter_solids(BytesIO(content + 'solidity\n'), chunk_size))
+
+
+def test_iter_solids():
+    # binary headers can start with solid too
+    for header, name in (('solid square', 'square'), ('', '')):
+        f = BytesIO(binary_stl(header, VALUES))
+        assert is_binary_file(f)
+        assert f.tell() == 0
+        assert [s.name for s in iter_solids(f)] == [name]
+
+    f = BytesIO('\n' + multi_solid_stl())
+    f.seek(1)
+    assert not is_binary_file(f)
+    assert f.tell() == 1
+    assert [s.name for s in iter_solids(f)] == ['first', 'second', 'third_3']
+
+
+def test_bf_geometry_from_stl_file(tmpdir):
+    fp = tmpdir.join('shapes.stl')
+    fp.write(multi_solid_stl().replace('solid second', 'solid second part'))
+    geometries = bf_geometry_from_stl_file(str(fp))
+    # solids without a valid name use the name of the file
+    assert [geo.name for geo in geometries] == ['first', 'shapes', 'third_3']
+    assert [len(geo.face_indices) for geo in geometries] == [2, 2, 1]
+
+    fp = tmpdir.join('binary.stl')
+    fp.write(binary_stl('', VALUES), mode='wb')
+    geometries = bf_geometry_from_stl_file(str(fp))
+    assert [geo.name for geo in geometries] == ['binary']
+    assert len(geometries[0].vertices) == 4
+
+
+@pytest.mark.parametrize('chunk_size', [1, 4096])
+def test_format_solid(chunk_size):
+    text = ''.join(ascii.format_solid('square', array('d', VALUES), chunk_size))
+    assert text.startswith('solid square\n')
+    assert text.endswith('endsolid square\n')
+    assert text.count('endfacet') == 2
+    assert list(read_ascii_string(text).values) == VALUES
+
+    assert ''.join(ascii.format_solid(None, [])) == \
+        'solid unnamed\nendsolid unnamed\n'
+
+
+def test_write_ascii():
+    solid = Solid('square')
+    solid.add_facet((0, 0, 1), ((0, 0, 0), (1, 0, 0), (1, 1, 0)))
+    solid.add_facet((0, 0, 1), ((0, 0, 0), (1, 1, 0), (0, 1, 0.5)))
+    f = BytesIO()
+    ascii.write(solid, f)
+    array_solid = read_ascii_string(f.getvalue())
+    assert list(array_solid.values) == VALUES
+    assert array_solid.facets == solid.facets
+
+    f = BytesIO()
+    ascii.write(array_solid, f)
+    assert list(read_ascii_string(f.getvalue()).values) == VALUES
+
+
+@pytest.mark.parametrize('chunk_size', [1, 65536])
+def test_write_binary(chunk_size):
+    f = BytesIO()
+    binary.write_values('square', array('d', VALUES), f, chunk_size)
+    content = f.getvalue()
+    assert len(content) == 84 + 50 * 2
+    # binary files shouldn't start with solid
+    assert content[:80] == 'name: square'.ljust(80, '\0')
+    assert content == binary_stl('name: square', VALUES)
+
+    solid = read_binary_string(content)
+    assert solid.name == 'square'
+    assert list(solid.values) == VALUES
+
+    f = BytesIO()
+    binary.write(solid, f)
+    assert f.getvalue() == content
+
+
+def test_binary_header():
+    f = BytesIO()
+    binary.write_values('x' * 100, VALUES, f)
+    assert f.getvalue()[:80] == 'name: ' + 'x' * 74
+    assert read_binary_string(f.getvalue()).name == 'x' * 74
+
+    assert binary.name_from_header('name: square') == 'square'
+    assert binary.name_from_header('solid square') == 'square'
+    assert binary.name_from_header('COLOR=square') == 'square'
+    assert binary.name_from_header('') == ''
+
+
+def test_bf_geometry_facet_values():
+    geo = cube('box')
+    values = geo.facet_values()
+    assert len(values) == 12 * 12
+    f = BytesIO()
+    binary.write_values(geo.name, values, f)
+    assert list(read_binary_string(f.getvalue()).values) == list(values)
+    text = ''.join(ascii.format_solid(geo.name, values))
+    assert list(read_ascii_string(text).values) == list(values)
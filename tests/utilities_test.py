@@ -0,0 +1,409 @@
+"""Tests for loading OpenFOAM mesh, field and probe files."""
+import os
+from array import array
+from collections import OrderedDict
+from io import BytesIO
+
+import pytest
+
+from butterfly.utilities import _read_ascii_of_face_list, _read_ascii_of_list, \
+    _read_last_complete_line, _read_of_list_size, calculate_probe_statistics, \
+    load_of_boundary_faces_array, load_of_boundary_file, load_of_boundary_patches, \
+    load_of_faces_array, load_of_faces_file, load_of_field_file, \
+    load_of_labels_array, load_of_points_array, load_of_points_file, \
+    load_probe_history_from_folder, load_probe_values_from_folder, \
+    load_probes_from_postProcessing_file, slice_faces_array
+
+from .conftest import foam_header, foam_list, write_foam_file
+
+POINTS = [0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 1.0, 1.0, 0.0, 0.0, 1.0, 0.5,
+          -1.5e-3, 2.25, 1e+20]
+
+# ascii, gzip compressed and binary versions of the same file
+FORMATS = [(False, False), (False, True), (True, False), (True, True)]
+
+
+@pytest.mark.parametrize('binary,compress', FORMATS)
+def test_load_points(tmpdir, binary, compress):
+    fp = write_foam_file(
+        os.path.join(str(tmpdir), 'points'),
+        foam_header('vectorField', 'points', binary, 'constant/polyMesh') +
+        foam_list(POINTS, 3, binary) + '\n\n// ****** //\n',
+        compress)
+
+    points = load_of_points_array(fp)
+    assert points.typecode == 'd'
+    assert list(points) == POINTS
+    # the .gz extension is optional
+    assert list(load_of_points_array(str(tmpdir.join('points')))) == POINTS
+    assert list(load_of_points_file(fp)) == \
+        [tuple(POINTS[i:i + 3]) for i in range(0, len(POINTS), 3)]
+
+
+def test_load_points_big_endian(tmpdir):
+    fp = write_foam_file(
+        str(tmpdir.join('points')),
+        foam_header('vectorField', 'points', True, byteorder='big') +
+        foam_list(POINTS, 3, True, byteorder='big'))
+    assert list(load_of_points_array(fp)) == POINTS
+
+
+def test_read_ascii_list_in_chunks():
+    # vectors which are split between the chunks
+    values = [i * 0.5 for i in range(3 * 100)]
+    f = BytesIO(foam_list(values, 3))
+    size, rest = _read_of_list_size(f)
+    assert size == 100
+    assert list(_read_ascii_of_list(f, size, rest, 'd', 3, chunk_size=7)) == values
+
+
+def test_load_points_uniform_and_invalid(tmpdir):
+    fp = write_foam_file(str(tmpdir.join('points')),
+                         foam_header('vectorField', 'points') + '3{(1 2 3)}\n')
+    assert list(load_of_points_array(fp)) == [1, 2, 3] * 3
+
+    # a point is missing
+    fp = write_foam_file(str(tmpdir.join('missing')),
+                         foam_header('vectorField', 'points') + '3\n(\n(0 0 0)\n)\n')
+    with pytest.raises(ValueError):
+        load_of_points_array(fp)
+
+    # binary file which ends in the middle of the list
+    content = foam_header('vectorField', 'points', True) + foam_list(POINTS, 3, True)
+    fp = write_foam_file(str(tmpdir.join('truncated')), content[:-20])
+    with pytest.raises(ValueError):
+        load_of_points_array(fp)
+
+
+# two stacked hexahedra. the first face is internal
+FACES = [(4, 5, 6, 7), (0, 3, 2, 1), (8, 9, 10, 11)] + \
+    [tuple(k + i for i in face) for k in (0, 4) for face in
+     ((0, 1, 5, 4), (1, 2, 6, 5), (2, 3, 7, 6), (3, 0, 4, 7))]
+OWNER = [0, 0, 1, 0, 0, 0, 0, 1, 1, 1, 1]
+
+BOUNDARY = '''2
+(
+    ends
+    {
+        type            wall;
+        inGroups        1(wall);
+        nFaces          2;
+        startFace       1;
+    }
+    sides
+    {
+        type            patch;
+        nFaces          8;
+        startFace       3;
+    }
+)
+'''
+
+
+def write_faces(folder, binary=False, compress=False, compact=False):
+    """Write faces and boundary files and return path to faces."""
+    if compact or binary:
+        offsets = [0]
+        for face in FACES:
+            offsets.append(offsets[-1] + len(face))
+        content = foam_header('faceCompactList', 'faces', binary) + \
+            foam_list(offsets, 1, binary, 'i') + \
+            foam_list([i for face in FACES for i in face], 1, binary, 'i')
+    else:
+        content = foam_header('faceList', 'faces') + foam_list(
+            [i for face in FACES for i in face], 4,
+            ascii_item=lambda v: '4(%s)' % ' '.join(map(str, v)))
+
+    write_foam_file(os.path.join(str(folder), 'boundary'),
+                    foam_header('polyBoundaryMesh', 'boundary') + BOUNDARY)
+    return write_foam_file(os.path.join(str(folder), 'faces'),
+                           content + '\n\n// ****** //\n', compress)
+
+
+def faces_list(offsets, indices):
+    return [tuple(indices[offsets[i]:offsets[i + 1]])
+            for i in range(len(offsets) - 1)]
+
+
+# ascii faceList, ascii faceCompactList and binary faceCompactList
+FACE_FORMATS = [(False, False, False), (False, True, False), (False, False, True),
+                (False, True, True), (True, False, True), (True, True, True)]
+
+
+@pytest.mark.parametrize('binary,compress,compact', FACE_FORMATS)
+def test_load_faces(tmpdir, binary, compress, compact):
+    fp = write_faces(tmpdir, binary, compress, compact)
+
+    offsets, indices = load_of_faces_array(fp)
+    assert list(offsets) == list(range(0, 4 * 12, 4))
+    assert faces_list(offsets, indices) == FACES
+
+    # skip the internal face
+    offsets, indices = load_of_faces_array(fp, start=1)
+    assert offsets[0] == 0
+    assert faces_list(offsets, indices) == FACES[1:]
+
+    assert list(load_of_faces_file(fp)) == FACES
+    assert list(load_of_faces_file(fp, inner_mesh=False)) == FACES[1:]
+
+
+@pytest.mark.parametrize('binary,compress,compact', FACE_FORMATS)
+def test_load_boundary_faces(tmpdir, binary, compress, compact):
+    fp = write_faces(tmpdir, binary, compress, compact)
+    boundary = os.path.join(str(tmpdir), 'boundary')
+
+    assert load_of_boundary_patches(boundary) == \
+        OrderedDict([('ends', (1, 2)), ('sides', (3, 8))])
+    assert load_of_boundary_file(boundary) == set(range(1, 11))
+
+    patches = load_of_boundary_faces_array(fp)
+    assert list(patches) == ['ends', 'sides']
+    assert faces_list(*patches['ends']) == FACES[1:3]
+    assert faces_list(*patches['sides']) == FACES[3:]
+
+    patches = load_of_boundary_faces_array(fp, patches=['sides'])
+    assert list(patches) == ['sides']
+    assert faces_list(*patches['sides']) == FACES[3:]
+
+    with pytest.raises(AssertionError):
+        load_of_boundary_faces_array(fp, patches=['inlet'])
+
+
+def test_slice_faces_array():
+    offsets = array('i', [0, 3, 7, 10])
+    indices = array('i', [0, 1, 2, 0, 2, 3, 4, 4, 5, 6])
+    sub_offsets, sub_indices = slice_faces_array(offsets, indices, 1, 2)
+    assert list(sub_offsets) == [0, 4, 7]
+    assert list(sub_indices) == [0, 2, 3, 4, 4, 5, 6]
+    assert faces_list(*slice_faces_array(offsets, indices, 0, 1)) == [(0, 1, 2)]
+
+
+@pytest.mark.parametrize('start', [0, 1, 5])
+def test_read_ascii_face_list_in_chunks(start):
+    # faces which are split between the chunks
+    text = foam_list([i for face in FACES for i in face], 4,
+                     ascii_item=lambda v: '4(%s)' % ' '.join(map(str, v)))
+    f = BytesIO(text + '\n// ****** //\n')
+    size, rest = _read_of_list_size(f)
+    offsets, indices = _read_ascii_of_face_list(
+        f, size, rest, 'i', start, chunk_size=5)
+    assert faces_list(offsets, indices) == FACES[start:]
+
+
+def test_load_faces_invalid(tmpdir):
+    # binary faces should be a faceCompactList
+    fp = write_foam_file(
+        str(tmpdir.join('faces')),
+        foam_header('faceList', 'faces', True) + '1\n(4(0 1 2 3))\n')
+    with pytest.raises(ValueError):
+        load_of_faces_array(fp)
+
+    # a face is missing
+    fp = write_foam_file(
+        str(tmpdir.join('missing')),
+        foam_header('faceList', 'faces') + '2\n(\n4(0 1 2 3)\n)\n')
+    with pytest.raises(ValueError):
+        load_of_faces_array(fp)
+
+
+@pytest.mark.parametrize('binary,compress', FORMATS)
+def test_load_labels(tmpdir, binary, compress):
+    fp = write_foam_file(
+        str(tmpdir.join('owner')),
+        foam_header('labelList', 'owner', binary) + foam_list(OWNER, 1, binary, 'i'),
+        compress)
+    owner = load_of_labels_array(fp)
+    assert owner.itemsize == 4
+    assert list(owner) == OWNER
+
+
+def field_content(binary=False):
+    """Content of a vector field file with nonuniform values."""
+    def nonuniform(values):
+        return 'nonuniform List<vector> ' + foam_list(values, 3, binary)
+
+    return foam_header('volVectorField', 'U', binary, '100') + (
+        'dimensions      [0 1 -1 0 0 0 0];\n\n'
+        'internalField   %s;\n\n'
+        'boundaryField\n{\n'
+        '    inlet\n    {\n        type            fixedValue;\n'
+        '        value           uniform (1 0 0);\n    }\n'
+        '    outlet\n    {\n        type            zeroGradient;\n    }\n'
+        '    // a comment\n'
+        '    wall\n    {\n        type            calculated;\n'
+        '        value           %s;\n    }\n'
+        '    #includeEtc "caseDicts/setConstraintTypes"\n'
+        '    "(front|back)"\n    {\n        type            empty;\n'
+        '        inGroups        1(empty);\n'
+        '        coeffs          { a 1; b { c 2; } }\n    }\n'
+        '}\n\n// ****** //\n') % (nonuniform(POINTS), nonuniform(POINTS[:6]))
+
+
+@pytest.mark.parametrize('binary,compress', FORMATS)
+def test_load_field(tmpdir, binary, compress):
+    fp = write_foam_file(str(tmpdir.join('U')), field_content(binary), compress)
+
+    internal_field, boundary_field = load_of_field_file(fp)
+    assert list(internal_field) == POINTS
+    assert list(boundary_field) == ['inlet', 'outlet', 'wall', '(front|back)']
+    assert boundary_field['inlet'] == {'type': 'fixedValue', 'value': (1, 0, 0)}
+    assert boundary_field['outlet'] == {'type': 'zeroGradient'}
+    assert boundary_field['wall']['type'] == 'calculated'
+    assert list(boundary_field['wall']['value']) == POINTS[:6]
+    assert boundary_field['(front|back)'] == {
+        'type': 'empty', 'inGroups': '1(empty)', 'coeffs': '{ a 1; b { c 2; } }'}
+
+
+def test_load_uniform_field(tmpdir):
+    fp = write_foam_file(
+        str(tmpdir.join('p')),
+        foam_header('volScalarField', 'p') +
+        'dimensions [0 2 -2 0 0 0 0];\ninternalField uniform 0.5;\n'
+        'boundaryField\n{\n    outlet\n    {\n        type fixedValue;\n'
+        '        value nonuniform List<scalar> 2{1.5};\n    }\n}\n')
+    field = load_of_field_file(fp)
+    assert field.internal_field == 0.5
+    assert list(field.boundary_field['outlet']['value']) == [1.5, 1.5]
+
+    fp = write_foam_file(
+        str(tmpdir.join('T')),
+        foam_header('volScalarField', 'T') + 'dimensions [0 0 0 1 0 0 0];\n'
+        'internalField nonuniform List<scalar> 3(300 301.5 302);\n')
+    field = load_of_field_file(fp)
+    assert list(field.internal_field) == [300, 301.5, 302]
+    assert field.boundary_field == {}
+
+
+def test_load_field_invalid(tmpdir):
+    header = foam_header('volScalarField', 'p')
+    fp = write_foam_file(str(tmpdir.join('nothing')),
+                         header + 'dimensions [0 0 0 0 0 0 0];\n')
+    with pytest.raises(ValueError):
+        load_of_field_file(fp)
+
+    fp = write_foam_file(str(tmpdir.join('missing')),
+                         header + 'internalField nonuniform List<scalar> 3(1 2);\n')
+    with pytest.raises(ValueError):
+        load_of_field_file(fp)
+
+    fp = write_foam_file(str(tmpdir.join('unknown')),
+                         header + 'internalField nonuniform List<complex> 1((1 2));\n')
+    with pytest.raises(ValueError):
+        load_of_field_file(fp)
+
+
+def test_case_load_field(tmpdir, case):
+    case.save()
+    for time, compress in (('50', True), ('100', False)):
+        os.mkdir(os.path.join(case.project_dir, time))
+        write_foam_file(os.path.join(case.project_dir, time, 'U'),
+                        field_content(), compress)
+
+    field = case.load_field('U')
+    assert list(field.internal_field) == POINTS
+    # values are cached until the file changes
+    assert case.load_field('U', 100) is field
+    assert list(case.load_field('U', '50').internal_field) == POINTS
+
+    fp = write_foam_file(os.path.join(case.project_dir, '100', 'U'),
+                         field_content().replace('(1 0 0)', '(2 0 0)'))
+    os.utime(fp, (0, 0))
+    field = case.load_field('U')
+    assert field.boundary_field['inlet']['value'] == (2, 0, 0)
+
+    with pytest.raises(ValueError):
+        case.load_field('U', 75)
+
+
+PROBES_HEADER = '''# Probe 0 (0 0 1)
+# Probe 1 (1 1 1)
+#     Probe              0              1
+#      Time
+'''
+
+
+def write_probes(folder, time, field, rows):
+    """Write a probes file with a line for each (time, values)."""
+    time_folder = folder.join(time)
+    if not time_folder.check():
+        time_folder.mkdir()
+    lines = []
+    for t, values in rows:
+        lines.append('%-10s' % t + ''.join(
+            '%15s' % ('(%s)' % ' '.join(map(str, v)) if isinstance(v, tuple) else v)
+            for v in values))
+    time_folder.join(field).write(PROBES_HEADER + '\n'.join(lines) + '\n')
+
+
+def test_load_probe_history(tmpdir):
+    folder = tmpdir.mkdir('probes')
+    write_probes(folder, '0', 'U',
+                 [(t, ((t, 0, 0), (0, t, 0))) for t in (1, 2, 3, 4)])
+    # restarted from time 3. the values from the restart replace 3 and 4
+    write_probes(folder, '3', 'U',
+                 [(t, ((t, 0, 1), (0, t, 1))) for t in (3, 4, 5)])
+    # the solver is writing a line
+    folder.join('3', 'U').write('6   (6 0 1)   (0 6', mode='a')
+    # a restart which hasn't written any values yet
+    write_probes(folder, '5', 'U', [])
+    folder.mkdir('not_a_time')
+
+    history = load_probe_history_from_folder(str(folder), 'U')
+    assert list(history.times) == [1, 2, 3, 4, 5]
+    assert history.probe_count == 2
+    assert history.width == 3
+    assert list(history.values) == [
+        1, 0, 0, 0, 1, 0, 2, 0, 0, 0, 2, 0,
+        3, 0, 1, 0, 3, 1, 4, 0, 1, 0, 4, 1, 5, 0, 1, 0, 5, 1]
+
+    stats = calculate_probe_statistics(history, count=2)
+    assert stats.average == ((4.5, 0, 1), (0, 4.5, 1))
+    assert stats.minimum == ((4, 0, 1), (0, 4, 1))
+    assert stats.maximum == ((5, 0, 1), (0, 5, 1))
+    assert stats.std == ((0.5, 0, 0), (0, 0.5, 0))
+
+    # the latest values and the probe locations
+    assert load_probe_values_from_folder(str(folder), 'U') == \
+        ((5, 0, 1), (0, 5, 1))
+    assert list(load_probes_from_postProcessing_file(str(folder), 'U')) == \
+        [(0, 0, 1), (1, 1, 1)]
+
+
+@pytest.mark.parametrize('block_size', [1, 4, 1024])
+def test_read_last_complete_line(tmpdir, block_size):
+    fp = tmpdir.join('p')
+    for content, line in (('', ''), ('1 2', ''), ('1 2\n', '1 2'),
+                          ('1 2\r\n3 4\n', '3 4'), ('1 2\n3 4\n5', '3 4'),
+                          ('1 2\n\n', '')):
+        fp.write(content)
+        assert _read_last_complete_line(str(fp), block_size) == line
+
+
+def test_load_scalar_probe_history(tmpdir):
+    folder = tmpdir.mkdir('probes')
+    write_probes(folder, '0', 'p', [(1, (1, 10)), (2, (2, 20)), (3, (6, 60))])
+
+    history = load_probe_history_from_folder(str(folder), 'p')
+    assert list(history.times) == [1, 2, 3]
+    assert (history.probe_count, history.width) == (2, 1)
+    assert list(history.values) == [1, 10, 2, 20, 6, 60]
+
+    stats = calculate_probe_statistics(history)
+    assert stats.average == (3, 30)
+    assert stats.minimum == (1, 10)
+    assert stats.maximum == (6, 60)
+    assert stats.std == pytest.approx((14 ** 0.5 / 3 ** 0.5, 1400 ** 0.5 / 3 ** 0.5))
+    assert load_probe_values_from_folder(str(folder), 'p') == (6, 60)
+
+    # a field without values
+    history = load_probe_history_from_folder(str(folder), 'U')
+    assert (len(history.times), history.probe_count) == (0, 0)
+    with pytest.raises(AssertionError):
+        calculate_probe_statistics(history)
+
+    folder.join('0', 'T').write(PROBES_HEADER + '1  300  301\n2  302\n')
+    with pytest.raises(ValueError):
+        load_probe_history_from_folder(str(folder), 'T')
+
+    with pytest.raises(ValueError):
+        load_probe_history_from_folder(str(tmpdir.join('nothing')), 'p')
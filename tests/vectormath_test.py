@@ -0,0 +1,92 @@
+"""Tests for single and batched vector functions."""
+import random
+from array import array
+
+import pytest
+
+from butterfly import vectormath as vm
+
+
+def random_points(count=20, seed=0):
+    """A tuple of random (x, y, z) points."""
+    rnd = random.Random(seed)
+    return tuple((rnd.uniform(-10, 10), rnd.uniform(-10, 10), rnd.uniform(-10, 10))
+                 for _ in range(count))
+
+
+def flat(points):
+    return array('d', (c for pt in points for c in pt))
+
+
+def assert_values(values, points):
+    """Check a flat array against a sequence of (x, y, z) points."""
+    assert isinstance(values, array)
+    assert list(values) == pytest.approx(list(flat(points)))
+
+
+def test_lengths_and_dot_products():
+    points = random_points()
+    others = random_points(seed=1)
+    assert list(vm.lengths(flat(points))) == \
+        pytest.approx([vm.length(pt) for pt in points])
+    assert list(vm.dot_products(flat(points), flat(others))) == \
+        pytest.approx([vm.dot_product(a, b) for a, b in zip(points, others)])
+    # a single vector is used for all the vectors
+    assert list(vm.dot_products(flat(points), (1, 2, 3))) == \
+        pytest.approx([vm.dot_product(pt, (1, 2, 3)) for pt in points])
+
+
+@pytest.mark.parametrize('norm', [True, False])
+def test_cross_products(norm):
+    points = random_points()
+    others = random_points(seed=1)
+    assert_values(vm.cross_products(flat(points), flat(others), norm),
+                  [vm.cross_product(a, b, norm) for a, b in zip(points, others)])
+
+
+@pytest.mark.parametrize('norm', [True, False])
+def test_cross_product_2d(norm):
+    # 2D vectors are on the xy plane
+    assert vm.cross_product((2, 0), (0, 3), norm) == \
+        ((0, 0, 1) if norm else (0, 0, 6))
+    points = [pt[:2] for pt in random_points()]
+    others = [pt[:2] for pt in random_points(seed=1)]
+    assert_values(
+        vm.cross_products(flat(p + (0,) for p in points),
+                          flat(p + (0,) for p in others), norm),
+        [vm.cross_product(a, b, norm) for a, b in zip(points, others)])
+
+
+def test_normalize_move_and_scale():
+    points = random_points()
+    values = flat(points)
+    assert_values(vm.normalize_vectors(values), [vm.normalize(pt) for pt in points])
+    assert_values(vm.move_points(values, (1, -2, 3)),
+                  [vm.move(pt, (1, -2, 3)) for pt in points])
+    assert_values(vm.scale_vectors(values, 2.5), [vm.scale(pt, 2.5) for pt in points])
+    # input values are not changed
+    assert values == flat(points)
+
+    with pytest.raises(ValueError):
+        vm.normalize_vectors([1, 0, 0, 0, 0, 0])
+
+
+@pytest.mark.parametrize('angle', [0, 30, -45, 90, 270.5])
+def test_rotate_points(angle):
+    points = random_points()
+    origin = (1, 2, 3)
+    assert_values(vm.rotate_points(origin, flat(points), angle),
+                  [vm.rotate(origin, pt, angle) for pt in points])
+    assert vm.rotate((0, 0, 0), (1, 0, 5), 90) == pytest.approx((0, 1, 5))
+
+
+def test_project_points():
+    points = random_points()
+    origin, normal = (1, 2, 3), (1, -2, 0.5)
+    projected = vm.project_points(flat(points), origin, normal)
+    assert_values(projected, [vm.project(pt, origin, normal) for pt in points])
+    # projected points are on the plane
+    distances = vm.dot_products(
+        vm.move_points(projected, vm.scale(origin, -1)), vm.normalize(normal))
+    assert list(distances) == pytest.approx([0] * len(points), abs=1e-9)
+    assert vm.project((3, 4, 5), (0, 0, 1), (0, 0, 2)) == (3, 4, 1)